@@ -0,0 +1,116 @@
+# analysis_cache.py - Chatflow分析结果缓存（按内容哈希 + 提示词版本 + 应用ID寻址）
+import time
+import hashlib
+import logging
+import threading
+from local_db import LocalDatabase
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis_cache (
+    cache_key TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    app_id TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_analysis_cache_lru ON analysis_cache(last_used_at);
+"""
+
+
+def cache_key(content_hash, prompt_version, app_id):
+    return hashlib.blake2b(f"{content_hash}|{prompt_version}|{app_id}".encode('utf-8'), digest_size=16).hexdigest()
+
+
+class AnalysisCache:
+    """持久化的分析结果缓存
+
+    内容、提示词模板和Chatflow应用任一变化都会得到新的键，旧条目不会被误用，
+    只会随LRU淘汰。条目数或总大小超过上限时淘汰最久未使用的条目。
+    """
+
+    def __init__(self, db_path, max_entries=100000, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self.db = LocalDatabase(db_path)
+        with self.db.lock:
+            self.db.conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, content_hash, prompt_version, app_id):
+        """返回缓存的 answer，未命中时返回None"""
+        key = cache_key(content_hash, prompt_version, app_id)
+        with self.db.lock:
+            row = self.db.execute("SELECT answer FROM analysis_cache WHERE cache_key = ?", (key,)).fetchone()
+            if row:
+                self.db.execute(
+                    "UPDATE analysis_cache SET last_used_at = ?, hits = hits + 1 WHERE cache_key = ?",
+                    (time.time(), key)
+                )
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return row['answer'] if row else None
+
+    def put(self, content_hash, prompt_version, app_id, answer):
+        """写入（覆盖）一条结果并按上限淘汰"""
+        key = cache_key(content_hash, prompt_version, app_id)
+        now = time.time()
+        size = len(answer.encode('utf-8'))
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO analysis_cache "
+                "(cache_key, content_hash, prompt_version, app_id, answer, size, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, content_hash, prompt_version, app_id, answer, size, now, now)
+            )
+            evicted = self._evict(conn)
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+            logger.debug(f"分析缓存淘汰 {evicted} 条")
+
+    def _evict(self, conn):
+        entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analysis_cache").fetchone()
+        excess_entries = entries - self.max_entries
+        excess_bytes = total - self.max_bytes
+        if excess_entries <= 0 and excess_bytes <= 0:
+            return 0
+        victims = []
+        for row in conn.execute("SELECT cache_key, size FROM analysis_cache ORDER BY last_used_at"):
+            if excess_entries <= 0 and excess_bytes <= 0:
+                break
+            victims.append((row['cache_key'],))
+            excess_entries -= 1
+            excess_bytes -= row['size']
+        conn.executemany("DELETE FROM analysis_cache WHERE cache_key = ?", victims)
+        return len(victims)
+
+    def clear(self):
+        self.db.execute("DELETE FROM analysis_cache")
+
+    def stats(self):
+        """命中/未命中/淘汰次数和当前占用"""
+        entries, total = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analysis_cache"
+        ).fetchone()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': entries,
+                'bytes': total,
+            }
@@ -0,0 +1,219 @@
+# async_engine.py - 基于asyncio的并发处理引擎：网络请求协程化，阻塞操作放进线程池
+import time
+import random
+import asyncio
+import logging
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from http_client import RETRY_STATUS, POST_RETRY_STATUS, IDEMPOTENT_METHODS
+from endpoint_guard import get_endpoint_guard
+
+logger = logging.getLogger(__name__)
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    httpx = None
+    HTTPX_AVAILABLE = False
+
+
+class AsyncEngine:
+    """与 WorkerPool 接口一致的异步引擎
+
+    - 独立线程运行事件循环，每个任务是一个协程 handler(item)
+    - 同时在途的任务最多 max_in_flight 个，网络等待期间不占用线程
+    - 每个接口一个信号量限制并发，如 limits={'chat': 8, 'dataset': 8}
+    - 每个接口的请求速率和熔断由 endpoint_guard 控制，与同步客户端共用
+    - 内容提取、数据库读写等阻塞操作通过 run_blocking 放进线程池
+    """
+
+    def __init__(self, handler, max_in_flight=256, limits=None, executor_workers=4,
+                 connect_timeout=5.0, read_timeout=60.0, max_retries=3, backoff=0.5, backoff_max=30.0,
+                 name='async-engine'):
+        if not HTTPX_AVAILABLE:
+            raise RuntimeError("异步模式需要安装 httpx: pip install httpx")
+        self.handler = handler
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.limits = dict(limits or {})
+        self.executor_workers = max(1, int(executor_workers))
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max(0, int(max_retries))
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.name = name
+
+        self.loop = None
+        self.client = None
+        self.executor = None
+        self._thread = None
+        self._semaphores = {}
+        self._active = {endpoint: 0 for endpoint in self.limits}
+        self._started = False
+
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._requests = 0
+        self._retries = 0
+        self._throttled = 0
+
+    def start(self):
+        if self._started:
+            return
+        self.executor = ThreadPoolExecutor(max_workers=self.executor_workers, thread_name_prefix=f'{self.name}-io')
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, args=(ready,), name=self.name, daemon=True)
+        self._thread.start()
+        ready.wait()
+        self._started = True
+        logger.info(f"异步引擎已启动: 在途上限 {self.max_in_flight}, 接口并发 {self.limits}, 线程池 {self.executor_workers}")
+
+    def _run_loop(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.loop.set_default_executor(self.executor)
+        connections = max(1, sum(self.limits.values()) or self.max_in_flight)
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+            headers={'Connection': 'keep-alive'}
+        )
+        self._semaphores = {endpoint: asyncio.Semaphore(limit) for endpoint, limit in self.limits.items()}
+        ready.set()
+        self.loop.run_forever()
+
+    def submit(self, item, block=True, timeout=None):
+        """登记一个任务；在途任务已满时返回False（block=True时等待空位）"""
+        if not self._started:
+            raise RuntimeError("异步引擎尚未启动")
+        with self._cond:
+            if self._in_flight >= self.max_in_flight:
+                if not block or not self._cond.wait_for(lambda: self._in_flight < self.max_in_flight, timeout):
+                    self._rejected += 1
+                    return False
+            self._in_flight += 1
+            self._submitted += 1
+        asyncio.run_coroutine_threadsafe(self._run(item), self.loop)
+        return True
+
+    async def _run(self, item):
+        try:
+            await self.handler(item)
+            failed = False
+        except Exception as e:
+            logger.error(f"异步任务执行异常: {str(e)}")
+            failed = True
+        with self._cond:
+            self._in_flight -= 1
+            if failed:
+                self._failed += 1
+            else:
+                self._completed += 1
+            self._cond.notify_all()
+
+    async def run_blocking(self, func, *args, **kwargs):
+        """在线程池中执行阻塞调用"""
+        return await self.loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def request(self, endpoint, method, url, **kwargs):
+        """按接口限流发送请求；连接失败和 429/5xx 按带抖动的指数退避重试，接口熔断中时抛出 CircuitOpenError"""
+        method = method.upper()
+        idempotent = method in IDEMPOTENT_METHODS
+        retry_status = RETRY_STATUS if idempotent else POST_RETRY_STATUS
+        semaphore = self._semaphores.get(endpoint)
+        guard = get_endpoint_guard(endpoint)
+        attempt = 0
+        while True:
+            wait = guard.acquire()
+            if wait > 0:
+                self._throttled += 1
+                await asyncio.sleep(wait)
+            try:
+                if semaphore is None:
+                    response = await self._send(endpoint, method, url, **kwargs)
+                else:
+                    async with semaphore:
+                        response = await self._send(endpoint, method, url, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.ReadTimeout,
+                    httpx.RemoteProtocolError) as e:
+                guard.record_overload(type(e).__name__)
+                # 非幂等请求只在连接阶段失败（请求未发出）时重试
+                can_retry = idempotent or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                if attempt >= self.max_retries or not can_retry:
+                    raise
+                logger.warning(f"请求失败，准备重试({attempt + 1}/{self.max_retries}): {method} {url} - {str(e)}")
+                await self._sleep_before_retry(attempt)
+                attempt += 1
+                continue
+            except Exception:
+                guard.release()
+                raise
+            guard.record_status(response.status_code)
+            if response.status_code in retry_status and attempt < self.max_retries:
+                logger.warning(f"服务端返回{response.status_code}，准备重试({attempt + 1}/{self.max_retries}): {method} {url}")
+                await self._sleep_before_retry(attempt, response)
+                attempt += 1
+                continue
+            return response
+
+    async def _send(self, endpoint, method, url, **kwargs):
+        self._active[endpoint] = self._active.get(endpoint, 0) + 1
+        self._requests += 1
+        try:
+            return await self.client.request(method, url, **kwargs)
+        finally:
+            self._active[endpoint] -= 1
+
+    async def _sleep_before_retry(self, attempt, response=None):
+        delay = min(self.backoff_max, self.backoff * (2 ** attempt))
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = min(self.backoff_max, max(delay, float(retry_after)))
+        self._retries += 1
+        await asyncio.sleep(random.uniform(0, delay))
+
+    def stop(self, wait=True, timeout=None):
+        """停止引擎；wait=True时先等待在途任务完成"""
+        if not self._started:
+            return
+        if wait:
+            with self._cond:
+                self._cond.wait_for(lambda: self._in_flight == 0, timeout)
+        asyncio.run_coroutine_threadsafe(self.client.aclose(), self.loop).result(timeout=10)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+        self.executor.shutdown(wait=wait)
+        self._started = False
+        logger.info(f"异步引擎已停止: {self.name}")
+
+    def stats(self):
+        """运行指标（字段与 WorkerPool.stats 一致，另含各接口当前并发数）"""
+        with self._cond:
+            in_flight = self._in_flight
+            stats = {
+                'mode': 'async',
+                'workers': self.max_in_flight,
+                'busy_workers': in_flight,
+                'queue_depth': in_flight,
+                'queue_capacity': self.max_in_flight,
+                'utilization': round(in_flight / self.max_in_flight, 3),
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'failed': self._failed,
+                'rejected': self._rejected,
+            }
+        stats['requests'] = self._requests
+        stats['retries'] = self._retries
+        stats['throttled'] = self._throttled
+        stats['endpoints'] = {
+            endpoint: {'active': self._active.get(endpoint, 0), 'limit': limit}
+            for endpoint, limit in self.limits.items()
+        }
+        return stats
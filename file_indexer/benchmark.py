@@ -0,0 +1,1096 @@
+# benchmark.py - 性能基准测试（使用本地模拟的Dify服务，不访问真实接口）
+#
+# 用法:
+#   python benchmark.py ingest --files 200 --latency 0.2
+#   python benchmark.py pdf --pages 600
+#   python benchmark.py excel --sheets 50 --rows 2000
+#   python benchmark.py image --count 5 --megapixels 24
+#   python benchmark.py doc --paragraphs 20000
+#   python benchmark.py salvage --size 50
+#   python benchmark.py text --size 500
+#   python benchmark.py pptx --slides 200
+#   python benchmark.py startup
+#   python benchmark.py upload --files 4 --size 100
+#   python benchmark.py fanout --files 20 --latency 0.2
+#   python benchmark.py batch --count 2000 --producers 64
+#   python benchmark.py overload --requests 600 --capacity 40
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import logging
+import struct
+import argparse
+import tempfile
+import threading
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class MockDifyHandler(BaseHTTPRequestHandler):
+    """模拟Dify接口：chat-messages 返回固定分析结果，知识库接口返回新文档ID
+
+    capacity 不为0时每秒最多受理 capacity 个请求，超出的返回429（模拟过载）。
+    """
+
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+    lock = threading.Lock()
+    active = 0
+    max_active = 0
+    requests = {}
+    body_bytes = 0
+    capacity = 0
+    accepted = deque()
+    throttled = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _drain(self, size):
+        drained = 0
+        while drained < size:
+            chunk = self.rfile.read(min(size - drained, 1024 * 1024))
+            if not chunk:
+                break
+            drained += len(chunk)
+        return drained
+
+    def _read_body(self):
+        """读取并丢弃请求体（大文件上传时不在服务端堆积内存），返回字节数"""
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            total = 0
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return total
+                total += self._drain(size)
+                self.rfile.readline()
+        return self._drain(int(self.headers.get('Content-Length', 0)))
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        size = self._read_body()
+        cls = type(self)
+        endpoint = self.path.rsplit('/', 1)[-1]
+        with cls.lock:
+            cls.body_bytes += size
+            if cls.capacity:
+                now = time.monotonic()
+                while cls.accepted and now - cls.accepted[0] >= 1.0:
+                    cls.accepted.popleft()
+                if len(cls.accepted) >= cls.capacity:
+                    cls.throttled += 1
+                    overloaded = True
+                else:
+                    cls.accepted.append(now)
+                    overloaded = False
+                if overloaded:
+                    self._reply(429, {'code': 'too_many_requests', 'message': 'rate limited'})
+                    return
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+            cls.requests[endpoint] = cls.requests.get(endpoint, 0) + 1
+        try:
+            if cls.latency:
+                time.sleep(cls.latency)
+            if endpoint == 'chat-messages':
+                self._reply(200, {'answer': '文件类型: 技术文档\n内容总结: 基准测试用的模拟分析结果。'})
+            else:
+                self._reply(200, {'document': {'id': str(uuid.uuid4())}, 'batch': uuid.uuid4().hex})
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+    @classmethod
+    def reset(cls, latency, capacity=0):
+        with cls.lock:
+            cls.latency = latency
+            cls.capacity = capacity
+            cls.accepted = deque()
+            cls.throttled = 0
+            cls.active = 0
+            cls.max_active = 0
+            cls.requests = {}
+            cls.body_bytes = 0
+
+
+def start_mock_dify(latency=0.0):
+    """启动模拟服务，返回 (server, base_url)"""
+    MockDifyHandler.reset(latency)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockDifyHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def _prepare_env(work_dir, base_url):
+    """导入被测模块前设置环境变量（dotenv 不会覆盖已存在的变量）"""
+    os.environ.update({
+        'DIFY_BASE_URL': base_url,
+        'DIFY_API_KEY': 'benchmark',
+        'WORKFLOW_API_KEY': 'benchmark',
+        'DIFY_KNOWLEDGE_BASE_ID': 'kb-index',
+        'PARENT_CHILD_KB_ID': 'kb-original',
+        'MONITOR_DIR': os.path.join(work_dir, 'monitor'),
+        'INDEX_EXPORT_DIR': os.path.join(work_dir, 'export'),
+        'STATE_DB_PATH': os.path.join(work_dir, 'state.db'),
+        'LOG_DIR': work_dir,
+        'STATS_LOG_INTERVAL': '0',
+    })
+
+
+def _make_files(directory, count, size):
+    os.makedirs(directory, exist_ok=True)
+    line = "基准测试文档内容，用于模拟真实文件的文本提取。\n"
+    body = (line * (size // len(line.encode('utf-8')) + 1))
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"doc_{i:05d}.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"#{i}\n{body}")
+        paths.append(path)
+    return paths
+
+
+def _run_ingest(fm, mode, paths, work_dir, timeout):
+    """用指定模式处理全部文件，返回耗时和任务统计"""
+    fm.config.WORKER_POOL_MODE = mode
+    # 每轮使用独立的状态库，避免内容去重跳过处理
+    fm.config.STATE_DB_PATH = os.path.join(work_dir, f"state_{mode}.db")
+    monitor = fm.FileMonitor()
+    items = []
+    for path in paths:
+        stat = os.stat(path)
+        items.append((path, stat.st_size, stat.st_mtime_ns))
+    monitor.job_store.enqueue_many(items)
+
+    started = time.perf_counter()
+    monitor.start_workers()
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        counts = monitor.job_store.counts()
+        if counts.get('done', 0) + counts.get('failed', 0) >= len(paths):
+            break
+        monitor.pump()
+        time.sleep(0.02)
+    elapsed = time.perf_counter() - started
+    pool_stats = monitor.pool.stats()
+    monitor.stop_workers()
+    return elapsed, monitor.job_store.counts(), pool_stats
+
+
+def bench_ingest(args):
+    """同步（线程池）与异步流水线的吞吐对比"""
+    work_dir = tempfile.mkdtemp(prefix='ingest_bench_')
+    server, base_url = start_mock_dify(args.latency)
+    try:
+        _prepare_env(work_dir, base_url)
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import file_monitor_final as fm
+        logging.getLogger().setLevel(logging.WARNING)
+
+        paths = _make_files(os.environ['MONITOR_DIR'], args.files, args.size)
+        print(f"文件数: {args.files}, 单文件 {args.size} 字节, 模拟接口延迟 {args.latency * 1000:.0f}ms")
+        print(f"线程池大小: {fm.config.WORKER_POOL_SIZE}, 异步在途上限: {fm.config.ASYNC_MAX_IN_FLIGHT}, "
+              f"接口并发: chat={fm.config.ASYNC_CHAT_CONCURRENCY} dataset={fm.config.ASYNC_UPLOAD_CONCURRENCY}")
+        for mode in args.modes.split(','):
+            MockDifyHandler.reset(args.latency)
+            elapsed, counts, pool_stats = _run_ingest(fm, mode, paths, work_dir, args.timeout)
+            print(f"[{mode:>6}] 耗时 {elapsed:7.2f}s  吞吐 {len(paths) / elapsed:7.1f} 文件/s  "
+                  f"任务 {counts}  服务端最大并发 {MockDifyHandler.max_active}  请求 {MockDifyHandler.requests}")
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def make_pdf(path, pages, lines_per_page=40):
+    """生成每页若干行文本的测试PDF（不依赖第三方库）"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        lines = ''.join(f"(Page {page + 1} line {i}: benchmark text for streaming extraction) Tj T* "
+                        for i in range(lines_per_page))
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td {lines} ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        content_no = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_no} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode('latin-1')
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1')
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode('latin-1')
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode('latin-1')
+    with open(path, 'wb') as f:
+        f.write(out)
+
+
+def _timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+def bench_pdf(args):
+    """PDF提取：逐页拼接全文（旧实现）与字符预算截断"""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import PyPDF2
+    from pdf_extract import extract_pdf_text
+
+    def legacy(path):
+        with open(path, 'rb') as f:
+            text = ""
+            for page in PyPDF2.PdfReader(f).pages:
+                page_text = page.extract_text()
+                if page_text:
+                    text += page_text + "\n"
+            return text
+
+    work_dir = tempfile.mkdtemp(prefix='pdf_bench_')
+    try:
+        path = os.path.join(work_dir, 'bench.pdf')
+        make_pdf(path, args.pages)
+        print(f"PDF: {args.pages} 页, {os.path.getsize(path) // 1024} KB, 字符预算 {args.budget}")
+        seconds, text = _timed(legacy, path)
+        print(f"  逐页拼接全文     {seconds:7.3f}s  {len(text)} 字符")
+        seconds, text = _timed(extract_pdf_text, path, max_chars=args.budget)
+        print(f"  字符预算截断     {seconds:7.3f}s  {len(text)} 字符")
+        seconds, text = _timed(extract_pdf_text, path)
+        print(f"  顺序全文         {seconds:7.3f}s  {len(text)} 字符")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def make_workbook(path, sheets, rows, cols):
+    """生成多工作表的测试工作簿"""
+    import openpyxl
+    workbook = openpyxl.Workbook(write_only=True)
+    for sheet_no in range(sheets):
+        sheet = workbook.create_sheet(f"Sheet{sheet_no + 1}")
+        sheet.append([f"列{col + 1}" for col in range(cols)])
+        for row in range(rows):
+            sheet.append([row * cols + col for col in range(cols)])
+    workbook.save(path)
+
+
+def bench_excel(args):
+    """Excel/CSV提取：逐表 read_excel（旧实现）与只读流式读取"""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import pandas as pd
+    from table_extract import extract_xlsx_text, extract_csv_text
+
+    def legacy(path):
+        excel_file = pd.ExcelFile(path)
+        content = []
+        for sheet_name in excel_file.sheet_names:
+            df = pd.read_excel(path, sheet_name=sheet_name, nrows=5)
+            content.append(f"工作表: {sheet_name}")
+            content.append(str(df))
+        return '\n'.join(content)
+
+    def legacy_text(path):
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            return f.read()
+
+    work_dir = tempfile.mkdtemp(prefix='excel_bench_')
+    try:
+        path = os.path.join(work_dir, 'bench.xlsx')
+        make_workbook(path, args.sheets, args.rows, args.cols)
+        print(f"工作簿: {args.sheets} 个工作表 x {args.rows} 行 x {args.cols} 列, {os.path.getsize(path) // 1024} KB")
+        seconds, text = _timed(legacy, path)
+        print(f"  pandas逐表读取   {seconds:7.3f}s  {len(text)} 字符")
+        seconds, text = _timed(extract_xlsx_text, path, max_chars=args.budget)
+        print(f"  只读流式读取     {seconds:7.3f}s  {len(text)} 字符")
+
+        csv_path = os.path.join(work_dir, 'bench.csv')
+        with open(csv_path, 'w', encoding='utf-8') as f:
+            f.write(','.join(f"列{col + 1}" for col in range(args.cols)) + '\n')
+            for row in range(args.rows * args.sheets):
+                f.write(','.join(str(row * args.cols + col) for col in range(args.cols)) + '\n')
+        print(f"CSV: {args.rows * args.sheets} 行, {os.path.getsize(csv_path) // 1024} KB")
+        seconds, text = _timed(legacy_text, csv_path)
+        print(f"  按文本整体读取   {seconds:7.3f}s  {len(text)} 字符")
+        seconds, text = _timed(extract_csv_text, csv_path, max_chars=args.budget)
+        print(f"  CSV流式读取      {seconds:7.3f}s  {len(text)} 字符")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def make_photo(path, width, height, quality=95):
+    """生成带EXIF的噪声照片（噪声几乎不可压缩，文件大小接近真实相机原图）"""
+    from PIL import Image
+    image = Image.frombytes('RGB', (width, height), os.urandom(width * height * 3))
+    exif = Image.Exif()
+    exif[0x010F] = 'BenchCam'
+    exif[0x0110] = 'Model X'
+    exif[0x0132] = '2024:01:02 13:30:00'
+    image.save(path, format='JPEG', quality=quality, exif=exif)
+
+
+def _legacy_image_info(path):
+    """旧实现：EXIF全部转字符串，整个文件base64后写入JSON"""
+    import base64
+    from PIL import Image, ExifTags
+    with Image.open(path) as img:
+        info = {'format': img.format, 'size': img.size, 'mode': img.mode, 'filename': os.path.basename(path)}
+        exif_data = img._getexif()
+        if exif_data:
+            for tag, value in exif_data.items():
+                info[f'exif_{ExifTags.TAGS.get(tag, tag)}'] = str(value)
+        with open(path, 'rb') as f:
+            info['base64_data'] = base64.b64encode(f.read()).decode('utf-8')
+        return json.dumps(info, ensure_ascii=False)
+
+
+def _peak_rss_kb():
+    """本进程的峰值RSS（ru_maxrss 会跨 exec 继承父进程的值，Linux上优先读 VmHWM）"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _image_job(method, paths, db_path, size):
+    """子进程任务：返回 (耗时, 输出字节数, 峰值RSS增量MB)"""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from image_extract import image_info, make_thumbnail, ThumbnailCache
+    cache = ThumbnailCache(db_path) if method.startswith('cached') else None
+    baseline = _peak_rss_kb()
+    started = time.perf_counter()
+    output = 0
+    for path in paths:
+        if method == 'legacy':
+            output += len(_legacy_image_info(path))
+        elif method == 'info':
+            output += len(json.dumps(image_info(path), ensure_ascii=False))
+        elif method == 'thumbnail':
+            output += len(make_thumbnail(path, size))
+        else:
+            output += len(cache.get_or_create(path, os.path.basename(path), size))
+    seconds = time.perf_counter() - started
+    peak = _peak_rss_kb()
+    return seconds, output, (peak - baseline) / 1024
+
+
+def bench_image(args):
+    """图片元数据：旧实现（整图base64）与只读文件头、缩略图及其缓存；每种方式在独立进程中测峰值内存"""
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    work_dir = tempfile.mkdtemp(prefix='image_bench_')
+    try:
+        width = int((args.megapixels * 1e6 * 3 / 2) ** 0.5)
+        height = width * 2 // 3
+        paths = []
+        for index in range(args.count):
+            path = os.path.join(work_dir, f"photo{index}.jpg")
+            make_photo(path, width, height)
+            paths.append(path)
+        size_mb = sum(os.path.getsize(p) for p in paths) / args.count / 1024 / 1024
+        print(f"图片: {args.count} 张 {width}x{height} JPEG, 平均 {size_mb:.1f} MB, 缩略图长边 {args.size}")
+        db_path = os.path.join(work_dir, 'state.db')
+        methods = [('legacy', '整图base64（旧）'), ('info', '只读文件头/EXIF'),
+                   ('thumbnail', '生成缩略图'), ('cached-cold', '缩略图缓存（首次）'),
+                   ('cached-warm', '缩略图缓存（命中）')]
+        ctx = multiprocessing.get_context('spawn')
+        for method, label in methods:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+                seconds, output, peak = executor.submit(_image_job, method, paths, db_path, args.size).result()
+            print(f"  {label:<16} {seconds / args.count * 1000:8.1f}ms/张  输出 {output / args.count / 1024:9.1f} KB/张  "
+                  f"峰值内存增量 {peak:7.1f} MB")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+_END_OF_CHAIN = 0xFFFFFFFE
+_FREE_SECTOR = 0xFFFFFFFF
+_FAT_SECTOR = 0xFFFFFFFD
+
+
+def _write_cfb(path, streams):
+    """写出只含根存储下若干流的OLE2复合文档（512字节扇区，小于4096字节的流放入迷你流）"""
+    def sectors(size, unit=512):
+        return (size + unit - 1) // unit
+
+    mini_data, minifat, entries, big = b'', [], [], []
+    for name, data in streams:
+        if len(data) < 4096:
+            start = len(mini_data) // 64
+            count = sectors(len(data), 64)
+            minifat += [start + i + 1 for i in range(count - 1)] + [_END_OF_CHAIN]
+            mini_data += data.ljust(count * 64, b'\x00')
+            entries.append([name, start, len(data)])
+        else:
+            entry = [name, None, len(data)]
+            entries.append(entry)
+            big.append((entry, data))
+
+    chains = [('dir', sectors((len(entries) + 1) * 128)), ('minifat', sectors(len(minifat) * 4)),
+              ('mini', sectors(len(mini_data)))] + [(entry, sectors(len(data))) for entry, data in big]
+    total = sum(count for _, count in chains)
+    fat_count = 1
+    while fat_count * 128 < total + fat_count:
+        fat_count += 1
+    if fat_count > 109:
+        raise ValueError("测试文档过大")
+    fat = [_FAT_SECTOR] * fat_count
+    starts = {}
+    for key, count in chains:
+        start = len(fat) if count else _END_OF_CHAIN
+        fat += [len(fat) + i + 1 for i in range(count - 1)] + ([_END_OF_CHAIN] if count else [])
+        starts[key if isinstance(key, str) else id(key)] = start
+    for entry, _ in big:
+        entry[1] = starts[id(entry)]
+    fat += [_FREE_SECTOR] * (fat_count * 128 - len(fat))
+
+    def dir_entry(name, kind, start, size, child=_FREE_SECTOR, right=_FREE_SECTOR):
+        raw = (name + '\x00').encode('utf-16-le')
+        return (raw.ljust(64, b'\x00') + struct.pack('<HBB3I', len(raw), kind, 1, _FREE_SECTOR, right, child)
+                + b'\x00' * 36 + struct.pack('<IQ', start, size))
+
+    directory = dir_entry('Root Entry', 5, starts['mini'], len(mini_data), child=1)
+    for i, (name, start, size) in enumerate(entries):
+        directory += dir_entry(name, 2, start, size, right=i + 2 if i + 1 < len(entries) else _FREE_SECTOR)
+    directory = directory.ljust(sectors(len(directory)) * 512, b'\x00')
+
+    header = (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + b'\x00' * 16
+              + struct.pack('<HHHHH', 0x3E, 3, 0xFFFE, 9, 6) + b'\x00' * 6
+              + struct.pack('<9I', 0, fat_count, starts['dir'], 0, 4096, starts['minifat'],
+                            sectors(len(minifat) * 4), _END_OF_CHAIN, 0)
+              + struct.pack('<109I', *(list(range(fat_count)) + [_FREE_SECTOR] * (109 - fat_count))))
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(struct.pack(f'<{len(fat)}I', *fat))
+        f.write(directory)
+        f.write(struct.pack(f'<{len(minifat)}I', *minifat).ljust(sectors(len(minifat) * 4) * 512, b'\x00'))
+        f.write(mini_data.ljust(sectors(len(mini_data)) * 512, b'\x00'))
+        for _, data in big:
+            f.write(data.ljust(sectors(len(data)) * 512, b'\x00'))
+
+
+def make_doc(path, paragraphs):
+    """生成 Word 97 格式的测试文档：一个8位压缩片段（含超链接域）和一个UTF-16片段"""
+    text_a = 'Benchmark document\r\x13 HYPERLINK "http://example.com" \x14example link\x15 in text\r'
+    text_b = ''.join(f"第{i + 1}段：这是用于测试的段落，包含中文内容和 English words。\r" for i in range(paragraphs))
+    offset_a = 1024
+    offset_b = offset_a + len(text_a) + (len(text_a) % 2)
+    fib_rg_lw = [0] * 22
+    fib_rg_lw[3] = len(text_a) + len(text_b)
+    clx_pieces = [(offset_a * 2) | 0x40000000, offset_b]
+    plc = struct.pack('<3I', 0, len(text_a), len(text_a) + len(text_b))
+    plc += b''.join(struct.pack('<HIH', 0, fc, 0) for fc in clx_pieces)
+    clx = b'\x02' + struct.pack('<I', len(plc)) + plc
+    fc_lcb = [0] * (93 * 2)
+    fc_lcb[33 * 2 + 1] = len(clx)
+    fib = (struct.pack('<HH', 0xA5EC, 0x00C1) + b'\x00' * 6 + struct.pack('<H', 0x0200) + b'\x00' * 20
+           + struct.pack('<H', 14) + b'\x00' * 28 + struct.pack('<H', 22) + struct.pack('<22i', *fib_rg_lw)
+           + struct.pack('<H', 93) + struct.pack(f'<{93 * 2}I', *fc_lcb) + struct.pack('<H', 0))
+    word = (fib.ljust(offset_a, b'\x00') + text_a.encode('cp1252')).ljust(offset_b, b'\x00')
+    word += text_b.encode('utf-16-le')
+    _write_cfb(path, [('WordDocument', word), ('1Table', clx)])
+
+
+def bench_doc(args):
+    """旧版.doc：外部工具/二进制解码 + 临时.docx往返（旧实现）与直接解析"""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import subprocess
+    from doc_extract import extract_doc_text
+    from file_monitor_final import FileConverter
+
+    def legacy_analysis(path):
+        for tool in ('antiword', 'catdoc'):
+            try:
+                result = subprocess.run([tool, path], capture_output=True, text=True, timeout=30)
+                if result.returncode == 0:
+                    return result.stdout
+            except Exception:
+                pass
+        with open(path, 'rb') as f:
+            return f.read().decode('utf-8', errors='ignore')[:5000]
+
+    def legacy_upload(path):
+        from docx import Document
+        converted = FileConverter.convert_doc_to_docx(path)
+        try:
+            with open(converted, 'rb') as f:
+                data = f.read()
+            return '\n'.join(p.text for p in Document(converted).paragraphs), data
+        finally:
+            os.remove(converted)
+
+    def native_upload(path):
+        return FileConverter._create_docx_bytes(extract_doc_text(path), os.path.basename(path))
+
+    work_dir = tempfile.mkdtemp(prefix='doc_bench_')
+    try:
+        path = os.path.join(work_dir, 'bench.doc')
+        make_doc(path, args.paragraphs)
+        print(f".doc: {args.paragraphs} 段, {os.path.getsize(path) // 1024} KB")
+        seconds, text = _timed(legacy_analysis, path)
+        print(f"  外部工具/二进制解码（分析，旧）  {seconds:7.3f}s  {len(text)} 字符")
+        seconds, (text, _) = _timed(legacy_upload, path)
+        print(f"  转换临时.docx再解析（上传，旧）  {seconds:7.3f}s  {len(text)} 字符")
+        seconds, text = _timed(extract_doc_text, path, max_chars=args.budget)
+        print(f"  直接解析（字符预算）            {seconds:7.3f}s  {len(text)} 字符")
+        seconds, text = _timed(extract_doc_text, path)
+        print(f"  直接解析（全文）                {seconds:7.3f}s  {len(text)} 字符")
+        seconds, data = _timed(native_upload, path)
+        print(f"  直接解析并在内存生成.docx        {seconds:7.3f}s  {len(data) // 1024} KB")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def make_binary_with_text(path, size_mb, blocks):
+    """生成夹杂 UTF-16LE / GBK / UTF-8 文本块的随机二进制文件，返回嵌入的句子"""
+    encodings = ['utf-16-le', 'gbk', 'utf-8']
+    chunk = int(size_mb * 1024 * 1024) // max(1, blocks)
+    sentences = []
+    with open(path, 'wb') as f:
+        for index in range(blocks):
+            f.write(os.urandom(chunk))
+            sentence = f"第{index + 1}号文本块：这是嵌入在二进制数据中的中文段落，用于测试文本抢救。"
+            sentences.append(sentence)
+            f.write(sentence.encode(encodings[index % len(encodings)]))
+    return sentences
+
+
+def bench_salvage(args):
+    """二进制文本抢救：逐字符过滤多种编码的全量解码（旧实现）与内存映射上的向量化扫描"""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import text_salvage
+    from text_salvage import salvage_text
+
+    def legacy(path):
+        with open(path, 'rb') as f:
+            content = f.read()
+        for encoding in ['utf-8', 'gbk', 'gb2312', 'latin-1', 'cp1252']:
+            decoded = content.decode(encoding, errors='ignore')
+            printable_chars = ''.join(char for char in decoded if char.isprintable() or char in '\n\r\t')
+            if len(printable_chars) > 100:
+                return printable_chars[:10000]
+        return ''
+
+    work_dir = tempfile.mkdtemp(prefix='salvage_bench_')
+    try:
+        path = os.path.join(work_dir, 'bench.bin')
+        sentences = make_binary_with_text(path, args.size, args.blocks)
+        print(f"二进制文件: {args.size} MB, 嵌入 {args.blocks} 个文本块（UTF-16LE/GBK/UTF-8轮换）")
+
+        def report(label, seconds, text):
+            # 文本块前紧邻的随机字节可能和首个GBK字符拼成一个错字，首字不计入比较
+            found = sum(1 for sentence in sentences if sentence[1:] in text)
+            print(f"  {label:<22} {seconds:7.3f}s  {len(text):8d} 字符  找回 {found}/{len(sentences)} 个文本块")
+
+        report('全量解码逐字符过滤（旧）', *_timed(legacy, path))
+        report(f'向量化扫描（{args.budget}字符）', *_timed(salvage_text, path, max_chars=args.budget))
+        report('向量化扫描（全文件）', *_timed(salvage_text, path, max_chars=None))
+        if text_salvage.NUMPY_AVAILABLE:
+            text_salvage.NUMPY_AVAILABLE = False
+            try:
+                report('字节正则扫描（全文件）', *_timed(salvage_text, path, max_chars=None))
+            finally:
+                text_salvage.NUMPY_AVAILABLE = True
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def make_text_log(path, size_mb, encoding='gbk'):
+    """生成开头为纯ASCII、后面夹杂中文的日志文件"""
+    ascii_line = "2024-05-01 12:00:00 INFO worker started, processing queue item\n"
+    mixed_line = "2024-05-01 12:00:01 INFO 文件已处理：实验报告.docx，上传到知识库成功\n"
+    with open(path, 'wb') as f:
+        f.write((ascii_line * 2000).encode(encoding))
+        block = ((ascii_line + mixed_line) * 1000).encode(encoding)
+        for _ in range(max(1, int(size_mb * 1024 * 1024) // len(block))):
+            f.write(block)
+
+
+def _text_job(method, path, budget):
+    """子进程任务：返回 (耗时, 输出字符数, 是否与按GBK解码的结果一致, 峰值RSS增量MB)"""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from text_extract import read_text
+    baseline = _peak_rss_kb()
+    started = time.perf_counter()
+    if method == 'legacy':
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            text = f.read()
+    else:
+        text = read_text(path, max_chars=budget if method == 'budget' else 200000)
+    seconds = time.perf_counter() - started
+    peak = _peak_rss_kb()
+    with open(path, 'rb') as f:
+        expected = f.read(len(text) * 2).decode('gbk', errors='ignore')[:len(text)]
+    return seconds, len(text), text == expected, (peak - baseline) / 1024
+
+
+def bench_text(args):
+    """纯文本：整个文件按UTF-8忽略错误读取（旧实现）与编码识别 + 按预算增量解码；每种方式在独立进程中测峰值内存"""
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    work_dir = tempfile.mkdtemp(prefix='text_bench_')
+    try:
+        path = os.path.join(work_dir, 'bench.log')
+        make_text_log(path, args.size)
+        print(f"GBK日志: {os.path.getsize(path) / 1024 / 1024:.0f} MB（开头约130KB为纯ASCII）")
+        methods = [('legacy', '整文件UTF-8读取（旧）'), ('budget', f'识别编码（{args.budget}字符）'),
+                   ('default', '识别编码（默认上限20万字符）')]
+        ctx = multiprocessing.get_context('spawn')
+        for method, label in methods:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+                seconds, chars, correct, peak = executor.submit(_text_job, method, path, args.budget).result()
+            print(f"  {label:<20} {seconds:7.3f}s  {chars:10d} 字符  内容{'正确' if correct else '乱码'}  "
+                  f"峰值内存增量 {peak:7.1f} MB")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def make_pptx(path, slides, work_dir, megapixels=1.0):
+    """生成每页含一张照片、一个文本框和一个表格的演示文稿"""
+    from pptx import Presentation
+    from pptx.util import Inches
+    width = int((megapixels * 1e6 * 3 / 2) ** 0.5)
+    prs = Presentation()
+    for index in range(slides):
+        slide = prs.slides.add_slide(prs.slide_layouts[5])
+        slide.shapes.title.text = f"第{index + 1}页：季度项目进展汇报"
+        photo = os.path.join(work_dir, 'photo.jpg')
+        make_photo(photo, width, width * 2 // 3, quality=85)
+        slide.shapes.add_picture(photo, Inches(0.5), Inches(1.5), width=Inches(5))
+        box = slide.shapes.add_textbox(Inches(6), Inches(1.5), Inches(3.5), Inches(2)).text_frame
+        box.text = "本页介绍实验设计、数据采集过程和初步结论。"
+        box.add_paragraph().text = "下一步计划：扩大样本并完成对照实验。"
+        table = slide.shapes.add_table(2, 2, Inches(6), Inches(4), Inches(3.5), Inches(1)).table
+        for row in range(2):
+            for col in range(2):
+                table.cell(row, col).text = f"指标{row}{col}"
+    prs.save(path)
+    os.remove(photo)
+
+
+def _legacy_pptx_text(path):
+    """旧实现：加载整个演示文稿，遍历所有形状"""
+    from pptx import Presentation
+    prs = Presentation(path)
+    text_content = []
+    for i, slide in enumerate(prs.slides):
+        text_content.append(f"--- 幻灯片 {i+1} ---")
+        for shape in slide.shapes:
+            if hasattr(shape, "text") and shape.text.strip():
+                text_content.append(shape.text)
+    return '\n'.join(text_content)
+
+
+def _pptx_job(method, path, budget):
+    """子进程任务：返回 (耗时, 输出字符数, 峰值RSS增量MB)"""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from slide_extract import extract_pptx_text
+    if method == 'legacy':
+        import pptx  # 导入时间不计入
+    baseline = _peak_rss_kb()
+    started = time.perf_counter()
+    if method == 'legacy':
+        text = _legacy_pptx_text(path)
+    else:
+        text = extract_pptx_text(path, max_chars=budget if method == 'budget' else None)
+    seconds = time.perf_counter() - started
+    peak = _peak_rss_kb()
+    return seconds, len(text), (peak - baseline) / 1024
+
+
+def bench_pptx(args):
+    """PPTX：python-pptx加载整个演示文稿（旧实现）与流式解析幻灯片XML；每种方式在独立进程中测峰值内存"""
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    work_dir = tempfile.mkdtemp(prefix='pptx_bench_')
+    try:
+        path = os.path.join(work_dir, 'bench.pptx')
+        make_pptx(path, args.slides, work_dir, args.megapixels)
+        print(f"演示文稿: {args.slides} 页（每页一张照片）, {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+        methods = [('legacy', 'python-pptx全部形状（旧）'), ('budget', f'流式解析（{args.budget}字符）'),
+                   ('full', '流式解析（全部幻灯片）')]
+        ctx = multiprocessing.get_context('spawn')
+        for method, label in methods:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+                seconds, chars, peak = executor.submit(_pptx_job, method, path, args.budget).result()
+            print(f"  {label:<22} {seconds:7.3f}s  {chars:8d} 字符  峰值内存增量 {peak:7.1f} MB")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+_STARTUP_SCRIPT = """
+import sys, time, json
+started = time.perf_counter()
+exec(sys.argv[1])
+imported = time.perf_counter() - started
+first = None
+if len(sys.argv) > 2:
+    started = time.perf_counter()
+    file_monitor_final.EnhancedFileAnalyzer.extract_text_content(sys.argv[2], max_chars=4000)
+    first = time.perf_counter() - started
+heavy = [name for name in ('pandas', 'pptx', 'PyPDF2', 'docx', 'PIL', 'flask', 'numpy') if name in sys.modules]
+print(json.dumps([imported, heavy, first]))
+"""
+
+
+def _startup_run(statement, work_dir, sample=None):
+    """在新进程中执行导入语句，返回 (导入耗时, 已加载的重量级库, 首次提取耗时)"""
+    import subprocess
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    args = [sys.executable, '-c', _STARTUP_SCRIPT, statement] + ([sample] if sample else [])
+    # 在临时目录运行，不在仓库里留下任何文件
+    output = subprocess.run(args, cwd=work_dir, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def bench_startup(args):
+    """冷启动：导入主模块的耗时、加载了哪些解析库，以及各格式首次提取（含延迟导入）的耗时"""
+    import statistics
+    work_dir = tempfile.mkdtemp(prefix='startup_bench_')
+    try:
+        txt = os.path.join(work_dir, 'sample.txt')
+        with open(txt, 'w', encoding='utf-8') as f:
+            f.write('启动测试文本\n' * 100)
+        pdf = os.path.join(work_dir, 'sample.pdf')
+        make_pdf(pdf, 5)
+
+        legacy = 'import pandas, pptx, PyPDF2, docx, PIL, flask, numpy'
+        times = [_startup_run(legacy, work_dir)[0] for _ in range(args.runs)]
+        print(f"  旧实现顶层导入的解析库          {statistics.median(times):7.3f}s（仅导入这些库）")
+
+        statement = 'import file_monitor_final'
+        runs = [_startup_run(statement, work_dir) for _ in range(args.runs)]
+        heavy = runs[0][1]
+        print(f"  import file_monitor_final       {statistics.median(r[0] for r in runs):7.3f}s  "
+              f"已加载: {', '.join(heavy) if heavy else '无'}")
+        for label, sample in (('.txt', txt), ('.pdf', pdf)):
+            runs = [_startup_run(statement, work_dir, sample) for _ in range(args.runs)]
+            print(f"  首次提取{label:<5}（含延迟导入）     {statistics.median(r[2] for r in runs):7.3f}s  "
+                  f"已加载: {', '.join(runs[0][1]) or '无'}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _upload_job(method, paths, base_url):
+    """子进程任务：并发上传全部文件，返回 (耗时, 成功数, 峰值RSS增量MB)"""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import asyncio
+    import httpx
+    from io import BytesIO
+    from http_client import DifyHttpClient
+    from multipart_stream import MultipartEncoder
+    from concurrent.futures import ThreadPoolExecutor
+    url = f"{base_url}/v1/datasets/kb/document/create-by-file"
+    data = {'name': 'bench.pdf'}
+    baseline = _peak_rss_kb()
+    started = time.perf_counter()
+
+    if method.startswith('sync'):
+        client = DifyHttpClient(pool_maxsize=len(paths))
+
+        def upload(path):
+            if method == 'sync-legacy':
+                # 旧实现：整个文件读入内存，再由 requests 编码出完整的请求体
+                with open(path, 'rb') as f:
+                    files = {'file': ('bench.pdf', BytesIO(f.read()), 'application/pdf')}
+                return client.post(url, files=files, data=data, timeout=300).status_code
+            body = MultipartEncoder(fields=data, files={'file': ('bench.pdf', path, 'application/pdf')})
+            try:
+                return client.post(url, headers=body.headers(), data=body, timeout=300).status_code
+            finally:
+                body.close()
+
+        with ThreadPoolExecutor(max_workers=len(paths)) as executor:
+            codes = list(executor.map(upload, paths))
+    else:
+        async def upload(client, path):
+            if method == 'async-legacy':
+                with open(path, 'rb') as f:
+                    files = {'file': ('bench.pdf', f.read(), 'application/pdf')}
+                return (await client.post(url, files=files, data=data)).status_code
+            body = MultipartEncoder(fields=data, files={'file': ('bench.pdf', path, 'application/pdf')})
+            try:
+                return (await client.post(url, headers=body.headers(), content=body.async_stream())).status_code
+            finally:
+                body.close()
+
+        async def run():
+            async with httpx.AsyncClient(timeout=300) as client:
+                return await asyncio.gather(*(upload(client, path) for path in paths))
+
+        codes = asyncio.run(run())
+    seconds = time.perf_counter() - started
+    return seconds, sum(1 for code in codes if code == 200), (_peak_rss_kb() - baseline) / 1024
+
+
+def bench_upload(args):
+    """文件上传：整个文件读入内存后编码请求体（旧实现）与流式 multipart；每种方式在独立进程中测峰值内存"""
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    server, base_url = start_mock_dify()
+    work_dir = tempfile.mkdtemp(prefix='upload_bench_')
+    try:
+        paths = []
+        for index in range(args.files):
+            path = os.path.join(work_dir, f"upload{index}.bin")
+            with open(path, 'wb') as f:
+                for _ in range(args.size):
+                    f.write(os.urandom(1024 * 1024))
+            paths.append(path)
+        print(f"并发上传 {args.files} 个 {args.size} MB 文件")
+        methods = [('sync-legacy', '同步：整体读入（旧）'), ('sync-stream', '同步：流式multipart'),
+                   ('async-legacy', '异步：整体读入（旧）'), ('async-stream', '异步：流式multipart')]
+        ctx = multiprocessing.get_context('spawn')
+        for method, label in methods:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+                seconds, ok, peak = executor.submit(_upload_job, method, paths, base_url).result()
+            print(f"  {label:<18} {seconds:7.2f}s  成功 {ok}/{len(paths)}  峰值内存增量 {peak:8.1f} MB")
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _sequential_targets(fm, monitor, path):
+    """旧流程：先分析并上传索引，再上传原文件"""
+    content_hash = fm.hash_file(path)
+    known, (_, index_document), (_, original_document) = monitor._lookup_targets(path, content_hash, False)
+    index_ok = monitor._index_and_upload(path, content_hash, known, None, index_document)
+    return monitor._upload_original(path, content_hash, original_document) and index_ok
+
+
+def bench_fanout(args):
+    """单个文件的端到端耗时：索引与原文件依次上传（旧）与并发扇出"""
+    work_dir = tempfile.mkdtemp(prefix='fanout_bench_')
+    server, base_url = start_mock_dify(args.latency)
+    try:
+        _prepare_env(work_dir, base_url)
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import file_monitor_final as fm
+        logging.getLogger().setLevel(logging.WARNING)
+
+        paths = _make_files(os.environ['MONITOR_DIR'], args.files, 4096)
+        print(f"文件数: {args.files}, 模拟接口延迟 {args.latency * 1000:.0f}ms（分析、索引上传、原文件上传各一次请求）")
+        methods = [('sequential', '依次上传（旧）', lambda monitor, path: _sequential_targets(fm, monitor, path)),
+                   ('fanout', '并发扇出', lambda monitor, path: monitor.process_file(path))]
+        for name, label, run in methods:
+            # 每种方式使用独立的状态库，避免内容去重跳过处理
+            fm.config.STATE_DB_PATH = os.path.join(work_dir, f"state_{name}.db")
+            monitor = fm.FileMonitor()
+            MockDifyHandler.reset(args.latency)
+            latencies = []
+            ok = 0
+            for path in paths:
+                started = time.perf_counter()
+                ok += bool(run(monitor, path))
+                latencies.append(time.perf_counter() - started)
+            monitor.stop_workers()
+            latencies.sort()
+            print(f"  {label:<10} 平均 {sum(latencies) / len(latencies) * 1000:7.1f}ms  "
+                  f"P95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:7.1f}ms  成功 {ok}/{len(paths)}  "
+                  f"请求 {MockDifyHandler.requests}")
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_batch(args):
+    """大量索引摘要同时上传：逐个 multipart create-by-file（旧）与限并发的 create-by-text"""
+    from concurrent.futures import ThreadPoolExecutor
+    work_dir = tempfile.mkdtemp(prefix='batch_bench_')
+    server, base_url = start_mock_dify(args.latency)
+    try:
+        _prepare_env(work_dir, base_url)
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import file_monitor_final as fm
+        logging.getLogger().setLevel(logging.WARNING)
+
+        summaries = [(f"doc_{i:05d}_index.txt",
+                      f"文件名: doc_{i:05d}.pdf\n文件类型: 技术文档\n内容总结: 第{i}份基准测试文档的模拟摘要。\n"
+                      f"生成方法: Dify Chatflow\n文件大小: {1000 + i} 字节")
+                     for i in range(args.count)]
+        print(f"摘要数: {args.count}, 并发提交方: {args.producers}, 模拟接口延迟 {args.latency * 1000:.0f}ms")
+        monitor = fm.FileMonitor()
+        uploader = monitor.uploader
+        kb = fm.config.TXT_KNOWLEDGE_BASE_ID
+        methods = [
+            ('逐个multipart（旧）', lambda item: uploader._send_document(item[0], item[1].encode('utf-8'), kb)),
+            ('create-by-text', lambda item: monitor._index_executor().submit(
+                uploader.upload_text, item[0], item[1], kb).result()),
+        ]
+        for label, upload in methods:
+            MockDifyHandler.reset(args.latency)
+            started = time.perf_counter()
+            cpu_started = time.process_time()
+            with ThreadPoolExecutor(max_workers=args.producers) as executor:
+                ok = sum(1 for document_id in executor.map(upload, summaries) if document_id)
+            elapsed = time.perf_counter() - started
+            cpu = time.process_time() - cpu_started
+            print(f"  {label:<18} 耗时 {elapsed:6.2f}s  成功 {ok}/{args.count}  "
+                  f"客户端CPU {cpu * 1000 / args.count:5.2f}ms/条  请求体 {MockDifyHandler.body_bytes / args.count:6.0f}字节/条  "
+                  f"服务端最大并发 {MockDifyHandler.max_active}")
+        monitor.stop_workers()
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_overload(args):
+    """服务端过载（超出容量返回429）时：只靠重试（旧）与AIMD自适应限流的对比"""
+    from concurrent.futures import ThreadPoolExecutor
+    server, base_url = start_mock_dify(args.latency)
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import endpoint_guard
+        from http_client import DifyHttpClient
+        logging.getLogger().setLevel(logging.ERROR)
+        url = f"{base_url}/v1/chat-messages"
+        print(f"请求数: {args.requests}, 并发: {args.workers}, 服务端容量 {args.capacity}/秒, "
+              f"模拟接口延迟 {args.latency * 1000:.0f}ms")
+        methods = [
+            ('只靠重试（旧）', None),
+            ('AIMD自适应限流', endpoint_guard.AdaptiveRateLimiter()),
+        ]
+        for label, limiter in methods:
+            # 熔断器不参与对比：这里没有任务队列可挂起，被拒绝的请求只能算失败
+            endpoint_guard._guards['chat'] = endpoint_guard.EndpointGuard('chat', limiter=limiter)
+            client = DifyHttpClient(pool_maxsize=args.workers, max_retries=3, backoff=0.5, backoff_max=5.0)
+            MockDifyHandler.reset(args.latency, args.capacity)
+
+            def call(_):
+                try:
+                    return client.post(url, json={'query': 'benchmark'}).status_code == 200
+                except Exception:
+                    return False
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                ok = sum(1 for success in executor.map(call, range(args.requests)) if success)
+            elapsed = time.perf_counter() - started
+            sent = MockDifyHandler.requests.get('chat-messages', 0) + MockDifyHandler.throttled
+            print(f"  {label:<14} 耗时 {elapsed:6.2f}s  成功 {ok}/{args.requests}  发出请求 {sent:5d}  "
+                  f"被429拒绝 {MockDifyHandler.throttled:5d}  有效吞吐 {ok / elapsed:6.1f}/秒")
+            if limiter is not None:
+                print(f"  限流器状态: {limiter.stats()}")
+            client.session.close()
+    finally:
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文件索引流水线性能基准测试")
+    sub = parser.add_subparsers(dest='command')
+
+    ingest = sub.add_parser('ingest', help='同步线程池与异步流水线的吞吐对比')
+    ingest.add_argument('--files', type=int, default=200)
+    ingest.add_argument('--size', type=int, default=8192, help='单个文件大小（字节）')
+    ingest.add_argument('--latency', type=float, default=0.2, help='模拟接口延迟（秒）')
+    ingest.add_argument('--modes', default='thread,async')
+    ingest.add_argument('--timeout', type=float, default=600)
+    ingest.set_defaults(func=bench_ingest)
+
+    pdf = sub.add_parser('pdf', help='PDF流式提取')
+    pdf.add_argument('--pages', type=int, default=600)
+    pdf.add_argument('--budget', type=int, default=4000, help='字符预算')
+    pdf.set_defaults(func=bench_pdf)
+
+    excel = sub.add_parser('excel', help='Excel/CSV流式提取')
+    excel.add_argument('--sheets', type=int, default=50)
+    excel.add_argument('--rows', type=int, default=2000)
+    excel.add_argument('--cols', type=int, default=20)
+    excel.add_argument('--budget', type=int, default=4000, help='字符预算')
+    excel.set_defaults(func=bench_excel)
+
+    image = sub.add_parser('image', help='图片元数据与缩略图')
+    image.add_argument('--count', type=int, default=5)
+    image.add_argument('--megapixels', type=float, default=24, help='单张像素数（百万），24MP噪声图约20MB')
+    image.add_argument('--size', type=int, default=512, help='缩略图长边')
+    image.set_defaults(func=bench_image)
+
+    doc = sub.add_parser('doc', help='旧版Word文档直接解析')
+    doc.add_argument('--paragraphs', type=int, default=20000)
+    doc.add_argument('--budget', type=int, default=4000, help='字符预算')
+    doc.set_defaults(func=bench_doc)
+
+    salvage = sub.add_parser('salvage', help='二进制文本抢救')
+    salvage.add_argument('--size', type=float, default=50, help='文件大小（MB）')
+    salvage.add_argument('--blocks', type=int, default=30, help='嵌入的文本块数')
+    salvage.add_argument('--budget', type=int, default=1000, help='字符预算')
+    salvage.set_defaults(func=bench_salvage)
+
+    text = sub.add_parser('text', help='纯文本编码识别与按预算读取')
+    text.add_argument('--size', type=float, default=500, help='文件大小（MB）')
+    text.add_argument('--budget', type=int, default=4000, help='字符预算')
+    text.set_defaults(func=bench_text)
+
+    pptx = sub.add_parser('pptx', help='PPTX流式提取')
+    pptx.add_argument('--slides', type=int, default=200)
+    pptx.add_argument('--megapixels', type=float, default=1.0, help='每页照片像素数（百万）')
+    pptx.add_argument('--budget', type=int, default=4000, help='字符预算')
+    pptx.set_defaults(func=bench_pptx)
+
+    startup = sub.add_parser('startup', help='冷启动导入耗时')
+    startup.add_argument('--runs', type=int, default=5)
+    startup.set_defaults(func=bench_startup)
+
+    upload = sub.add_parser('upload', help='并发大文件上传的内存占用')
+    upload.add_argument('--files', type=int, default=4)
+    upload.add_argument('--size', type=int, default=100, help='单个文件大小（MB）')
+    upload.set_defaults(func=bench_upload)
+
+    fanout = sub.add_parser('fanout', help='索引与原文件并发上传的单文件耗时')
+    fanout.add_argument('--files', type=int, default=20)
+    fanout.add_argument('--latency', type=float, default=0.2, help='模拟接口延迟（秒）')
+    fanout.set_defaults(func=bench_fanout)
+
+    batch = sub.add_parser('batch', help='索引摘要上传')
+    batch.add_argument('--count', type=int, default=2000)
+    batch.add_argument('--producers', type=int, default=64, help='同时提交摘要的处理任务数')
+    batch.add_argument('--latency', type=float, default=0.05, help='模拟接口延迟（秒）')
+    batch.set_defaults(func=bench_batch)
+
+    overload = sub.add_parser('overload', help='服务端过载时的自适应限流')
+    overload.add_argument('--requests', type=int, default=600)
+    overload.add_argument('--workers', type=int, default=32, help='并发请求线程数')
+    overload.add_argument('--capacity', type=int, default=40, help='模拟服务端每秒受理的请求数')
+    overload.add_argument('--latency', type=float, default=0.05, help='模拟接口延迟（秒）')
+    overload.set_defaults(func=bench_overload)
+
+    args = parser.parse_args()
+    # 被测模块和它启动的子进程都把日志写到临时目录，不写进仓库
+    os.environ.setdefault('LOG_DIR', tempfile.gettempdir())
+    if not getattr(args, 'func', None):
+        parser.print_help()
+        return
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# circuit_store.py - 各进程共享的Dify接口熔断状态
+import time
+from local_db import LocalDatabase
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS circuits (
+    endpoint TEXT PRIMARY KEY,
+    retry_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class CircuitStore:
+    """记录熔断中的接口及其重试时间
+
+    进程模式下请求在工作进程中发出，熔断器也在工作进程里；工作进程的熔断打开/关闭时写入这里，
+    主进程领取任务前据此判断：重试时间未到时不领取用到该接口的任务，已过重试时间但还没有恢复时
+    （半开）只放行一个试探任务。
+    """
+
+    def __init__(self, db_path):
+        self.db = LocalDatabase(db_path)
+        with self.db.lock:
+            self.db.conn.executescript(_SCHEMA)
+
+    def record(self, endpoint, retry_at):
+        """熔断打开时记录重试时间，关闭时（retry_at 为None）删除记录"""
+        if retry_at is None:
+            self.db.execute("DELETE FROM circuits WHERE endpoint = ?", (endpoint,))
+            return
+        self.db.execute(
+            "INSERT OR REPLACE INTO circuits (endpoint, retry_at, updated_at) VALUES (?, ?, ?)",
+            (endpoint, retry_at, time.time())
+        )
+
+    def state(self, endpoints):
+        """(最晚的重试时间戳或None, 是否有接口已过重试时间、等待试探)"""
+        now = time.time()
+        marks = ','.join('?' * len(endpoints))
+        times = [row['retry_at'] for row in self.db.execute(
+            f"SELECT retry_at FROM circuits WHERE endpoint IN ({marks})", tuple(endpoints)
+        ).fetchall()]
+        blocked = [t for t in times if t > now]
+        if blocked:
+            return max(blocked), False
+        return None, bool(times)
+
+    def close(self, endpoints):
+        """试探任务成功：关闭已过重试时间的熔断记录"""
+        marks = ','.join('?' * len(endpoints))
+        self.db.execute(f"DELETE FROM circuits WHERE endpoint IN ({marks}) AND retry_at <= ?",
+                        (*endpoints, time.time()))
+
+    def clear(self):
+        """启动时清除上次运行遗留的记录"""
+        self.db.execute("DELETE FROM circuits")
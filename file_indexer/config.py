@@ -4,6 +4,8 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from dotenv import load_dotenv
+from path_rules import split_patterns
+from local_db import default_state_db_path
 
 # 加载.env配置，无需修改
 load_dotenv()
@@ -18,6 +20,13 @@ class Config:
     DIFY_KNOWLEDGE_API_KEY = os.getenv('DIFY_KNOWLEDGE_API_KEY')
     CONTENT_TRUNCATE_LENGTH = int(os.getenv('CONTENT_TRUNCATE_LENGTH', 2000))
     API_TIMEOUT = int(os.getenv('API_TIMEOUT', 60))
+    DEBOUNCE_QUIET_SECONDS = float(os.getenv('DEBOUNCE_QUIET_SECONDS', 1.0))
+    WORKER_POOL_SIZE = int(os.getenv('WORKER_POOL_SIZE', 4))
+    MONITOR_RECURSIVE = os.getenv('MONITOR_RECURSIVE', 'true').lower() == 'true'
+    MONITOR_INCLUDE = split_patterns(os.getenv('MONITOR_INCLUDE', ''))
+    MONITOR_EXCLUDE = split_patterns(os.getenv('MONITOR_EXCLUDE', ''))
+    STATE_DB_PATH = default_state_db_path()
+    INDEX_EXPORT_DIR = os.getenv('INDEX_EXPORT_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index_export')
 
     @classmethod
     def validate(cls):
@@ -0,0 +1,19 @@
+# content_hash.py - 流式文件内容哈希
+import hashlib
+
+# 每次读取的块大小，整个文件不会一次性读入内存
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(file_path, chunk_size=HASH_CHUNK_SIZE):
+    """按固定大小分块计算文件的BLAKE2b摘要（32字节，十六进制）"""
+    hasher = hashlib.blake2b(digest_size=32)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(file_path, 'rb') as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            hasher.update(view[:n])
+    return hasher.hexdigest()
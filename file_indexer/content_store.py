@@ -0,0 +1,88 @@
+# content_store.py - 按内容哈希寻址的处理结果存储
+import time
+from local_db import LocalDatabase
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS content (
+    hash TEXT PRIMARY KEY,
+    index_content TEXT,
+    is_fallback INTEGER NOT NULL DEFAULT 0,
+    index_uploaded INTEGER NOT NULL DEFAULT 0,
+    original_uploaded INTEGER NOT NULL DEFAULT 0,
+    first_path TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS content_paths (
+    path TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_content_paths_hash ON content_paths(hash);
+"""
+
+
+class ContentStore:
+    """内容哈希 -> 索引内容及上传状态
+
+    复制、重命名或只修改时间戳的文件内容哈希不变，可以直接复用已有的索引和
+    知识库文档，跳过Chatflow分析和重复上传。
+    """
+
+    def __init__(self, db_path):
+        self.db = LocalDatabase(db_path)
+        with self.db.lock:
+            self.db.conn.executescript(_SCHEMA)
+
+    def get(self, content_hash):
+        row = self.db.execute("SELECT * FROM content WHERE hash = ?", (content_hash,)).fetchone()
+        return dict(row) if row else None
+
+    def _ensure(self, conn, content_hash, path):
+        conn.execute(
+            "INSERT OR IGNORE INTO content (hash, first_path, updated_at) VALUES (?, ?, ?)",
+            (content_hash, path, time.time())
+        )
+
+    def save_index(self, content_hash, path, index_content, is_fallback=False):
+        """记录索引内容"""
+        with self.db.transaction() as conn:
+            self._ensure(conn, content_hash, path)
+            conn.execute(
+                "UPDATE content SET index_content = ?, is_fallback = ?, updated_at = ? WHERE hash = ?",
+                (index_content, int(bool(is_fallback)), time.time(), content_hash)
+            )
+
+    def mark_uploaded(self, content_hash, path, index=False, original=False):
+        """记录已成功上传的目标"""
+        with self.db.transaction() as conn:
+            self._ensure(conn, content_hash, path)
+            if index:
+                conn.execute("UPDATE content SET index_uploaded = 1, updated_at = ? WHERE hash = ?",
+                             (time.time(), content_hash))
+            if original:
+                conn.execute("UPDATE content SET original_uploaded = 1, updated_at = ? WHERE hash = ?",
+                             (time.time(), content_hash))
+
+    def link_path(self, path, content_hash):
+        """记录路径当前对应的内容"""
+        self.db.execute(
+            "INSERT OR REPLACE INTO content_paths (path, hash, updated_at) VALUES (?, ?, ?)",
+            (path, content_hash, time.time())
+        )
+
+    def paths_for(self, content_hash):
+        rows = self.db.execute("SELECT path FROM content_paths WHERE hash = ?", (content_hash,)).fetchall()
+        return [row['path'] for row in rows]
+
+    def unlink_path(self, path):
+        """路径已删除或移走"""
+        self.db.execute("DELETE FROM content_paths WHERE path = ?", (path,))
+
+    def clear_uploaded(self, content_hash, index=False, original=False):
+        """该内容的文档已从知识库删除或被原地更新为新内容"""
+        if index:
+            self.db.execute("UPDATE content SET index_uploaded = 0, updated_at = ? WHERE hash = ?",
+                            (time.time(), content_hash))
+        if original:
+            self.db.execute("UPDATE content SET original_uploaded = 0, updated_at = ? WHERE hash = ?",
+                            (time.time(), content_hash))
@@ -0,0 +1,149 @@
+# debouncer.py - 基于时间轮的文件事件合并器
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def _stat_signature(path):
+    """文件大小和修改时间，文件不存在时返回None"""
+    try:
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+    except OSError:
+        return None
+
+
+class Debouncer:
+    """把同一路径的连续事件合并为一次回调
+
+    所有待触发路径挂在一个哈希时间轮上，由单个定时线程按刻度推进；
+    路径在静默期内没有新事件且文件大小/修改时间保持不变时才触发回调，
+    等待期间不占用任何工作线程。
+    """
+
+    def __init__(self, callback, quiet_period=1.0, tick=0.1, wheel_size=512, check_stable=True):
+        self.callback = callback
+        self.quiet_period = max(0.0, float(quiet_period))
+        self.tick = max(0.01, float(tick))
+        self.wheel_size = max(8, int(wheel_size))
+        self.check_stable = check_stable
+        self._slots = [dict() for _ in range(self.wheel_size)]  # 槽位 -> {路径: 剩余圈数}
+        self._pending = {}  # 路径 -> [最后事件时间, 文件签名]
+        self._cursor = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.events = 0
+        self.fired = 0
+        self.requeued = 0
+
+    def start(self):
+        """启动定时线程"""
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name='debouncer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止定时线程，未触发的路径被丢弃"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def touch(self, path):
+        """记录一次事件，已在等待中的路径只刷新时间"""
+        signature = _stat_signature(path) if self.check_stable else None
+        with self._lock:
+            self.events += 1
+            entry = self._pending.get(path)
+            if entry:
+                entry[0] = time.monotonic()
+                entry[1] = signature
+                return
+            self._pending[path] = [time.monotonic(), signature]
+            self._schedule(path, self.quiet_period)
+
+    def rearm(self, path, delay=None):
+        """已触发但下游暂时无法接收的路径重新挂回时间轮，默认一个静默期后再触发"""
+        signature = _stat_signature(path) if self.check_stable else None
+        with self._lock:
+            self.requeued += 1
+            if path in self._pending:
+                # 期间已有新事件，沿用已有的等待
+                return
+            self._pending[path] = [time.monotonic(), signature]
+            self._schedule(path, self.quiet_period if delay is None else delay)
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _schedule(self, path, delay):
+        ticks = max(1, int(-(-delay // self.tick)))  # 向上取整
+        slot = (self._cursor + ticks) % self.wheel_size
+        self._slots[slot][path] = (ticks - 1) // self.wheel_size
+
+    def _run(self):
+        next_tick = time.monotonic() + self.tick
+        while not self._stop_event.wait(max(0.0, next_tick - time.monotonic())):
+            next_tick += self.tick
+            for path in self._advance():
+                try:
+                    self.callback(path)
+                except Exception as e:
+                    logger.error(f"事件回调异常: {path} - {str(e)}")
+
+    def _advance(self):
+        """推进一个刻度，返回本刻度到期且已稳定的路径"""
+        ready = []
+        with self._lock:
+            self._cursor = (self._cursor + 1) % self.wheel_size
+            slot = self._slots[self._cursor]
+            if not slot:
+                return ready
+            due = [path for path, rounds in slot.items() if rounds == 0]
+            for path, rounds in list(slot.items()):
+                if rounds:
+                    slot[path] = rounds - 1
+            for path in due:
+                del slot[path]
+
+            now = time.monotonic()
+            for path in due:
+                entry = self._pending.get(path)
+                if entry is None:
+                    continue
+                # 静默期内又有新事件，顺延到最后一次事件之后
+                remaining = entry[0] + self.quiet_period - now
+                if remaining > self.tick / 2:
+                    self._schedule(path, remaining)
+                    continue
+                if self.check_stable:
+                    signature = _stat_signature(path)
+                    if signature is None:
+                        # 文件已被删除或移走
+                        del self._pending[path]
+                        continue
+                    if signature != entry[1]:
+                        # 文件仍在写入，再等一个静默期
+                        entry[0] = now
+                        entry[1] = signature
+                        self._schedule(path, self.quiet_period)
+                        continue
+                del self._pending[path]
+                ready.append(path)
+            self.fired += len(ready)
+        return ready
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'events': self.events,
+                'fired': self.fired,
+                'requeued': self.requeued,
+            }
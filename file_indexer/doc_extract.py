@@ -0,0 +1,291 @@
+# doc_extract.py - Word 97-2003 (.doc) 文本直接提取：解析OLE2复合文档、FIB和片段表，不调用外部程序
+import re
+import sys
+import codecs
+import struct
+import logging
+from array import array
+
+logger = logging.getLogger(__name__)
+
+_CFB_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+_END_OF_CHAIN = 0xFFFFFFFE
+_NO_STREAM = 0xFFFFFFFF
+_WORD_IDENT = 0xA5EC
+# Word 97 及以后版本的最小 nFib，更早的 Word 6/95 使用另一种格式
+_MIN_NFIB = 0x00C1
+# FibRgFcLcb97 中 fcClx/lcbClx 所在的序号
+_CLX_INDEX = 33
+
+# Word 特殊字符：段落/单元格/换行/分页转为普通空白，图片和脚注引用等占位符删除
+_CONTROL_MAP = {
+    0x0D: '\n', 0x07: '\t', 0x0B: '\n', 0x0C: '\n', 0x0E: '\n',
+    0x1E: '-', 0x1F: None, 0xA0: ' ',
+    0x01: None, 0x02: None, 0x03: None, 0x04: None, 0x05: None, 0x08: None,
+}
+# 域：\x13 域代码 \x14 域结果 \x15，保留结果，去掉代码；没有结果的域整体删除
+_FIELD_WITH_RESULT = re.compile('\x13[^\x13\x14\x15]*\x14([^\x13\x14\x15]*)\x15')
+_FIELD_WITHOUT_RESULT = re.compile('\x13[^\x13\x14\x15]*\x15')
+_BLANK_LINES = re.compile(r'\n[ \t]*(?:\n[ \t]*)+')
+
+
+class _Stream:
+    """按扇区链惰性读取的流，只读取请求范围覆盖的扇区"""
+
+    def __init__(self, read_sector, sector_size, chain, size):
+        self._read_sector = read_sector
+        self._sector_size = sector_size
+        self._chain = chain
+        self.size = size
+
+    def read(self, offset, length):
+        length = max(0, min(length, self.size - offset))
+        if length == 0:
+            return b''
+        first = offset // self._sector_size
+        last = (offset + length - 1) // self._sector_size
+        if last >= len(self._chain):
+            raise ValueError("流的扇区链不完整")
+        data = b''.join(self._read_sector(self._chain[i]) for i in range(first, last + 1))
+        start = offset - first * self._sector_size
+        return data[start:start + length]
+
+
+class CompoundFile:
+    """OLE2复合文档（CFB）的最小只读实现：FAT/MiniFAT、目录树和流读取"""
+
+    def __init__(self, file_obj):
+        self._f = file_obj
+        header = file_obj.read(512)
+        if len(header) < 512 or header[:8] != _CFB_SIGNATURE:
+            raise ValueError("不是OLE2复合文档")
+        self.sector_size = 1 << struct.unpack_from('<H', header, 0x1E)[0]
+        self.mini_sector_size = 1 << struct.unpack_from('<H', header, 0x20)[0]
+        (num_fat, first_dir, _, self.mini_cutoff, first_minifat, num_minifat,
+         first_difat, num_difat) = struct.unpack_from('<8I', header, 0x2C)
+
+        # DIFAT：文件头中的109项，之后是DIFAT扇区链
+        fat_sectors = list(struct.unpack_from('<109I', header, 0x4C))
+        per_difat = self.sector_size // 4 - 1
+        sector = first_difat
+        for _ in range(num_difat):
+            if sector >= _END_OF_CHAIN:
+                break
+            entries = struct.unpack(f'<{per_difat + 1}I', self._sector(sector))
+            fat_sectors.extend(entries[:per_difat])
+            sector = entries[per_difat]
+        fat_sectors = [s for s in fat_sectors[:num_fat] if s < _END_OF_CHAIN]
+        self._fat = array('I')
+        self._fat.frombytes(b''.join(self._sector(s) for s in fat_sectors))
+        if sys.byteorder == 'big':
+            self._fat.byteswap()
+
+        directory = self._chain_data(first_dir)
+        self._entries = [directory[i:i + 128] for i in range(0, len(directory) - 127, 128)]
+        if not self._entries:
+            raise ValueError("复合文档目录为空")
+
+        self._minifat = array('I')
+        if num_minifat and first_minifat < _END_OF_CHAIN:
+            self._minifat.frombytes(self._chain_data(first_minifat))
+            if sys.byteorder == 'big':
+                self._minifat.byteswap()
+        root = self._entries[0]
+        root_start, root_size = struct.unpack_from('<IQ', root, 116)
+        self._mini_stream = None
+        if root_start < _END_OF_CHAIN:
+            self._mini_stream = _Stream(self._sector, self.sector_size, self._chain(self._fat, root_start),
+                                        root_size & 0xFFFFFFFF if self.sector_size == 512 else root_size)
+
+    def _sector(self, index):
+        self._f.seek((index + 1) * self.sector_size)
+        data = self._f.read(self.sector_size)
+        if not data:
+            raise ValueError("文件被截断")
+        # 部分写入程序不补齐最后一个扇区
+        return data.ljust(self.sector_size, b'\x00')
+
+    def _chain(self, table, start):
+        chain = []
+        sector = start
+        limit = len(table)
+        while sector < _END_OF_CHAIN:
+            if sector >= limit or len(chain) > limit:
+                raise ValueError("扇区链损坏")
+            chain.append(sector)
+            sector = table[sector]
+        return chain
+
+    def _chain_data(self, start):
+        return b''.join(self._sector(s) for s in self._chain(self._fat, start))
+
+    def _name(self, entry):
+        length = struct.unpack_from('<H', entry, 64)[0]
+        return entry[:max(0, length - 2)].decode('utf-16-le', errors='replace')
+
+    def _children(self, index):
+        """遍历某个存储下的直接子项（红黑树）"""
+        child = struct.unpack_from('<I', self._entries[index], 76)[0]
+        stack, seen = [child], set()
+        while stack:
+            node = stack.pop()
+            if node == _NO_STREAM or node >= len(self._entries) or node in seen:
+                continue
+            seen.add(node)
+            entry = self._entries[node]
+            left, right = struct.unpack_from('<II', entry, 68)
+            stack.extend((left, right))
+            yield node, entry
+
+    def open_stream(self, name):
+        """打开根存储下的流（不会误取嵌入对象中的同名流），不存在时返回None"""
+        for _, entry in self._children(0):
+            if entry[66] != 2 or self._name(entry) != name:
+                continue
+            start, size = struct.unpack_from('<IQ', entry, 116)
+            if self.sector_size == 512:
+                size &= 0xFFFFFFFF
+            if size < self.mini_cutoff and self._mini_stream is not None:
+                chain = self._chain(self._minifat, start)
+                mini = self._mini_stream
+                size_mini = self.mini_sector_size
+                return _Stream(lambda s: mini.read(s * size_mini, size_mini), size_mini, chain, size)
+            return _Stream(self._sector, self.sector_size, self._chain(self._fat, start), size)
+        return None
+
+
+def _read_fib(word):
+    """解析FIB，返回 (使用的表流名, 正文字符数, fcClx, lcbClx)"""
+    base = word.read(0, 34)
+    if len(base) < 34:
+        raise ValueError("WordDocument流过短")
+    ident, nfib = struct.unpack_from('<HH', base, 0)
+    flags = struct.unpack_from('<H', base, 0x0A)[0]
+    if ident != _WORD_IDENT:
+        raise ValueError("不是Word文档")
+    if nfib < _MIN_NFIB:
+        raise ValueError("不支持Word 6/95格式")
+    if flags & 0x0100 or flags & 0x8000:
+        raise ValueError("文档已加密")
+    table_name = '1Table' if flags & 0x0200 else '0Table'
+
+    offset = 32
+    csw = struct.unpack('<H', word.read(offset, 2))[0]
+    offset += 2 + csw * 2
+    cslw = struct.unpack('<H', word.read(offset, 2))[0]
+    fib_rg_lw = word.read(offset + 2, cslw * 4)
+    ccp_text = struct.unpack_from('<i', fib_rg_lw, 12)[0]
+    offset += 2 + cslw * 4
+    cb_rg_fc_lcb = struct.unpack('<H', word.read(offset, 2))[0]
+    if cb_rg_fc_lcb <= _CLX_INDEX:
+        raise ValueError("FIB缺少片段表位置")
+    fc_clx, lcb_clx = struct.unpack('<II', word.read(offset + 2 + _CLX_INDEX * 8, 8))
+    return table_name, ccp_text, fc_clx, lcb_clx
+
+
+def _read_pieces(table, fc_clx, lcb_clx):
+    """解析Clx中的片段表，返回 [(起始CP, 结束CP, 文件偏移, 是否8位压缩)]"""
+    clx = table.read(fc_clx, lcb_clx)
+    pos = 0
+    # 跳过 Prc（属性修改记录）
+    while pos < len(clx) and clx[pos] == 0x01:
+        pos += 3 + struct.unpack_from('<h', clx, pos + 1)[0]
+    if pos >= len(clx) or clx[pos] != 0x02:
+        raise ValueError("片段表格式错误")
+    lcb = struct.unpack_from('<I', clx, pos + 1)[0]
+    plc = clx[pos + 5:pos + 5 + lcb]
+    count = (len(plc) - 4) // 12
+    if count <= 0:
+        return []
+    cps = struct.unpack_from(f'<{count + 1}I', plc, 0)
+    pieces = []
+    for i in range(count):
+        fc = struct.unpack_from('<I', plc, 4 * (count + 1) + i * 8 + 2)[0]
+        compressed = bool(fc & 0x40000000)
+        fc &= 0x3FFFFFFF
+        pieces.append((cps[i], cps[i + 1], fc // 2 if compressed else fc, compressed))
+    return pieces
+
+
+def clean_word_text(raw):
+    """去掉域代码、把Word控制字符转为普通空白"""
+    previous = None
+    while previous != raw:
+        previous = raw
+        raw = _FIELD_WITH_RESULT.sub(r'\1', raw)
+        raw = _FIELD_WITHOUT_RESULT.sub('', raw)
+    raw = raw.replace('\x13', '').replace('\x14', '').replace('\x15', '')
+    text = raw.translate(_CONTROL_MAP)
+    return _BLANK_LINES.sub('\n\n', text).strip()
+
+
+def _open_document(f):
+    """解析复合文档和FIB，返回 (WordDocument流, 正文字符数, 片段表)"""
+    cfb = CompoundFile(f)
+    word = cfb.open_stream('WordDocument')
+    if word is None:
+        raise ValueError("缺少WordDocument流")
+    table_name, ccp_text, fc_clx, lcb_clx = _read_fib(word)
+    table = cfb.open_stream(table_name)
+    if table is None:
+        raise ValueError(f"缺少{table_name}流")
+    return word, ccp_text, _read_pieces(table, fc_clx, lcb_clx)
+
+
+def _iter_raw(word, ccp_text, pieces, chunk_chars):
+    """按片段顺序产出正文原始字符，大片段按 chunk_chars 分块读取"""
+    for cp_start, cp_end, offset, compressed in pieces:
+        # 只取正文（脚注、页眉等子文档在正文之后）
+        cp_end = min(cp_end, ccp_text)
+        if cp_start >= cp_end:
+            break
+        width = 1 if compressed else 2
+        decoder = codecs.getincrementaldecoder('cp1252' if compressed else 'utf-16-le')(errors='replace')
+        remaining = cp_end - cp_start
+        while remaining > 0:
+            count = min(remaining, chunk_chars) if chunk_chars else remaining
+            data = word.read(offset, count * width)
+            offset += count * width
+            remaining -= count
+            yield decoder.decode(data, final=remaining <= 0)
+
+
+def _read_text(word, ccp_text, pieces, max_chars):
+    parts = []
+    collected = 0
+    next_check = max_chars or 0
+    for part in _iter_raw(word, ccp_text, pieces, max_chars * 2 if max_chars else 0):
+        parts.append(part)
+        collected += len(part)
+        if max_chars and collected >= next_check:
+            # 清理会去掉域代码，清理后仍不足预算时继续读取
+            text = clean_word_text(''.join(parts))
+            if len(text) >= max_chars:
+                return text[:max_chars]
+            next_check = collected * 2
+    text = clean_word_text(''.join(parts))
+    return text[:max_chars] if max_chars else text
+
+
+def extract_doc_text(file_path, max_chars=None):
+    """一次读取.doc正文文本；有字符预算时读够即停止
+
+    只读取文件头、FAT、目录、FIB、片段表和正文所在的扇区；
+    加密文档、Word 6/95 格式或损坏的文件抛出 ValueError。
+    """
+    with open(file_path, 'rb') as f:
+        try:
+            word, ccp_text, pieces = _open_document(f)
+            return _read_text(word, ccp_text, pieces, max_chars)
+        except (struct.error, IndexError) as e:
+            raise ValueError(f"文档结构损坏: {str(e)}")
+
+
+def is_word97_document(file_path):
+    """是否为可直接解析的 Word 97-2003 文档（未加密）"""
+    try:
+        with open(file_path, 'rb') as f:
+            _open_document(f)
+        return True
+    except (ValueError, OSError, struct.error, IndexError):
+        return False
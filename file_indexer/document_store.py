@@ -0,0 +1,99 @@
+# document_store.py - 文件ID -> Dify知识库文档ID，用于原地更新和删除远端文档
+import os
+import time
+from local_db import LocalDatabase
+from index_store import file_id_for
+
+# 文档类别：索引文本（.txt知识库）和原文件（原文件库/父子模式知识库），两者可能配置为同一个知识库
+INDEX_DOCUMENT = 'index'
+ORIGINAL_DOCUMENT = 'original'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    file_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    dataset_id TEXT NOT NULL,
+    document_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    content_hash TEXT,
+    source_path TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (file_id, kind)
+);
+CREATE INDEX IF NOT EXISTS idx_documents_path ON documents(path);
+"""
+
+
+class DocumentStore:
+    """记录每个文件在各知识库中对应的文档
+
+    文件修改后按文档ID调用 update-by-file 原地更新，文件删除时删除远端文档，
+    知识库中不会堆积同一文件的多个版本。
+    """
+
+    def __init__(self, db_path):
+        self.db = LocalDatabase(db_path)
+        with self.db.lock:
+            self.db.conn.executescript(_SCHEMA)
+            columns = {row[1] for row in self.db.conn.execute("PRAGMA table_info(documents)")}
+            if 'source_path' not in columns:
+                # 旧版本的状态库：没有上传时路径的记录视为文档名称是最新的
+                self.db.conn.execute("ALTER TABLE documents ADD COLUMN source_path TEXT")
+
+    def get(self, path, kind):
+        row = self.db.execute(
+            "SELECT * FROM documents WHERE file_id = ? AND kind = ?", (file_id_for(path), kind)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def for_path(self, path):
+        """文件的全部文档：[记录]"""
+        rows = self.db.execute("SELECT * FROM documents WHERE file_id = ?", (file_id_for(path),)).fetchall()
+        return [dict(row) for row in rows]
+
+    def record(self, path, kind, dataset_id, document_id, content_hash=None):
+        """记录（覆盖）文件某一类别的文档，source_path 记为当前路径（远端文档名称按它生成）"""
+        path = os.path.abspath(path)
+        self.db.execute(
+            "INSERT OR REPLACE INTO documents "
+            "(file_id, kind, dataset_id, document_id, path, content_hash, source_path, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (file_id_for(path), kind, dataset_id, document_id, path, content_hash, path, time.time())
+        )
+
+    def remove(self, path, kind):
+        self.db.execute("DELETE FROM documents WHERE file_id = ? AND kind = ?", (file_id_for(path), kind))
+
+    def move(self, old_path, new_path):
+        """文件移动/重命名后文档跟随新路径，返回迁移的记录数
+
+        source_path 保持上传时的路径，下次处理新路径时据此按文档ID更新远端文档名称。
+        """
+        cursor = self.db.execute(
+            "UPDATE documents SET file_id = ?, path = ?, updated_at = ? WHERE file_id = ?",
+            (file_id_for(new_path), os.path.abspath(new_path), time.time(), file_id_for(old_path))
+        )
+        return cursor.rowcount
+
+    def reassign(self, record, new_path):
+        """把一条文档记录转给另一个路径（内容相同的副本）"""
+        self.db.execute(
+            "UPDATE documents SET file_id = ?, path = ?, updated_at = ? WHERE file_id = ? AND kind = ?",
+            (file_id_for(new_path), os.path.abspath(new_path), time.time(), record['file_id'], record['kind'])
+        )
+
+    def tracked(self, paths):
+        """筛选出有远端文档的路径"""
+        return [path for path in paths if self.db.execute(
+            "SELECT 1 FROM documents WHERE file_id = ? LIMIT 1", (file_id_for(path),)
+        ).fetchone()]
+
+    def paths_under(self, directory):
+        """目录下（含子目录）有远端文档的文件路径"""
+        prefix = os.path.join(os.path.abspath(directory), '')
+        # 按字符串范围查询，路径中的 % 和 _ 不会被当作通配符
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        rows = self.db.execute(
+            "SELECT DISTINCT path FROM documents WHERE path >= ? AND path < ?", (prefix, upper)
+        ).fetchall()
+        return [row['path'] for row in rows]
@@ -0,0 +1,359 @@
+# endpoint_guard.py - Dify各接口的自适应限流和熔断：令牌桶速率随429/5xx/超时按AIMD调整，连续失败时熔断
+import os
+import time
+import logging
+import threading
+from collections import deque
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# 视为服务端过载的状态码（超时和连接失败同样视为过载）
+OVERLOAD_STATUS = {429, 500, 502, 503, 504}
+# 计算实测请求速率的时间窗口（秒）
+RATE_WINDOW_SECONDS = 10.0
+# 两次降速的最小间隔（秒），同一次拥塞引起的一串失败只降一次
+DECREASE_INTERVAL_SECONDS = 1.0
+# 半开状态下试探请求在途时，其余请求推迟的秒数
+PROBE_RETRY_SECONDS = 5.0
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(RuntimeError):
+    """接口熔断中，请求未发出"""
+
+    def __init__(self, endpoint, retry_at):
+        self.endpoint = endpoint
+        self.retry_at = retry_at
+        super().__init__(f"Dify接口 {endpoint} 熔断中，{max(0.0, retry_at - time.time()):.0f}秒后再试")
+
+
+class AdaptiveRateLimiter:
+    """令牌桶限流，速率按AIMD调整
+
+    - initial_rate 为0时起初不限速；第一次过载时从实测请求速率开始降
+    - 过载（429/5xx/超时）：速率乘以 decrease_factor，不低于 min_rate
+    - 每次成功：速率增加 increase / rate，满负荷时约每秒增加 increase，不超过 max_rate（0表示不设上限）
+    - reserve() 预占一个令牌并返回需要等待的秒数，同步调用方 sleep，协程 await asyncio.sleep
+    """
+
+    def __init__(self, initial_rate=0, min_rate=0.5, max_rate=0, increase=1.0, decrease_factor=0.5):
+        self.min_rate = max(0.01, float(min_rate))
+        self.max_rate = float(max_rate) if max_rate and float(max_rate) > 0 else None
+        self.increase = max(0.0, float(increase))
+        self.decrease_factor = min(0.99, max(0.01, float(decrease_factor)))
+        self.rate = self._clamp(float(initial_rate)) if initial_rate and float(initial_rate) > 0 else None
+        self._lock = threading.Lock()
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._last_decrease = None
+        self._recent = deque()
+        self._stats = {'decreases': 0, 'throttled': 0, 'throttled_seconds': 0.0}
+
+    def _clamp(self, rate):
+        rate = max(self.min_rate, rate)
+        return min(self.max_rate, rate) if self.max_rate else rate
+
+    def _refill(self, now):
+        # 桶容量为1秒的令牌；令牌为负表示已被预占、调用方正在等待
+        if self.rate is not None:
+            self._tokens = min(max(1.0, self.rate), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _measured_rate(self, now):
+        while self._recent and now - self._recent[0] > RATE_WINDOW_SECONDS:
+            self._recent.popleft()
+        if not self._recent:
+            return 0.0
+        return len(self._recent) / max(1.0, now - self._recent[0])
+
+    def reserve(self):
+        """预占一个令牌，返回发送前需要等待的秒数"""
+        now = time.monotonic()
+        with self._lock:
+            self._recent.append(now)
+            self._measured_rate(now)
+            if self.rate is None:
+                return 0.0
+            self._refill(now)
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            wait = -self._tokens / self.rate
+            self._stats['throttled'] += 1
+            self._stats['throttled_seconds'] += wait
+            return wait
+
+    def on_success(self):
+        with self._lock:
+            if self.rate is None or not self.increase:
+                return
+            self._refill(time.monotonic())
+            self.rate = self._clamp(self.rate + self.increase / self.rate)
+
+    def on_overload(self):
+        """乘性降速；距上次降速不足 DECREASE_INTERVAL_SECONDS 时忽略，返回新速率（忽略时为None）"""
+        now = time.monotonic()
+        with self._lock:
+            if self._last_decrease is not None and now - self._last_decrease < DECREASE_INTERVAL_SECONDS:
+                return None
+            self._last_decrease = now
+            if self.rate is None:
+                base = self._measured_rate(now)
+                self._tokens = 0.0
+            else:
+                self._refill(now)
+                base = self.rate
+            self.rate = self._clamp(base * self.decrease_factor)
+            self._updated = now
+            self._stats['decreases'] += 1
+            return self.rate
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['rate'] = round(self.rate, 3) if self.rate is not None else None
+            stats['measured_rate'] = round(self._measured_rate(time.monotonic()), 3)
+        stats['throttled_seconds'] = round(stats['throttled_seconds'], 1)
+        return stats
+
+
+class CircuitBreaker:
+    """熔断器
+
+    连续 failure_threshold 次过载后打开，冷却期内请求直接被拒绝；冷却结束后放行一个试探请求（半开），
+    成功则关闭，失败则重新打开并把冷却时间翻倍（不超过 max_cooldown）。时间均为时间戳，可直接作为任务的重试时间。
+    """
+
+    def __init__(self, failure_threshold=5, cooldown=30.0, max_cooldown=600.0):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.base_cooldown = max(0.1, float(cooldown))
+        self.max_cooldown = max(self.base_cooldown, float(max_cooldown))
+        self.cooldown = self.base_cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_at = None
+        self._lock = threading.Lock()
+        self._stats = {'opened': 0, 'rejected': 0}
+
+    def _blocked_until(self, now):
+        if self.state == OPEN and now < self.opened_at + self.cooldown:
+            return self.opened_at + self.cooldown
+        if self.state == HALF_OPEN and self.probe_at is not None and now < self.probe_at + self.cooldown:
+            # 试探请求在途：其余请求稍后再来；试探请求迟迟没有结果时冷却期满再放行一个
+            return min(now + PROBE_RETRY_SECONDS, self.probe_at + self.cooldown)
+        return None
+
+    def blocked_until(self):
+        """请求会被拒绝到何时（时间戳），可以发送时返回None"""
+        with self._lock:
+            return self._blocked_until(time.time())
+
+    def status(self):
+        """(请求会被拒绝到何时, 是否等待试探)：冷却已过但尚未恢复时第二项为True"""
+        with self._lock:
+            blocked = self._blocked_until(time.time())
+            return blocked, blocked is None and self.state != CLOSED
+
+    def acquire(self):
+        """发送前调用：可以发送时返回None，否则返回重试时间戳"""
+        now = time.time()
+        with self._lock:
+            blocked = self._blocked_until(now)
+            if blocked is not None:
+                self._stats['rejected'] += 1
+                return blocked
+            if self.state != CLOSED:
+                self.state = HALF_OPEN
+                self.probe_at = now
+            return None
+
+    def record_success(self):
+        """返回True表示熔断由此关闭"""
+        with self._lock:
+            if self.state == OPEN:
+                # 熔断前发出的请求，不代表服务已恢复
+                return False
+            self.failures = 0
+            if self.state == CLOSED:
+                return False
+            self.state = CLOSED
+            self.probe_at = None
+            self.cooldown = self.base_cooldown
+            return True
+
+    def record_failure(self):
+        """返回True表示熔断由此打开"""
+        with self._lock:
+            if self.state == OPEN:
+                return False
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+            elif self.failures < self.failure_threshold:
+                return False
+            self.state = OPEN
+            self.opened_at = time.time()
+            self.probe_at = None
+            self._stats['opened'] += 1
+            return True
+
+    def release(self):
+        """请求因其他原因失败（既非成功也非过载）：半开时允许再放行一个试探请求"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.probe_at = None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['state'] = self.state
+            stats['consecutive_failures'] = self.failures
+            blocked = self._blocked_until(time.time())
+        stats['retry_in'] = round(blocked - time.time(), 1) if blocked else 0
+        return stats
+
+
+class EndpointGuard:
+    """一个Dify接口的限流器和熔断器（任一项可关闭，为None）"""
+
+    def __init__(self, name, limiter=None, breaker=None):
+        self.name = name
+        self.limiter = limiter
+        self.breaker = breaker
+
+    @classmethod
+    def from_env(cls, name):
+        limiter = breaker = None
+        if os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true':
+            limiter = AdaptiveRateLimiter(
+                initial_rate=float(os.getenv('RATE_LIMIT_INITIAL_RPS', '0')),
+                min_rate=float(os.getenv('RATE_LIMIT_MIN_RPS', '0.5')),
+                max_rate=float(os.getenv('RATE_LIMIT_MAX_RPS', '0')),
+                increase=float(os.getenv('RATE_LIMIT_INCREASE_RPS', '1')),
+                decrease_factor=float(os.getenv('RATE_LIMIT_DECREASE_FACTOR', '0.5')),
+            )
+        if os.getenv('CIRCUIT_BREAKER_ENABLED', 'true').lower() == 'true':
+            breaker = CircuitBreaker(
+                failure_threshold=int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5')),
+                cooldown=float(os.getenv('CIRCUIT_COOLDOWN_SECONDS', '30')),
+                max_cooldown=float(os.getenv('CIRCUIT_MAX_COOLDOWN_SECONDS', '600')),
+            )
+        return cls(name, limiter, breaker)
+
+    def acquire(self):
+        """发送前调用：熔断中抛出 CircuitOpenError，否则返回限流需要等待的秒数"""
+        if self.breaker is not None:
+            blocked = self.breaker.acquire()
+            if blocked is not None:
+                raise CircuitOpenError(self.name, blocked)
+        return self.limiter.reserve() if self.limiter is not None else 0.0
+
+    def record_status(self, status_code):
+        if status_code in OVERLOAD_STATUS:
+            self.record_overload(f"HTTP {status_code}")
+        else:
+            self.record_success()
+
+    def record_success(self):
+        if self.limiter is not None:
+            self.limiter.on_success()
+        if self.breaker is not None and self.breaker.record_success():
+            logger.info(f"✅ Dify接口 {self.name} 已恢复，熔断关闭")
+            _notify(self.name, None)
+
+    def record_overload(self, reason):
+        if self.limiter is not None:
+            rate = self.limiter.on_overload()
+            if rate is not None:
+                logger.warning(f"Dify接口 {self.name} 过载({reason})，请求速率降至 {rate:.2f}/秒")
+        if self.breaker is not None and self.breaker.record_failure():
+            logger.warning(f"🔌 Dify接口 {self.name} 持续过载，熔断 {self.breaker.cooldown:.0f} 秒")
+            _notify(self.name, self.breaker.blocked_until())
+
+    def release(self):
+        if self.breaker is not None:
+            self.breaker.release()
+
+    def blocked_until(self):
+        return self.breaker.blocked_until() if self.breaker is not None else None
+
+    def status(self):
+        return self.breaker.status() if self.breaker is not None else (None, False)
+
+    def stats(self):
+        stats = self.limiter.stats() if self.limiter is not None else {}
+        if self.breaker is not None:
+            stats.update(self.breaker.stats())
+        return stats
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+_state_sink = None
+
+
+def set_state_sink(sink):
+    """熔断打开/关闭时回调 sink(接口名, 重试时间戳)，关闭时重试时间戳为None
+
+    进程模式下各工作进程有自己的熔断器，通过它把熔断状态写入共享的状态库，主进程据此暂停领取任务。
+    """
+    global _state_sink
+    _state_sink = sink
+
+
+def _notify(endpoint, retry_at):
+    sink = _state_sink
+    if sink is None:
+        return
+    try:
+        sink(endpoint, retry_at)
+    except Exception as e:
+        logger.warning(f"记录Dify接口 {endpoint} 熔断状态失败: {str(e)}")
+
+
+def get_endpoint_guard(endpoint):
+    """进程内每个接口共享一个限流器和熔断器（同步客户端与异步引擎共用）"""
+    guard = _guards.get(endpoint)
+    if guard is None:
+        with _guards_lock:
+            guard = _guards.get(endpoint)
+            if guard is None:
+                guard = _guards[endpoint] = EndpointGuard.from_env(endpoint)
+    return guard
+
+
+def endpoint_for_url(url):
+    """按URL归类接口，与异步引擎的接口名一致"""
+    path = urlsplit(url).path
+    if path.endswith('/chat-messages'):
+        return 'chat'
+    if path.endswith('/files/upload'):
+        return 'files'
+    if '/datasets' in path:
+        return 'dataset'
+    return 'other'
+
+
+def circuit_state(endpoints=None):
+    """指定接口（默认全部）在本进程中的熔断状态：(最晚的重试时间戳或None, 是否有接口等待试探)"""
+    guards = [guard for name, guard in list(_guards.items()) if endpoints is None or name in endpoints]
+    states = [guard.status() for guard in guards]
+    times = [blocked for blocked, _ in states if blocked]
+    if times:
+        return max(times), False
+    return None, any(probing for _, probing in states)
+
+
+def blocked_until(endpoints=None):
+    """指定接口（默认全部）中有熔断时返回最晚的重试时间戳，否则返回None"""
+    return circuit_state(endpoints)[0]
+
+
+def endpoint_stats():
+    """各接口的当前速率、限流等待和熔断状态"""
+    return {name: guard.stats() for name, guard in sorted(_guards.items())}
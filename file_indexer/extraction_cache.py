@@ -0,0 +1,161 @@
+# extraction_cache.py - 内容提取结果缓存：内存LRU + 本地库，两级均按大小淘汰
+import time
+import zlib
+import logging
+import threading
+from collections import OrderedDict
+from local_db import LocalDatabase
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extract_cache (
+    cache_key TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    budget INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_extract_cache_lru ON extract_cache(last_used_at);
+CREATE INDEX IF NOT EXISTS idx_extract_cache_hash ON extract_cache(content_hash);
+"""
+
+
+def _key(content_hash, budget, version):
+    return f"{content_hash}:{budget}:{version}"
+
+
+class ExtractionCache:
+    """按内容哈希缓存提取出的文本
+
+    - budget 为字符预算（0表示全文）；按预算查询时全文条目同样可以命中
+    - 内存层保存最近使用的文本，本地库层保存zlib压缩后的文本，重启后仍然有效
+    - version 为提取器版本，解析逻辑变化后旧条目不再命中
+    """
+
+    def __init__(self, db_path, memory_bytes=32 * 1024 * 1024, disk_bytes=256 * 1024 * 1024, version='1'):
+        self.memory_bytes = max(0, int(memory_bytes))
+        self.disk_bytes = max(0, int(disk_bytes))
+        self.version = version
+        self.db = LocalDatabase(db_path)
+        with self.db.lock:
+            self.db.conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_used = 0
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'memory_evictions': 0, 'disk_evictions': 0}
+
+    def get(self, content_hash, max_chars=None):
+        """返回缓存的文本，未命中时返回None"""
+        budget = int(max_chars or 0)
+        candidates = [budget, 0] if budget else [0]
+        for candidate in candidates:
+            text = self._memory_get(_key(content_hash, candidate, self.version))
+            if text is not None:
+                self._count('memory_hits')
+                return text[:budget] if budget else text
+        for candidate in candidates:
+            key = _key(content_hash, candidate, self.version)
+            text = self._disk_get(key)
+            if text is not None:
+                self._count('disk_hits')
+                self._memory_put(key, text)
+                return text[:budget] if budget else text
+        self._count('misses')
+        return None
+
+    def put(self, content_hash, text, max_chars=None):
+        """保存提取结果（按预算提取的结果只保存预算内的部分）"""
+        if text is None:
+            return
+        budget = int(max_chars or 0)
+        if budget:
+            text = text[:budget]
+        key = _key(content_hash, budget, self.version)
+        self._memory_put(key, text)
+        self._disk_put(key, content_hash, budget, text)
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def _memory_get(self, key):
+        with self._lock:
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+            return text
+
+    def _memory_put(self, key, text):
+        size = len(text) * 2
+        if size > self.memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_used -= len(old) * 2
+            self._memory[key] = text
+            self._memory_used += size
+            while self._memory_used > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_used -= len(evicted) * 2
+                self._stats['memory_evictions'] += 1
+
+    def _disk_get(self, key):
+        try:
+            with self.db.lock:
+                row = self.db.execute("SELECT data FROM extract_cache WHERE cache_key = ?", (key,)).fetchone()
+                if not row:
+                    return None
+                self.db.execute("UPDATE extract_cache SET last_used_at = ? WHERE cache_key = ?", (time.time(), key))
+            return zlib.decompress(row['data']).decode('utf-8')
+        except Exception as e:
+            logger.warning(f"读取提取缓存失败: {str(e)}")
+            return None
+
+    def _disk_put(self, key, content_hash, budget, text):
+        if not self.disk_bytes:
+            return
+        data = zlib.compress(text.encode('utf-8'), 6)
+        if len(data) > self.disk_bytes:
+            return
+        try:
+            with self.db.transaction() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO extract_cache (cache_key, content_hash, budget, data, size, last_used_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, content_hash, budget, data, len(data), time.time())
+                )
+                evicted = self._disk_evict(conn)
+            if evicted:
+                self._count('disk_evictions', evicted)
+        except Exception as e:
+            logger.warning(f"写入提取缓存失败: {str(e)}")
+
+    def _disk_evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM extract_cache").fetchone()[0]
+        excess = total - self.disk_bytes
+        if excess <= 0:
+            return 0
+        victims = []
+        for row in conn.execute("SELECT cache_key, size FROM extract_cache ORDER BY last_used_at"):
+            if excess <= 0:
+                break
+            victims.append((row['cache_key'],))
+            excess -= row['size']
+        conn.executemany("DELETE FROM extract_cache WHERE cache_key = ?", victims)
+        return len(victims)
+
+    def stats(self):
+        """两级命中次数、淘汰次数和占用"""
+        entries, total = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extract_cache"
+        ).fetchone()
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+            stats['memory_bytes'] = self._memory_used
+        stats['disk_entries'] = entries
+        stats['disk_bytes'] = total
+        return stats
@@ -0,0 +1,256 @@
+# extraction_service.py - 内容提取进程池：单任务超时、内存上限、按任务数回收进程
+import time
+import queue
+import atexit
+import logging
+import threading
+import multiprocessing
+
+logger = logging.getLogger(__name__)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class ExtractionResult:
+    """子进程返回给主进程的精简结果"""
+
+    __slots__ = ('text', 'error', 'seconds', 'timed_out')
+
+    def __init__(self, text=None, error=None, seconds=0.0, timed_out=False):
+        self.text = text
+        self.error = error
+        self.seconds = seconds
+        self.timed_out = timed_out
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        size = len(self.text) if isinstance(self.text, str) else 0
+        return f"ExtractionResult(ok={self.ok}, chars={size}, seconds={self.seconds:.3f}, error={self.error!r})"
+
+
+def _apply_memory_limit(memory_limit_mb):
+    """限制子进程地址空间，超出时解析库抛出 MemoryError 而不是拖垮整机"""
+    if not memory_limit_mb or resource is None:
+        return
+    limit = int(memory_limit_mb * 1024 * 1024)
+    try:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ValueError, OSError) as e:
+        logger.warning(f"无法设置提取进程内存上限: {str(e)}")
+
+
+def _worker_main(conn, target, memory_limit_mb, max_jobs):
+    """子进程循环：接收 (args, kwargs)，返回 (结果, 错误, 耗时, 是否退出)"""
+    _apply_memory_limit(memory_limit_mb)
+    done = 0
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        args, kwargs = job
+        started = time.perf_counter()
+        value, error = None, None
+        try:
+            value = target(*args, **kwargs)
+        except MemoryError:
+            error = "内存超出上限"
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e)}"
+        done += 1
+        retire = bool(max_jobs) and done >= max_jobs
+        try:
+            conn.send((value, error, time.perf_counter() - started, retire))
+        except MemoryError:
+            conn.send((None, "内存超出上限", time.perf_counter() - started, True))
+            break
+        if retire:
+            break
+    conn.close()
+
+
+class _Worker:
+    """一个提取子进程及其管道"""
+
+    def __init__(self, ctx, target, memory_limit_mb, max_jobs, name):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, target, memory_limit_mb, max_jobs),
+            name=name,
+            # 非守护进程：解析库可以在子进程中再启动进程；由进程池负责回收
+            daemon=False
+        )
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(2)
+            if self.process.is_alive():
+                self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def retire(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(2)
+        self.kill()
+
+
+class ExtractionService:
+    """提取进程池
+
+    - target 必须是模块级函数（spawn 方式按引用传给子进程）
+    - 每个调用线程独占一个空闲子进程，多个线程同时提取时使用多个CPU核
+    - 超时的任务直接终止子进程并补充新进程，坏文件不会卡住整个监控
+    - 子进程处理 max_jobs 个任务后自动退出并替换，避免解析库的内存泄漏累积
+    - 补充子进程失败时在空闲队列中放一个空位（None），下一个任务再尝试启动，进程池大小不变；
+      等待空闲子进程超过 wait_timeout 秒（默认为任务超时的两倍）时返回失败结果，调用方不会一直阻塞
+    """
+
+    def __init__(self, target, workers=2, timeout=60.0, memory_limit_mb=1024, max_jobs=100,
+                 start_method='spawn', name='extract-worker', wait_timeout=None):
+        self.target = target
+        self.workers = max(1, int(workers))
+        self.timeout = timeout
+        self.wait_timeout = wait_timeout if wait_timeout is not None else timeout * 2
+        self.memory_limit_mb = memory_limit_mb
+        self.max_jobs = max_jobs
+        self.name = name
+        self._ctx = multiprocessing.get_context(start_method)
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self._spawned = 0
+        self._workers = set()
+        self._stats = {'jobs': 0, 'failed': 0, 'timeouts': 0, 'recycled': 0, 'spawn_failures': 0, 'seconds': 0.0}
+
+    def _spawn(self):
+        with self._lock:
+            self._spawned += 1
+            number = self._spawned
+        worker = _Worker(self._ctx, self.target, self.memory_limit_mb, self.max_jobs, f"{self.name}-{number}")
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _try_spawn(self):
+        """启动一个子进程；失败时记录日志并返回None（空位）"""
+        try:
+            return self._spawn()
+        except Exception as e:
+            self._count(spawn_failures=1)
+            logger.error(f"提取进程启动失败: {type(e).__name__}: {str(e)}")
+            return None
+
+    def _kill(self, worker):
+        with self._lock:
+            self._workers.discard(worker)
+        worker.kill()
+
+    def start(self):
+        if self._started:
+            return
+        for _ in range(self.workers):
+            self._idle.put(self._try_spawn())
+        self._started = True
+        # 子进程不是守护进程，解释器退出前必须回收，否则退出时会等待它们
+        atexit.register(self._reap)
+        logger.info(f"提取进程池已启动: {self.workers} 个进程, 超时 {self.timeout}秒, "
+                    f"内存上限 {self.memory_limit_mb}MB, 每进程 {self.max_jobs} 个任务后回收")
+
+    def _count(self, **deltas):
+        with self._lock:
+            for key, value in deltas.items():
+                self._stats[key] += value
+
+    def run(self, *args, timeout=None, **kwargs):
+        """在子进程中执行 target(*args, **kwargs)，返回 ExtractionResult"""
+        if not self._started:
+            self.start()
+        timeout = self.timeout if timeout is None else timeout
+        started = time.perf_counter()
+        try:
+            worker = self._idle.get(timeout=self.wait_timeout)
+        except queue.Empty:
+            self._count(jobs=1, failed=1)
+            return ExtractionResult(error=f"等待空闲提取进程超时（{self.wait_timeout}秒）",
+                                    seconds=time.perf_counter() - started)
+        if worker is None:
+            # 上次补充失败留下的空位，先尝试重新启动
+            worker = self._try_spawn()
+            if worker is None:
+                self._idle.put(None)
+                self._count(jobs=1, failed=1)
+                return ExtractionResult(error="提取进程启动失败", seconds=time.perf_counter() - started)
+        replace = False
+        try:
+            worker.conn.send((args, kwargs))
+            if not worker.conn.poll(timeout):
+                replace = True
+                self._count(jobs=1, failed=1, timeouts=1)
+                return ExtractionResult(error=f"提取超时（{timeout}秒）", seconds=time.perf_counter() - started,
+                                        timed_out=True)
+            value, error, seconds, retire = worker.conn.recv()
+            replace = retire
+            self._count(jobs=1, failed=int(error is not None), recycled=int(retire), seconds=seconds)
+            return ExtractionResult(text=value, error=error, seconds=seconds)
+        except (EOFError, OSError, BrokenPipeError) as e:
+            # 子进程异常退出（如被内存上限杀死）
+            replace = True
+            self._count(jobs=1, failed=1)
+            return ExtractionResult(error=f"提取进程异常退出: {type(e).__name__}", seconds=time.perf_counter() - started)
+        finally:
+            if replace:
+                self._kill(worker)
+                worker = self._try_spawn()
+            self._idle.put(worker)
+
+    def stop(self):
+        """停止全部子进程"""
+        if not self._started:
+            return
+        self._started = False
+        atexit.unregister(self._reap)
+        for _ in range(self.workers):
+            try:
+                worker = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                break
+            if worker is None:
+                continue
+            with self._lock:
+                self._workers.discard(worker)
+            worker.retire()
+        self._reap()
+
+    def _reap(self):
+        """终止全部剩余子进程（包括仍在执行任务的）"""
+        with self._lock:
+            workers, self._workers = list(self._workers), set()
+        for worker in workers:
+            worker.kill()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['workers'] = self.workers
+        stats['idle'] = self._idle.qsize()
+        stats['seconds'] = round(stats['seconds'], 3)
+        return stats
@@ -0,0 +1,143 @@
+# extractor_registry.py - 内容提取器注册表：按扩展名或文件头识别的MIME类型查找提取器，后端首次使用时才导入
+import os
+import logging
+import zipfile
+import importlib
+import importlib.util
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 第三方提取器的入口点分组：名称为扩展名（如 .epub）或MIME类型，值为 模块:函数
+ENTRY_POINT_GROUP = 'file_indexer.extractors'
+# MIME识别读取的文件头字节数
+_SNIFF_BYTES = 4096
+
+_SIGNATURES = [
+    (b'%PDF-', 'application/pdf'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/x-ole-storage'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'II*\x00', 'image/tiff'),
+    (b'MM\x00*', 'image/tiff'),
+    (b'BM', 'image/bmp'),
+]
+# Office Open XML 按zip内的目录区分
+_OOXML_TYPES = [
+    ('word/', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+    ('xl/', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    ('ppt/', 'application/vnd.openxmlformats-officedocument.presentationml.presentation'),
+]
+
+
+class ExtractionError(Exception):
+    """提取失败（缺少解析库、文件损坏、读取出错等）；提取器抛出它而不是返回错误信息，失败结果不会被缓存"""
+
+
+def module_available(name):
+    """检查模块是否已安装，不导入它"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def sniff_mime(file_path):
+    """按文件头识别MIME类型，识别不出时返回 application/octet-stream"""
+    with open(file_path, 'rb') as f:
+        head = f.read(_SNIFF_BYTES)
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    for signature, mime in _SIGNATURES:
+        if head.startswith(signature):
+            return mime
+    if head.startswith(b'PK\x03\x04'):
+        try:
+            with zipfile.ZipFile(file_path) as archive:
+                names = archive.namelist()
+        except zipfile.BadZipFile:
+            return 'application/zip'
+        for prefix, mime in _OOXML_TYPES:
+            if any(name.startswith(prefix) for name in names):
+                return mime
+        return 'application/zip'
+    if head and b'\x00' not in head:
+        return 'text/plain'
+    return 'application/octet-stream'
+
+
+def _entry_points(group):
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        return []
+    try:
+        return list(entry_points(group=group))
+    except TypeError:
+        # Python 3.8/3.9 只支持按分组取字典
+        return list(entry_points().get(group, []))
+
+
+class ExtractorRegistry:
+    """按扩展名和MIME类型登记提取器
+
+    提取器是签名为 (file_path, max_chars=None) -> str 的可调用对象，也可以登记为
+    '模块:函数' 字符串或入口点，第一次用到时才导入对应模块。入口点在第一次查找时
+    加载，同名时覆盖内置提取器。
+    """
+
+    def __init__(self, entry_point_group=ENTRY_POINT_GROUP):
+        self.entry_point_group = entry_point_group
+        self._by_extension = {}
+        self._by_mime = {}
+        self._resolved = {}
+        self._lock = threading.Lock()
+        self._plugins_loaded = entry_point_group is None
+
+    def register(self, extractor, extensions=(), mimes=()):
+        for extension in extensions:
+            self._by_extension[extension.lower()] = extractor
+        for mime in mimes:
+            self._by_mime[mime] = extractor
+
+    def _load_plugins(self):
+        with self._lock:
+            if self._plugins_loaded:
+                return
+            self._plugins_loaded = True
+            for entry_point in _entry_points(self.entry_point_group):
+                key = entry_point.name.lower()
+                if key.startswith('.'):
+                    self._by_extension[key] = entry_point
+                else:
+                    self._by_mime[key] = entry_point
+                logger.info(f"发现第三方提取器: {entry_point.name} -> {entry_point.value}")
+
+    def _resolve(self, extractor):
+        if callable(extractor):
+            return extractor
+        key = extractor if isinstance(extractor, str) else extractor.value
+        with self._lock:
+            func = self._resolved.get(key)
+            if func is None:
+                if isinstance(extractor, str):
+                    module, _, attr = extractor.partition(':')
+                    func = getattr(importlib.import_module(module), attr)
+                else:
+                    func = extractor.load()
+                self._resolved[key] = func
+        return func
+
+    def find(self, file_path):
+        """扩展名优先；扩展名未登记时按文件头识别MIME类型。找不到时返回None"""
+        if not self._plugins_loaded:
+            self._load_plugins()
+        extractor = self._by_extension.get(os.path.splitext(file_path)[1].lower())
+        if extractor is None and self._by_mime:
+            try:
+                extractor = self._by_mime.get(sniff_mime(file_path))
+            except OSError:
+                extractor = None
+        return self._resolve(extractor) if extractor is not None else None
@@ -12,36 +12,62 @@ from dotenv import load_dotenv
 import requests
 import logging
 import re
-import pandas as pd
-from pptx import Presentation
-import PyPDF2
-import docx
 import time
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-from flask import send_from_directory  # 新增这一行
 import threading  # 新增这一行
-import webbrowser  # 新增这一行
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+from worker_pool import WorkerPool
+from debouncer import Debouncer
+from job_store import JobStore, ACTIVE_STATES, DONE
+from manifest import FileManifest
+from content_hash import hash_file
+from content_store import ContentStore
+from path_rules import PathRules, TreeWatcher, split_patterns
+from manifest import walk_files
+from local_db import default_state_db_path
+from index_store import IndexStore, file_id_for
+from http_client import get_http_client
+from endpoint_guard import CircuitOpenError, circuit_state, endpoint_stats, set_state_sink
+from async_engine import AsyncEngine, HTTPX_AVAILABLE
+from analysis_cache import AnalysisCache
+from extraction_service import ExtractionService
+from extraction_cache import ExtractionCache
+from table_extract import extract_xlsx_text, extract_csv_text
+from doc_extract import extract_doc_text, is_word97_document
+from text_salvage import salvage_text
+from text_extract import read_text
+from slide_extract import extract_pptx_text
+from extractor_registry import ExtractorRegistry, ExtractionError, module_available
+from multipart_stream import MultipartEncoder
+from document_store import DocumentStore, INDEX_DOCUMENT, ORIGINAL_DOCUMENT
+from circuit_store import CircuitStore
+
+# 任务用到的Dify接口：处理文件要分析（chat、files）和上传（dataset），删除文件只用知识库接口
+PROCESS_ENDPOINTS = ('chat', 'files', 'dataset')
+DELETE_ENDPOINTS = ('dataset',)
 
 # 加载环境变量
 load_dotenv()
 
-# 配置日志
+# 配置日志：日志文件放在 LOG_DIR（未配置时为程序目录下的 logs），与当前工作目录无关，
+# 基准测试和提取子进程不会把日志写进源码目录
+LOG_DIR = os.getenv('LOG_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
+os.makedirs(LOG_DIR, exist_ok=True)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler('file_monitor.log', encoding='utf-8'),
+        logging.FileHandler(os.path.join(LOG_DIR, 'file_monitor.log'), encoding='utf-8'),
         logging.StreamHandler(sys.stdout)
     ]
 )
 logger = logging.getLogger(__name__)
 
-try:
-    from PIL import Image, ExifTags
-    PIL_AVAILABLE = True
-except ImportError:
-    PIL_AVAILABLE = False
+# 只检查是否安装，Pillow 在第一次处理图片时才导入
+PIL_AVAILABLE = module_available('PIL')
+if not PIL_AVAILABLE:
     logger.warning("PIL/Pillow未安装，图片分析功能将受限")
 
 class FileConverter:
@@ -127,40 +153,12 @@ class FileConverter:
     
     @staticmethod
     def _convert_with_binary_analysis(doc_path, docx_path):
-        """通过二进制分析提取文本内容"""
+        """通过二进制分析提取文本内容（在内存映射上查找UTF-16/UTF-8/GBK文本片段，够10000字符即停止）"""
         try:
-            with open(doc_path, 'rb') as f:
-                content = f.read()
-            
-            # 尝试多种编码提取文本
-            text_content = ""
-            
-            # 尝试UTF-8编码
-            try:
-                decoded = content.decode('utf-8', errors='ignore')
-                # 提取可打印字符
-                printable_chars = ''.join(char for char in decoded if char.isprintable() or char in '\n\r\t')
-                if len(printable_chars) > 100:  # 确保有足够的内容
-                    text_content = printable_chars
-                    logger.info("使用UTF-8编码提取文本成功")
-            except:
-                pass
+            text_content = salvage_text(doc_path, max_chars=10000)
             
-            # 如果UTF-8失败，尝试其他编码
-            if not text_content:
-                encodings = ['gbk', 'gb2312', 'latin-1', 'cp1252']
-                for encoding in encodings:
-                    try:
-                        decoded = content.decode(encoding, errors='ignore')
-                        printable_chars = ''.join(char for char in decoded if char.isprintable() or char in '\n\r\t')
-                        if len(printable_chars) > 100:
-                            text_content = printable_chars
-                            logger.info(f"使用{encoding}编码提取文本成功")
-                            break
-                    except:
-                        continue
-            
-            if text_content:
+            if len(text_content) > 100:  # 确保有足够的内容
+                logger.info(f"从二进制数据中抢救出文本: {len(text_content)} 字符")
                 # 清理文本内容
                 cleaned_content = FileConverter._clean_extracted_text(text_content)
                 return FileConverter._create_docx_from_text(cleaned_content, docx_path, os.path.basename(doc_path))
@@ -255,6 +253,54 @@ class FileConverter:
         except Exception as e:
             raise Exception(f"创建.docx文件错误: {str(e)}")
     
+    @staticmethod
+    def _create_docx_bytes(content, original_filename):
+        """在内存中直接写出与 _create_docx_from_text 结构相同的.docx
+
+        python-docx 逐段 add_paragraph 在段落很多时很慢，这里直接拼接 document.xml。
+        """
+        import io
+        import zipfile
+        from xml.sax.saxutils import escape
+
+        def paragraph(text, style=None):
+            props = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ''
+            return f'<w:p>{props}<w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+        cleaned_content = FileConverter._clean_text_for_xml(content)
+        # XML 1.0 不允许的字符（孤立代理项、U+FFFE/U+FFFF）
+        cleaned_content = re.sub('[\ud800-\udfff\ufffe\uffff]', '', cleaned_content)
+        body = [paragraph(f"转换自: {original_filename}", 'Title')]
+        if not cleaned_content.strip():
+            body.append(paragraph("警告: 提取的内容为空或无法解析"))
+            body.append(paragraph("原始文件可能包含加密内容、损坏数据或特殊格式。"))
+        else:
+            body.extend(paragraph(para) for para in cleaned_content.split('\n') if para.strip())
+        body.append(paragraph("文件信息", 'Heading1'))
+        body.append(paragraph(f"原始文件名: {original_filename}"))
+        body.append(paragraph(f"转换时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"))
+        body.append(paragraph(f"内容长度: {len(cleaned_content)} 字符"))
+
+        document = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                    f'<w:body>{"".join(body)}</w:body></w:document>')
+        content_types = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                         '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                         '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                         '<Default Extension="xml" ContentType="application/xml"/>'
+                         '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-'
+                         'officedocument.wordprocessingml.document.main+xml"/></Types>')
+        rels = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+                'officeDocument" Target="word/document.xml"/></Relationships>')
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('[Content_Types].xml', content_types)
+            archive.writestr('_rels/.rels', rels)
+            archive.writestr('word/document.xml', document)
+        return buffer.getvalue()
+
     @staticmethod
     def _make_xml_safe(text):
         """确保文本是XML安全的"""
@@ -311,6 +357,11 @@ class Config:
     # Chatflow配置
     CHATFLOW_APP_ID = os.getenv('WORKFLOW_APP_ID', 'your key')
     CHATFLOW_API_KEY = os.getenv('WORKFLOW_API_KEY', 'your key')
+
+    # 分析结果缓存：内容未变时不再调用Chatflow；修改提示词后缓存随版本自动失效
+    ANALYSIS_CACHE_ENABLED = os.getenv('ANALYSIS_CACHE_ENABLED', 'true').lower() == 'true'
+    ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv('ANALYSIS_CACHE_MAX_ENTRIES', '100000'))
+    ANALYSIS_CACHE_MAX_MB = float(os.getenv('ANALYSIS_CACHE_MAX_MB', '64'))
     
     MONITOR_DIR = os.getenv('MONITOR_DIR', 'your path')
     ALLOWED_EXTENSIONS = tuple(os.getenv('ALLOWED_EXTENSIONS', 
@@ -318,6 +369,63 @@ class Config:
     PROCESS_INTERVAL = int(os.getenv('PROCESS_INTERVAL', '5'))
     API_TIMEOUT = int(os.getenv('API_TIMEOUT', '60'))
 
+    # 内容提取进程池：解析库在子进程中运行，超时/超内存只影响单个文件（0表示在当前线程提取）
+    EXTRACT_WORKERS = int(os.getenv('EXTRACT_WORKERS', '2'))
+    EXTRACT_TIMEOUT = float(os.getenv('EXTRACT_TIMEOUT', '60'))
+    EXTRACT_MEMORY_LIMIT_MB = int(os.getenv('EXTRACT_MEMORY_LIMIT_MB', '1024'))
+    EXTRACT_MAX_JOBS_PER_WORKER = int(os.getenv('EXTRACT_MAX_JOBS_PER_WORKER', '100'))
+
+    # 提取结果缓存（内存 + 本地库），同一内容只解析一次
+    EXTRACT_CACHE_ENABLED = os.getenv('EXTRACT_CACHE_ENABLED', 'true').lower() == 'true'
+    EXTRACT_CACHE_MEMORY_MB = float(os.getenv('EXTRACT_CACHE_MEMORY_MB', '32'))
+    EXTRACT_CACHE_DISK_MB = float(os.getenv('EXTRACT_CACHE_DISK_MB', '256'))
+
+    # 表格提取上限：每个工作表/CSV读取的行数、列数，以及未指定预算时的总字符数
+    TABLE_MAX_ROWS = int(os.getenv('TABLE_MAX_ROWS', '10'))
+    TABLE_MAX_COLS = int(os.getenv('TABLE_MAX_COLS', '30'))
+    TABLE_MAX_CHARS = int(os.getenv('TABLE_MAX_CHARS', '20000'))
+
+    # 纯文本提取上限：未指定预算时最多返回的字符数（编码自动识别，超大文件通过内存映射读取）
+    TEXT_MAX_CHARS = int(os.getenv('TEXT_MAX_CHARS', '200000'))
+
+    # 图片缩略图：启用后随Chatflow图片分析请求一起发送，按内容哈希缓存
+    IMAGE_THUMBNAIL_ENABLED = os.getenv('IMAGE_THUMBNAIL_ENABLED', 'false').lower() == 'true'
+    IMAGE_THUMBNAIL_SIZE = int(os.getenv('IMAGE_THUMBNAIL_SIZE', '512'))
+    IMAGE_THUMBNAIL_QUALITY = int(os.getenv('IMAGE_THUMBNAIL_QUALITY', '75'))
+    IMAGE_THUMBNAIL_CACHE_MB = float(os.getenv('IMAGE_THUMBNAIL_CACHE_MB', '64'))
+
+    # 并发处理配置
+    WORKER_POOL_SIZE = int(os.getenv('WORKER_POOL_SIZE', '4'))
+    WORKER_QUEUE_SIZE = int(os.getenv('WORKER_QUEUE_SIZE', '1000'))
+    WORKER_POOL_MODE = os.getenv('WORKER_POOL_MODE', 'thread').lower()  # thread / process / async
+    # 异步模式：同时在途的文件数和各接口的并发上限（内容提取仍使用 WORKER_POOL_SIZE 个线程）
+    ASYNC_MAX_IN_FLIGHT = int(os.getenv('ASYNC_MAX_IN_FLIGHT', '256'))
+    ASYNC_CHAT_CONCURRENCY = int(os.getenv('ASYNC_CHAT_CONCURRENCY', '8'))
+    ASYNC_UPLOAD_CONCURRENCY = int(os.getenv('ASYNC_UPLOAD_CONCURRENCY', '8'))
+    STATS_LOG_INTERVAL = int(os.getenv('STATS_LOG_INTERVAL', '60'))
+    # 索引摘要通过 create-by-text 上传，同时在途的请求不超过 INDEX_UPLOAD_CONCURRENCY 个
+    INDEX_UPLOAD_CONCURRENCY = int(os.getenv('INDEX_UPLOAD_CONCURRENCY', '8'))
+    # create-by-text 新建文档时的索引方式（high_quality / economy）和分段模式（automatic），留空使用知识库默认设置
+    INDEX_INDEXING_TECHNIQUE = os.getenv('INDEX_INDEXING_TECHNIQUE', '').strip()
+    INDEX_PROCESS_MODE = os.getenv('INDEX_PROCESS_MODE', '').strip()
+
+    # 事件合并配置：同一文件在静默期内的所有事件合并为一次处理
+    DEBOUNCE_QUIET_SECONDS = float(os.getenv('DEBOUNCE_QUIET_SECONDS', '1.0'))
+
+    # 本地状态库（任务队列等），不要放在监控目录中
+    STATE_DB_PATH = default_state_db_path()
+    # 索引导出目录（需要文本文件时导出到这里，不写回监控目录）
+    INDEX_EXPORT_DIR = os.getenv('INDEX_EXPORT_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index_export')
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '5'))
+    JOB_RETRY_BASE_SECONDS = float(os.getenv('JOB_RETRY_BASE_SECONDS', '10'))
+    JOB_RETRY_MAX_SECONDS = float(os.getenv('JOB_RETRY_MAX_SECONDS', '600'))
+    RECONCILE_ON_START = os.getenv('RECONCILE_ON_START', 'true').lower() == 'true'
+
+    # 递归监控与包含/排除规则（逗号分隔的glob，相对监控目录）
+    MONITOR_RECURSIVE = os.getenv('MONITOR_RECURSIVE', 'true').lower() == 'true'
+    MONITOR_INCLUDE = split_patterns(os.getenv('MONITOR_INCLUDE', ''))
+    MONITOR_EXCLUDE = split_patterns(os.getenv('MONITOR_EXCLUDE', ''))
+
     @property
     def ACTUAL_ORIGINAL_KB_ID(self):
         """动态决定使用哪个原文件知识库"""
@@ -331,59 +439,8 @@ config = Config()
 # 修复 DifyChatflowAnalyzer 类，添加 extract_text_content 方法
 # 修改 DifyChatflowAnalyzer 类中的 _process_ai_response 方法
 
-class DifyChatflowAnalyzer:
-    """Dify Chatflow分析器"""
-    
-    def __init__(self):
-        # 初始化 SimpleFileAnalyzer 实例用于提取文本内容
-        self.simple_analyzer = SimpleFileAnalyzer()
-    
-    def analyze_with_chatflow(self, file_path):
-        """使用Dify Chatflow分析文件 - 支持图片"""
-        try:
-            file_ext = os.path.splitext(file_path)[1].lower()
-            is_image = file_ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff']
-        
-            if is_image:
-                return self._analyze_image_with_chatflow(file_path)
-            else:
-                return self._analyze_document_with_chatflow(file_path)
-    
-        except FileNotFoundError:
-            logger.error(f"文件不存在: {file_path}")
-            return None
-        except PermissionError:
-            logger.error(f"无权限访问文件: {file_path}")
-            return None
-        except Exception as e:
-            logger.error(f"Chatflow分析未知异常: {str(e)}")
-            return None
-
-    def _analyze_image_with_chatflow(self, file_path):
-        """专门分析图片的Chatflow方法"""
-        try:
-            file_name = os.path.basename(file_path)
-            logger.info(f"开始使用Dify Chatflow分析图片: {file_name}")
-            
-            # 检查PIL是否可用
-            if not PIL_AVAILABLE:
-                logger.warning("PIL/Pillow未安装，无法分析图片内容")
-                return None
-            
-            # 提取图片信息
-            image_info_str = EnhancedFileAnalyzer._extract_image_content(file_path)
-            if not image_info_str or "图片处理错误" in image_info_str:
-                logger.warning(f"图片信息提取失败: {file_name}")
-                return None
-            
-            # 构造图片分析专用提示词
-            url = f"{config.DIFY_BASE_URL}/v1/chat-messages"
-            headers = {
-                "Authorization": f"Bearer {config.CHATFLOW_API_KEY}",
-                "Content-Type": "application/json"
-            }
-            
-            prompt = f"""
+# 提示词模板；PROMPT_VERSION 默认取模板摘要，修改模板后分析缓存自动失效
+IMAGE_PROMPT_TEMPLATE = """
 请分析这张图片，用3-4句话描述图片内容，包括：
 1. 主要场景和背景
 2. 图片中的主体对象  
@@ -395,53 +452,9 @@ class DifyChatflowAnalyzer:
 
 请直接输出描述内容，不要添加思考过程或分析步骤。
             """
-            
-            data = {
-                "inputs": {},
-                "query": prompt,
-                "response_mode": "blocking",
-                "user": f"file_monitor_{hashlib.md5(file_name.encode()).hexdigest()[:8]}"
-            }
-            
-            response = requests.post(url, headers=headers, json=data, timeout=config.API_TIMEOUT)
-            
-            if response.status_code == 200:
-                result = response.json()
-                logger.info(f"Dify Chatflow图片分析成功: {file_name}")
-                
-                # 处理返回结果
-                processed_result = self._process_image_ai_response(result, file_name)
-                return processed_result
-            else:
-                logger.error(f"Dify Chatflow图片分析失败: {response.status_code}")
-                return None
-                
-        except Exception as e:
-            logger.error(f"图片Chatflow分析异常: {str(e)}")
-            return None
-    
-    def _analyze_document_with_chatflow(self, file_path):
-        """原有的文档分析方法"""
-        try:
-            file_name = os.path.basename(file_path)
-            logger.info(f"开始使用Dify Chatflow分析文档: {file_name}")
-            
-            # 使用 SimpleFileAnalyzer 提取文本内容
-            file_content = EnhancedFileAnalyzer.extract_text_content(file_path)
-            if not file_content or len(file_content.strip()) == 0:
-                logger.warning(f"文件内容为空，跳过Chatflow分析: {file_name}")
-                return None
-            
-            # 构造Chatflow请求
-            url = f"{config.DIFY_BASE_URL}/v1/chat-messages"
-            
-            headers = {
-                "Authorization": f"Bearer {config.CHATFLOW_API_KEY}",
-                "Content-Type": "application/json"
-            }
-            
-            # 更严格的提示词，强制大模型不输出思考过程
-            prompt = f"""
+
+# 更严格的提示词，强制大模型不输出思考过程
+DOCUMENT_PROMPT_TEMPLATE = """
 请严格按照以下格式分析文档，不要包含任何思考过程、分析步骤或解释：
 
 文件类型: [作业/实验报告/学术论文/项目报告/技术文档/学习笔记等]
@@ -449,49 +462,199 @@ class DifyChatflowAnalyzer:
 
 文档信息:
 文件名: {file_name}
-内容: {file_content[:4000]}
+内容: {file_content}
 
 请直接输出格式化的结果，不要添加任何其他内容。
             """
-            
-            data = {
-                "inputs": {},
-                "query": prompt,
-                "response_mode": "blocking",
-                "user": f"file_monitor_{hashlib.md5(file_name.encode()).hexdigest()[:8]}"
-            }
-            
-            logger.debug(f"Chatflow请求URL: {url}")
-            
-            response = requests.post(
-                url,
-                headers=headers,
-                json=data,
-                timeout=config.API_TIMEOUT
+
+# 送入提示词的内容长度
+PROMPT_CONTENT_CHARS = 4000
+
+PROMPT_VERSION = os.getenv('PROMPT_VERSION') or hashlib.blake2b(
+    f"{IMAGE_PROMPT_TEMPLATE}|{DOCUMENT_PROMPT_TEMPLATE}|{PROMPT_CONTENT_CHARS}|"
+    f"{config.IMAGE_THUMBNAIL_ENABLED}:{config.IMAGE_THUMBNAIL_SIZE}".encode('utf-8'), digest_size=6
+).hexdigest()
+
+class DifyChatflowAnalyzer:
+    """Dify Chatflow分析器"""
+    
+    def __init__(self):
+        # 初始化 SimpleFileAnalyzer 实例用于提取文本内容
+        self.simple_analyzer = SimpleFileAnalyzer()
+        self.http = get_http_client()
+        self.cache = None
+        if config.ANALYSIS_CACHE_ENABLED:
+            self.cache = AnalysisCache(
+                config.STATE_DB_PATH,
+                max_entries=config.ANALYSIS_CACHE_MAX_ENTRIES,
+                max_bytes=int(config.ANALYSIS_CACHE_MAX_MB * 1024 * 1024)
             )
-            
-            logger.debug(f"Chatflow响应状态码: {response.status_code}")
-            
-            if response.status_code == 200:
-                result = response.json()
-                logger.info(f"Dify Chatflow分析成功: {file_name}")
-                
-                # 对返回结果进行后处理，确保格式正确
-                processed_result = self._process_ai_response(result)
-                return processed_result
-            else:
-                logger.error(f"Dify Chatflow分析失败: {response.status_code} - {response.text}")
+        # 同一个Chatflow应用才能复用结果；未配置应用ID时用API密钥摘要区分应用
+        self.app_id = config.CHATFLOW_APP_ID or hashlib.blake2b(
+            (config.CHATFLOW_API_KEY or '').encode('utf-8'), digest_size=8).hexdigest()
+    
+    def analyze_with_chatflow(self, file_path, content_hash=None):
+        """使用Dify Chatflow分析文件 - 支持图片；传入内容哈希时先查分析缓存"""
+        try:
+            cached = self.cached_result(content_hash, file_path)
+            if cached:
+                return cached
+
+            request = self.build_chatflow_request(file_path, content_hash=content_hash)
+            if not request:
                 return None
-                
+            response = self.http.post(
+                request['url'],
+                headers=request['headers'],
+                json=request['json'],
+                timeout=config.API_TIMEOUT
+            )
+            result = self.process_chatflow_response(request, response.status_code, response.text)
+            self.cache_result(content_hash, result)
+            return result
+
+        except CircuitOpenError:
+            # 接口熔断中不走备用方案，任务挂回队列，恢复后重新分析
+            raise
         except requests.exceptions.Timeout:
             logger.error("Dify Chatflow请求超时")
             return None
         except requests.exceptions.ConnectionError:
             logger.error("Dify Chatflow连接错误，请检查网络连接和DIFY_BASE_URL")
             return None
+        except FileNotFoundError:
+            logger.error(f"文件不存在: {file_path}")
+            return None
+        except PermissionError:
+            logger.error(f"无权限访问文件: {file_path}")
+            return None
+        except Exception as e:
+            logger.error(f"Chatflow分析未知异常: {str(e)}")
+            return None
+
+    def cached_result(self, content_hash, file_path=None):
+        """查分析缓存，命中时返回与Chatflow一致的结果结构"""
+        if not self.cache or not content_hash:
+            return None
+        try:
+            answer = self.cache.get(content_hash, PROMPT_VERSION, self.app_id)
+        except Exception as e:
+            logger.warning(f"读取分析缓存失败: {str(e)}")
+            return None
+        if answer is None:
+            return None
+        logger.info(f"分析缓存命中，跳过Chatflow调用: {os.path.basename(file_path or '')}")
+        return {'answer': answer, 'cached': True}
+
+    def cache_result(self, content_hash, result):
+        """保存处理后的分析结果（只缓存成功的结果）"""
+        if not self.cache or not content_hash or not result or not result.get('answer'):
+            return
+        try:
+            self.cache.put(content_hash, PROMPT_VERSION, self.app_id, result['answer'])
+        except Exception as e:
+            logger.warning(f"写入分析缓存失败: {str(e)}")
+
+    def build_chatflow_request(self, file_path, content_hash=None):
+        """提取内容并构造Chatflow请求（同步/异步流水线共用），无法分析时返回None"""
+        file_ext = os.path.splitext(file_path)[1].lower()
+        is_image = file_ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff']
+        if is_image:
+            prompt = self._build_image_prompt(file_path, content_hash)
+        else:
+            prompt = self._build_document_prompt(file_path, content_hash)
+        if not prompt:
+            return None
+
+        file_name = os.path.basename(file_path)
+        user = f"file_monitor_{hashlib.md5(file_name.encode()).hexdigest()[:8]}"
+        payload = {
+            "inputs": {},
+            "query": prompt,
+            "response_mode": "blocking",
+            "user": user
+        }
+        if is_image and config.IMAGE_THUMBNAIL_ENABLED:
+            files = self._upload_image_thumbnail(file_path, content_hash, user)
+            if files:
+                payload["files"] = files
+        return {
+            'url': f"{config.DIFY_BASE_URL}/v1/chat-messages",
+            'headers': {
+                "Authorization": f"Bearer {config.CHATFLOW_API_KEY}",
+                "Content-Type": "application/json"
+            },
+            'json': payload,
+            'file_name': file_name,
+            'is_image': is_image,
+        }
+
+    def _upload_image_thumbnail(self, file_path, content_hash, user):
+        """上传缩略图（而不是原图）供Chatflow识别，失败时返回空列表，仍按文件名分析"""
+        file_name = os.path.basename(file_path)
+        try:
+            thumbnail = get_image_thumbnail(file_path, content_hash)
+            response = self.http.post(
+                f"{config.DIFY_BASE_URL}/v1/files/upload",
+                headers={"Authorization": f"Bearer {config.CHATFLOW_API_KEY}"},
+                files={'file': (os.path.splitext(file_name)[0] + '.jpg', thumbnail, 'image/jpeg')},
+                data={'user': user},
+                timeout=config.API_TIMEOUT
+            )
+            if response.status_code not in (200, 201):
+                logger.warning(f"缩略图上传失败: {file_name} - {response.status_code} {response.text[:200]}")
+                return []
+            upload_id = response.json().get('id')
         except Exception as e:
-            logger.error(f"Dify Chatflow分析异常: {str(e)}")
+            logger.warning(f"缩略图生成或上传失败: {file_name} - {str(e)}")
+            return []
+        logger.debug(f"缩略图已上传: {file_name} ({len(thumbnail)} 字节)")
+        return [{"type": "image", "transfer_method": "local_file", "upload_file_id": upload_id}]
+
+    def process_chatflow_response(self, request, status_code, text):
+        """处理Chatflow响应（同步/异步流水线共用）"""
+        file_name = request['file_name']
+        kind = "图片" if request['is_image'] else ""
+        if status_code != 200:
+            logger.error(f"Dify Chatflow{kind}分析失败: {status_code} - {text[:500]}")
+            return None
+        result = json.loads(text)
+        logger.info(f"Dify Chatflow{kind}分析成功: {file_name}")
+        if request['is_image']:
+            return self._process_image_ai_response(result, file_name)
+        # 对返回结果进行后处理，确保格式正确
+        return self._process_ai_response(result)
+
+    def _build_image_prompt(self, file_path, content_hash=None):
+        """图片分析提示词"""
+        file_name = os.path.basename(file_path)
+        logger.info(f"开始使用Dify Chatflow分析图片: {file_name}")
+
+        # 检查PIL是否可用
+        if not PIL_AVAILABLE:
+            logger.warning("PIL/Pillow未安装，无法分析图片内容")
+            return None
+
+        # 提取图片信息
+        image_info_str = extract_content(file_path, content_hash=content_hash)
+        if not image_info_str:
+            logger.warning(f"图片信息提取失败: {file_name}")
+            return None
+
+        return IMAGE_PROMPT_TEMPLATE.format(file_name=file_name)
+
+    def _build_document_prompt(self, file_path, content_hash=None):
+        """文档分析提示词"""
+        file_name = os.path.basename(file_path)
+        logger.info(f"开始使用Dify Chatflow分析文档: {file_name}")
+
+        # 提示词只用到前 PROMPT_CONTENT_CHARS 个字符，提取到这么多即可停止
+        file_content = extract_content(file_path, max_chars=PROMPT_CONTENT_CHARS, content_hash=content_hash)
+        if not file_content or len(file_content.strip()) == 0:
+            logger.warning(f"文件内容为空，跳过Chatflow分析: {file_name}")
             return None
+
+        return DOCUMENT_PROMPT_TEMPLATE.format(file_name=file_name, file_content=file_content[:PROMPT_CONTENT_CHARS])
     
     def _process_image_ai_response(self, result, file_name):
         """处理图片分析的AI返回结果"""
@@ -620,7 +783,7 @@ class DifyChatflowAnalyzer:
             test_url = f"{config.DIFY_BASE_URL}/v1/models"
             headers = {"Authorization": f"Bearer {config.CHATFLOW_API_KEY}"}
             
-            response = requests.get(test_url, headers=headers, timeout=10)
+            response = self.http.get(test_url, headers=headers, timeout=10)
             if response.status_code == 200:
                 result = response.json()
                 print("✅ Dify API连接成功")
@@ -641,6 +804,8 @@ class DifyChatflowIndexGenerator:
         self.chatflow_analyzer = DifyChatflowAnalyzer()
         self.fallback_analyzer = SimpleFileAnalyzer()
         self.info_extractor = FileInfoExtractor()
+        # 索引保存在本地索引库中，不再写回监控目录
+        self.index_store = IndexStore(config.STATE_DB_PATH)
     
     def _enhance_summary_with_filename(self, content_summary, original_filename, max_length=250):
         """在内容总结中增强文件名信息"""
@@ -663,8 +828,32 @@ class DifyChatflowIndexGenerator:
     
         return enhanced
     
-    def generate_index_file(self, file_path):
-        """生成索引文件（优先使用Dify Chatflow）"""
+    def generate_index_file(self, file_path, content_hash=None):
+        """生成索引并导出为文本文件（导出到 INDEX_EXPORT_DIR，不写回监控目录）"""
+        if not self.generate_index_content(file_path, content_hash=content_hash):
+            return None
+        return self.export_index_file(file_path)
+
+    def export_index_file(self, file_path):
+        """把索引库中的索引导出为文本文件"""
+        try:
+            index_path = self.index_store.export(file_id_for(file_path), config.INDEX_EXPORT_DIR)
+            if index_path:
+                logger.info(f"索引文件已导出: {index_path}")
+            return index_path
+        except Exception as e:
+            logger.error(f"索引文件导出失败: {file_path} - {str(e)}")
+            return None
+
+    @staticmethod
+    def index_document_name(file_path, is_fallback=False):
+        """索引在知识库中的文档名"""
+        base_name = os.path.splitext(os.path.basename(file_path))[0]
+        suffix = "_fallback_index" if is_fallback else "_chatflow_index"
+        return f"{base_name}{suffix}.txt"
+
+    def generate_index_content(self, file_path, content_hash=None):
+        """生成索引内容并存入索引库，返回 (索引内容, 是否为备用方案)"""
         try:
             file_name = os.path.basename(file_path)
             
@@ -675,44 +864,52 @@ class DifyChatflowIndexGenerator:
             logger.info(f"开始处理文件: {file_name}")
             
             # 获取文件信息
-            file_info = self.info_extractor.extract_file_info(file_path)
+            file_info = self.info_extractor.extract_file_info(file_path, content_hash=content_hash)
             if not file_info:
                 return None
             
             # 1. 优先使用Dify Chatflow分析
-            chatflow_result = self.chatflow_analyzer.analyze_with_chatflow(file_path)
-            
-            if chatflow_result:
-                # Chatflow分析成功
-                index_content = self._format_chatflow_index(file_info, chatflow_result, file_path)
-                analysis_method = "Dify Chatflow分析"
-                is_fallback = False
-            else:
-                # Chatflow失败，使用备用方案
-                logger.info(f"Chatflow分析失败，使用备用方案: {file_name}")
-                content = self.fallback_analyzer.extract_text_content(file_path)
-                file_type = self.fallback_analyzer.infer_file_type(file_name, content)
-                content_summary = self._simplify_content_summary(content)
-                index_content = self._format_fallback_index(file_info, file_type, content_summary)
-                analysis_method = "本地规则推断"
-                is_fallback = True
-            
-            # 保存索引文件
-            base_name = os.path.splitext(file_name)[0]
-            suffix = "_fallback_index" if is_fallback else "_chatflow_index"
-            index_filename = f"{base_name}{suffix}.txt"
-            index_path = os.path.join(config.MONITOR_DIR, index_filename)
-            
-            with open(index_path, 'w', encoding='utf-8') as f:
-                f.write(index_content)
-            
-            logger.info(f"索引文件已生成 ({analysis_method}): {index_filename}")
-            return index_path
+            chatflow_result = self.chatflow_analyzer.analyze_with_chatflow(file_path, content_hash=file_info['hash'])
+            return self.build_index(file_path, file_info, chatflow_result)
             
+        except CircuitOpenError as e:
+            logger.warning(f"索引生成暂缓: {os.path.basename(file_path)} - {str(e)}")
+            return None
         except Exception as e:
             logger.error(f"索引文件生成失败: {file_path} - {str(e)}")
             return None
+
+    def build_index(self, file_path, file_info, chatflow_result):
+        """由Chatflow分析结果（失败时为None）生成索引并存入索引库（同步/异步流水线共用）"""
+        file_name = file_info['name']
+        if chatflow_result:
+            # Chatflow分析成功
+            index_content = self._format_chatflow_index(file_info, chatflow_result, file_path)
+            analysis_method = "Dify Chatflow分析"
+            is_fallback = False
+        else:
+            # Chatflow失败，使用备用方案
+            logger.info(f"Chatflow分析失败，使用备用方案: {file_name}")
+            # 与分析阶段的提取结果相同，直接命中提取缓存
+            content = extract_content(file_path, max_chars=PROMPT_CONTENT_CHARS, content_hash=file_info['hash'])
+            file_type = self.fallback_analyzer.infer_file_type(file_name, content)
+            content_summary = self._simplify_content_summary(content)
+            index_content = self._format_fallback_index(file_info, file_type, content_summary)
+            analysis_method = "本地规则推断"
+            is_fallback = True
+
+        self.index_store.put(file_path, index_content, method=analysis_method, content_hash=file_info['hash'])
+        logger.info(f"索引已保存到索引库 ({analysis_method}): {file_name}")
+        return index_content, is_fallback
     
+    @staticmethod
+    def retarget_index(index_content, file_path):
+        """复用的索引文本改为当前文件的文件名和路径（副本、移动/重命名后的文件）"""
+        index_content = re.sub(r'^文件名: .*$', lambda m: f"文件名: {os.path.basename(file_path)}",
+                               index_content, count=1, flags=re.M)
+        return re.sub(r'^文件路径: .*$', lambda m: f"文件路径: {os.path.abspath(file_path)}",
+                      index_content, count=1, flags=re.M)
+
     def _format_chatflow_index(self, file_info, chatflow_result, file_path):
         """格式化Chatflow分析结果索引文件（严格精简版）"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -846,9 +1043,9 @@ class SimpleFileAnalyzer:
     """基础文件分析器（用于备用方案）"""
     
     @staticmethod
-    def extract_text_content(file_path):
+    def extract_text_content(file_path, max_chars=None):
         """提取文本内容（兼容EnhancedFileAnalyzer）"""
-        return EnhancedFileAnalyzer.extract_text_content(file_path)
+        return EnhancedFileAnalyzer.extract_text_content(file_path, max_chars=max_chars)
     
     @staticmethod
     def infer_file_type(file_name, content):
@@ -890,87 +1087,50 @@ class EnhancedFileAnalyzer:
     """增强的文件分析器"""
     
     @staticmethod
-    def extract_text_content(file_path):
-        """增强的文本内容提取"""
+    def extract_text_content(file_path, max_chars=None):
+        """增强的文本内容提取；max_chars 为字符预算，支持的格式提取够数后提前停止
+
+        按扩展名（未登记的扩展名按文件头识别的MIME类型）从 EXTRACTORS 查找提取器，
+        解析库在第一次用到时才导入。提取失败时抛出 ExtractionError。
+        """
+        extractor = EXTRACTORS.find(file_path)
+        if extractor is None:
+            # 其他文本文件尝试读取
+            try:
+                return EnhancedFileAnalyzer._extract_plain_text(file_path, max_chars=max_chars)
+            except:
+                return ""
         try:
-            file_ext = os.path.splitext(file_path)[1].lower()
-            
-            if file_ext == '.txt':
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    return f.read()
-                    
-            elif file_ext == '.docx':
-                try:
-                    import docx
-                    doc = docx.Document(file_path)
-                    paragraphs = [para.text for para in doc.paragraphs if para.text.strip()]
-                    return '\n'.join(paragraphs)
-                except Exception as e:
-                    return f"Word文档读取错误: {str(e)}"
-                    
-            elif file_ext == '.doc':
-                # 旧版Word文档处理
-                return EnhancedFileAnalyzer._extract_doc_content(file_path)
-                    
-            elif file_ext == '.pdf':
-                return EnhancedFileAnalyzer._extract_pdf_content(file_path)
-                    
-            elif file_ext == '.xlsx':
-                return EnhancedFileAnalyzer._extract_excel_content(file_path)
-                    
-            elif file_ext == '.pptx':
-                return EnhancedFileAnalyzer._extract_ppt_content(file_path)
-            
-            elif file_ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff']:
-                return EnhancedFileAnalyzer._extract_image_content(file_path)
-            
-            else:
-                # 其他文本文件尝试读取
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        return f.read()
-                except:
-                    return ""
-                    
+            return extractor(file_path, max_chars=max_chars)
+        except ExtractionError:
+            raise
         except Exception as e:
-            return f"内容提取失败: {str(e)}"
+            raise ExtractionError(f"内容提取失败: {str(e)}") from e
         
     @staticmethod
-    def _extract_image_content(file_path):
-        """提取图片内容信息"""
+    def _extract_plain_text(file_path, max_chars=None):
+        """读取纯文本：按文件开头识别编码（UTF-8/GBK/UTF-16），增量解码到预算为止"""
+        return read_text(file_path, max_chars=min(max_chars or config.TEXT_MAX_CHARS, config.TEXT_MAX_CHARS))
+
+    @staticmethod
+    def _extract_docx_content(file_path, max_chars=None):
+        """提取Word文档段落"""
         try:
-            # 使用PIL获取图片基本信息
-            from PIL import Image, ExifTags
-            import base64
-            
-            with Image.open(file_path) as img:
-                # 获取图片基本信息
-                info = {
-                    'format': img.format,
-                    'size': img.size,
-                    'mode': img.mode,
-                    'filename': os.path.basename(file_path)
-                }
-                
-                # 获取EXIF信息
-                try:
-                    exif_data = img._getexif()
-                    if exif_data:
-                        for tag, value in exif_data.items():
-                            tag_name = ExifTags.TAGS.get(tag, tag)
-                            info[f'exif_{tag_name}'] = str(value)
-                except:
-                    pass
-                
-                # 转换为base64用于大模型分析
-                with open(file_path, 'rb') as f:
-                    image_base64 = base64.b64encode(f.read()).decode('utf-8')
-                    info['base64_data'] = image_base64
-                
-                return json.dumps(info, ensure_ascii=False)
-                
+            import docx
+            doc = docx.Document(file_path)
+            paragraphs = [para.text for para in doc.paragraphs if para.text.strip()]
+            return '\n'.join(paragraphs)
+        except Exception as e:
+            raise ExtractionError(f"Word文档读取错误: {str(e)}") from e
+
+    @staticmethod
+    def _extract_image_content(file_path, max_chars=None):
+        """提取图片内容信息（只读文件头和EXIF，不读取像素数据）"""
+        try:
+            from image_extract import image_info
+            return json.dumps(image_info(file_path), ensure_ascii=False)
         except Exception as e:
-            return f"图片处理错误: {str(e)}"
+            raise ExtractionError(f"图片处理错误: {str(e)}") from e
         
 
     @staticmethod
@@ -1007,13 +1167,20 @@ class EnhancedFileAnalyzer:
             # 如果转换失败，使用原始提取方法
             return EnhancedFileAnalyzer._extract_doc_content(file_path)
             
+        except ExtractionError:
+            raise
         except Exception as e:
-            return f".doc文件解析错误: {str(e)}"
+            raise ExtractionError(f".doc文件解析错误: {str(e)}") from e
         
     @staticmethod
-    def _extract_doc_content(file_path):
-        """提取旧版Word文档内容"""
+    def _extract_doc_content(file_path, max_chars=None):
+        """提取旧版Word文档内容：Word 97-2003 格式直接解析，其他情况再尝试外部工具"""
         try:
+            try:
+                return extract_doc_text(file_path, max_chars=max_chars)
+            except ValueError as e:
+                logger.info(f"无法直接解析.doc文件（{str(e)}），尝试外部工具: {os.path.basename(file_path)}")
+
             # 方法1: 尝试使用antiword（需要安装）
             try:
                 import subprocess
@@ -1032,95 +1199,201 @@ class EnhancedFileAnalyzer:
             except:
                 pass
             
-            # 方法3: 使用python-docx兼容模式
+            # 方法3: 从二进制数据中抢救文本片段
             try:
-                import docx
-                # 尝试以二进制方式读取
-                with open(file_path, 'rb') as f:
-                    content = f.read().decode('utf-8', errors='ignore')
-                    return content[:5000]  # 限制长度
-            except:
-                pass
-            
-            return "需要安装antiword或catdoc来解析.doc文件"
-            
+                content = salvage_text(file_path, max_chars=max_chars or 5000)
+                if content:
+                    return content
+            except Exception as e:
+                logger.debug(f"二进制文本抢救失败: {str(e)}")
         except Exception as e:
-            return f".doc文件解析错误: {str(e)}"
+            raise ExtractionError(f".doc文件解析错误: {str(e)}") from e
+        raise ExtractionError("需要安装antiword或catdoc来解析.doc文件")
     
     @staticmethod
-    def _extract_pdf_content(file_path):
-        """提取PDF内容"""
+    def _extract_pdf_content(file_path, max_chars=None):
+        """提取PDF内容：逐页读取，达到字符预算后不再解析后续页"""
         try:
-            # 优先使用PyPDF2
-            try:
-                import PyPDF2
-                with open(file_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    text = ""
-                    for page in pdf_reader.pages:
-                        page_text = page.extract_text()
-                        if page_text:
-                            text += page_text + "\n"
-                    return text if text else "PDF内容为空或受保护"
-            except ImportError:
-                return "请安装PyPDF2: pip install PyPDF2"
-            except Exception as e:
-                return f"PDF解析错误: {str(e)}"
-                
+            from pdf_extract import extract_pdf_text
+            text = extract_pdf_text(file_path, max_chars=max_chars)
+        except ImportError as e:
+            raise ExtractionError("请安装PyPDF2: pip install PyPDF2") from e
         except Exception as e:
-            return f"PDF读取失败: {str(e)}"
+            raise ExtractionError(f"PDF解析错误: {str(e)}") from e
+        return text if text else "PDF内容为空或受保护"
     
     @staticmethod
-    def _extract_excel_content(file_path):
-        """提取Excel内容"""
+    def _extract_excel_content(file_path, max_chars=None):
+        """提取Excel内容：只打开一次工作簿，每个工作表流式读取前几行"""
         try:
-            import pandas as pd
-            try:
-                # 读取所有工作表
-                excel_file = pd.ExcelFile(file_path)
-                content = []
-                
-                for sheet_name in excel_file.sheet_names:
-                    # 只读取前5行作为样本
-                    df = pd.read_excel(file_path, sheet_name=sheet_name, nrows=5)
-                    content.append(f"工作表: {sheet_name}")
-                    content.append(str(df))
-                    
-                return '\n'.join(content) if content else "Excel文件为空"
-                
-            except Exception as e:
-                return f"Excel读取错误: {str(e)}"
-                
-        except ImportError:
-            return "请安装pandas: pip install pandas openpyxl"
+            text = extract_xlsx_text(
+                file_path,
+                max_rows=config.TABLE_MAX_ROWS,
+                max_cols=config.TABLE_MAX_COLS,
+                max_chars=min(max_chars or config.TABLE_MAX_CHARS, config.TABLE_MAX_CHARS)
+            )
+            return text if text else "Excel文件为空"
+        except Exception as e:
+            raise ExtractionError(f"Excel读取错误: {str(e)}") from e
+
+    @staticmethod
+    def _extract_csv_content(file_path, max_chars=None):
+        """提取CSV内容：流式读取前几行"""
+        try:
+            text = extract_csv_text(
+                file_path,
+                max_rows=config.TABLE_MAX_ROWS,
+                max_cols=config.TABLE_MAX_COLS,
+                max_chars=min(max_chars or config.TABLE_MAX_CHARS, config.TABLE_MAX_CHARS)
+            )
+            return text if text else "CSV文件为空"
+        except Exception as e:
+            raise ExtractionError(f"CSV读取错误: {str(e)}") from e
     
     @staticmethod
-    def _extract_ppt_content(file_path):
-        """提取PPT内容"""
+    def _extract_ppt_content(file_path, max_chars=None):
+        """提取PPT内容：按顺序流式解析幻灯片XML，只读文本框，不加载图片和图表"""
         try:
-            from pptx import Presentation
-            prs = Presentation(file_path)
-            text_content = []
-            
-            for i, slide in enumerate(prs.slides):
-                text_content.append(f"--- 幻灯片 {i+1} ---")
-                for shape in slide.shapes:
-                    if hasattr(shape, "text") and shape.text.strip():
-                        text_content.append(shape.text)
-            
-            return '\n'.join(text_content) if text_content else "PPT内容为空"
-            
-        except ImportError:
-            return "请安装python-pptx: pip install python-pptx"
+            text = extract_pptx_text(file_path, max_chars=max_chars)
+            return text if text else "PPT内容为空"
         except Exception as e:
-            return f"PPT读取错误: {str(e)}"
+            raise ExtractionError(f"PPT读取错误: {str(e)}") from e
+
+# 内置提取器；第三方提取器通过入口点 file_indexer.extractors 登记
+EXTRACTORS = ExtractorRegistry()
+EXTRACTORS.register(EnhancedFileAnalyzer._extract_plain_text, extensions=['.txt', '.md'], mimes=['text/plain'])
+EXTRACTORS.register(EnhancedFileAnalyzer._extract_docx_content, extensions=['.docx'],
+                    mimes=['application/vnd.openxmlformats-officedocument.wordprocessingml.document'])
+EXTRACTORS.register(EnhancedFileAnalyzer._extract_doc_content, extensions=['.doc'],
+                    mimes=['application/msword', 'application/x-ole-storage'])
+EXTRACTORS.register(EnhancedFileAnalyzer._extract_pdf_content, extensions=['.pdf'], mimes=['application/pdf'])
+EXTRACTORS.register(EnhancedFileAnalyzer._extract_excel_content, extensions=['.xlsx'],
+                    mimes=['application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'])
+EXTRACTORS.register(EnhancedFileAnalyzer._extract_csv_content, extensions=['.csv'], mimes=['text/csv'])
+EXTRACTORS.register(EnhancedFileAnalyzer._extract_ppt_content, extensions=['.pptx'],
+                    mimes=['application/vnd.openxmlformats-officedocument.presentationml.presentation'])
+EXTRACTORS.register(EnhancedFileAnalyzer._extract_image_content,
+                    extensions=['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff'],
+                    mimes=['image/jpeg', 'image/png', 'image/gif', 'image/bmp', 'image/webp', 'image/tiff'])
+
+def _extract_text_job(file_path, max_chars=None):
+    """提取进程任务入口（需为模块级函数，子进程按引用加载）"""
+    text = EnhancedFileAnalyzer.extract_text_content(file_path, max_chars=max_chars)
+    # 只把需要的部分传回主进程
+    return text[:max_chars] if text and max_chars else text
+
+_extraction_service = None
+_extraction_lock = threading.Lock()
+
+def get_extraction_service():
+    """进程内共享的提取进程池；未启用或已在进程池模式下运行时返回None"""
+    global _extraction_service
+    if config.EXTRACT_WORKERS <= 0 or config.WORKER_POOL_MODE == 'process':
+        return None
+    if _extraction_service is None:
+        with _extraction_lock:
+            if _extraction_service is None:
+                _extraction_service = ExtractionService(
+                    _extract_text_job,
+                    workers=config.EXTRACT_WORKERS,
+                    timeout=config.EXTRACT_TIMEOUT,
+                    memory_limit_mb=config.EXTRACT_MEMORY_LIMIT_MB,
+                    max_jobs=config.EXTRACT_MAX_JOBS_PER_WORKER
+                )
+    return _extraction_service
+
+# 提取器版本：修改任一格式的提取逻辑时递增，使提取缓存失效
+EXTRACTOR_VERSION = '7'
+
+# 上传时还要转换全文的格式：分析阶段也提取全文写入缓存，上传转换直接复用
+FULL_TEXT_EXTENSIONS = {'.doc'}
+
+_extraction_cache = None
+
+def get_extraction_cache():
+    """进程内共享的提取结果缓存；未启用时返回None"""
+    global _extraction_cache
+    if not config.EXTRACT_CACHE_ENABLED:
+        return None
+    if _extraction_cache is None:
+        with _extraction_lock:
+            if _extraction_cache is None:
+                _extraction_cache = ExtractionCache(
+                    config.STATE_DB_PATH,
+                    memory_bytes=int(config.EXTRACT_CACHE_MEMORY_MB * 1024 * 1024),
+                    disk_bytes=int(config.EXTRACT_CACHE_DISK_MB * 1024 * 1024),
+                    version=EXTRACTOR_VERSION
+                )
+    return _extraction_cache
+
+_thumbnail_cache = None
+
+def get_thumbnail_cache():
+    """进程内共享的缩略图缓存"""
+    global _thumbnail_cache
+    if _thumbnail_cache is None:
+        with _extraction_lock:
+            if _thumbnail_cache is None:
+                from image_extract import ThumbnailCache
+                _thumbnail_cache = ThumbnailCache(
+                    config.STATE_DB_PATH,
+                    max_bytes=int(config.IMAGE_THUMBNAIL_CACHE_MB * 1024 * 1024)
+                )
+    return _thumbnail_cache
+
+def get_image_thumbnail(file_path, content_hash=None):
+    """按内容哈希取缩略图，未缓存时生成（JPEG按缩小比例解码）"""
+    if content_hash is None:
+        content_hash = hash_file(file_path)
+    return get_thumbnail_cache().get_or_create(
+        file_path, content_hash, config.IMAGE_THUMBNAIL_SIZE, config.IMAGE_THUMBNAIL_QUALITY
+    )
+
+def extract_content(file_path, max_chars=None, content_hash=None):
+    """提取文件文本内容（分析、备用方案等各阶段的统一入口）
+
+    先查提取缓存；未命中时在提取进程池（未启用时在当前线程）中解析，成功时写入缓存。
+    超时或失败时返回空字符串，失败结果不缓存（装好解析库或文件恢复后下次重新提取）。
+    """
+    budget = max_chars
+    if max_chars and os.path.splitext(file_path)[1].lower() in FULL_TEXT_EXTENSIONS:
+        max_chars = None
+    cache = get_extraction_cache()
+    if cache is not None:
+        if content_hash is None:
+            content_hash = hash_file(file_path)
+        text = cache.get(content_hash, budget)
+        if text is not None:
+            logger.debug(f"提取缓存命中: {os.path.basename(file_path)}")
+            return text
+
+    service = get_extraction_service()
+    if service is None:
+        try:
+            text = EnhancedFileAnalyzer.extract_text_content(file_path, max_chars=max_chars)
+        except ExtractionError as e:
+            logger.error(f"内容提取失败: {os.path.basename(file_path)} - {str(e)}")
+            return ""
+    else:
+        result = service.run(file_path, max_chars=max_chars)
+        if not result.ok:
+            logger.error(f"内容提取失败: {os.path.basename(file_path)} - {result.error}")
+            return ""
+        logger.debug(f"内容提取完成: {os.path.basename(file_path)} ({result.seconds:.2f}秒)")
+        text = result.text
+
+    if text and max_chars:
+        text = text[:max_chars]
+    if cache is not None and text is not None:
+        cache.put(content_hash, text, max_chars)
+    return text[:budget] if text and budget else text
 
 class FileInfoExtractor:
     """文件信息提取器"""
     
     @staticmethod
-    def extract_file_info(file_path):
-        """提取文件基本信息"""
+    def extract_file_info(file_path, content_hash=None):
+        """提取文件基本信息（已算好的内容哈希可直接传入）"""
         try:
             file_stat = os.stat(file_path)
             file_name = os.path.basename(file_path)
@@ -1133,7 +1406,7 @@ class FileInfoExtractor:
                 'update_time': datetime.fromtimestamp(file_stat.st_mtime).strftime("%Y-%m-%d %H:%M:%S"),
                 'extension': os.path.splitext(file_name)[1],
                 'directory': os.path.dirname(os.path.abspath(file_path)),
-                'hash': hashlib.md5(open(file_path, 'rb').read()).hexdigest()[:16]
+                'hash': content_hash or hash_file(file_path)
             }
         except Exception as e:
             logger.error(f"文件信息提取失败: {str(e)}")
@@ -1148,6 +1421,7 @@ class EnhancedKnowledgeBaseUploader:
         self.api_key = config.DATASET_API_KEY
         self.converter = FileConverter()
         self.failed_conversions = set()  # 记录转换失败的文件
+        self.http = get_http_client()
     
     def _get_mime_type(self, file_ext):
         """获取文件的MIME类型"""
@@ -1170,19 +1444,49 @@ class EnhancedKnowledgeBaseUploader:
         }
         return mime_types.get(file_ext, 'application/octet-stream')
     
-    def upload_file(self, file_path, knowledge_base_id=None, use_parent_child_mode=False):
-        """简化的文件上传方法 - 让Dify使用默认设置"""
-        temp_file_created = False
-        temp_file_path = None
-        
+    def upload_file(self, file_path, knowledge_base_id=None, use_parent_child_mode=False, content_hash=None,
+                    document_id=None):
+        """简化的文件上传方法 - 让Dify使用默认设置
+
+        document_id 不为空时原地更新该文档。成功时返回文档ID，失败时返回None。
+        """
         try:
             if not self.api_key:
                 logger.warning("知识库API密钥未设置，跳过上传")
-                return False
+                return None
             
             if knowledge_base_id is None:
                 knowledge_base_id = config.TXT_KNOWLEDGE_BASE_ID
             
+            prepared = self.prepare_upload(file_path, content_hash=content_hash)
+            if not prepared:
+                return None
+            upload_name, source = prepared
+            
+            return self._send_document(upload_name, source, knowledge_base_id, use_parent_child_mode, document_id)
+                
+        except requests.exceptions.Timeout:
+            logger.error("⏰⏰⏰ 上传请求超时")
+            return None
+        except requests.exceptions.ConnectionError:
+            logger.error("🌐🌐 网络连接错误，请检查Dify服务是否可用")
+            return None
+        except CircuitOpenError as e:
+            logger.warning(f"上传暂缓: {str(e)}")
+            return None
+        except Exception as e:
+            logger.error(f"💥💥 上传过程异常: {str(e)}")
+            return None
+
+    def prepare_upload(self, file_path, content_hash=None):
+        """格式转换和大小检查，返回 (上传文件名, 内容来源)，不能上传时返回None
+
+        内容来源是原文件路径（上传时按块流式读取）或内存中转换好的 bytes。
+        """
+        temp_file_created = False
+        temp_file_path = None
+        
+        try:
             file_name = os.path.basename(file_path)
             file_ext = os.path.splitext(file_name)[1].lower()
             
@@ -1194,6 +1498,15 @@ class EnhancedKnowledgeBaseUploader:
             file_id = f"{file_path}_{os.path.getsize(file_path)}"
             if file_id in self.failed_conversions:
                 logger.info(f"跳过已失败的文件转换: {file_name}")
+            elif file_ext == '.doc' and is_word97_document(file_path):
+                # 与分析共用提取缓存中的文本，直接在内存中生成.docx
+                text = extract_content(file_path, content_hash=content_hash)
+                if text:
+                    upload_name = os.path.splitext(file_name)[0] + '.docx'
+                    logger.info(f"使用转换后的文件进行上传: {file_name} -> {upload_name}")
+                    return upload_name, self.converter._create_docx_bytes(text, file_name)
+                logger.warning(f"文件转换失败，记录失败状态: {file_name}")
+                self.failed_conversions.add(file_id)
             elif file_ext == '.doc':
                 logger.info(f"检测到.doc文件，尝试转换为.docx: {file_name}")
                 converted_path = self.converter.convert_doc_to_docx(file_path)
@@ -1207,97 +1520,210 @@ class EnhancedKnowledgeBaseUploader:
                     logger.warning(f"文件转换失败，记录失败状态: {file_name}")
                     self.failed_conversions.add(file_id)
             
-            url = f"{config.DIFY_BASE_URL}/v1/datasets/{knowledge_base_id}/document/create-by-file"
-            
             # 检查文件大小
             file_size = os.path.getsize(upload_path)
             if file_size > 100 * 1024 * 1024:  # 100MB限制
                 logger.warning(f"文件过大({file_size}字节)，跳过上传: {upload_name}")
-                return False
-            
-            # 读取文件内容
-            with open(upload_path, 'rb') as file:
-                file_content = file.read()
-            
-            # 使用BytesIO避免文件锁定
-            from io import BytesIO
-            file_stream = BytesIO(file_content)
-            
-            upload_ext = os.path.splitext(upload_name)[1].lower()
-            mime_type = self._get_mime_type(upload_ext)
-            
-            files = {'file': (upload_name, file_stream, mime_type)}
-            
-            # 🔧🔧 关键修改：使用最简单的配置，只提供文件名
-            # 不指定任何处理规则，让Dify完全使用知识库的默认设置
-            data = {
-                'name': upload_name
-                # 不指定 process_rule，让Dify自动处理
-                # 不指定 indexing_technique，使用知识库默认设置
-            }
+                return None
             
+            # 转换生成的临时文件随后会被删除，先读入内存；原文件在上传时流式读取
+            if temp_file_created:
+                with open(upload_path, 'rb') as file:
+                    return upload_name, file.read()
+            return upload_name, upload_path
+        finally:
+            # 清理临时文件
+            if temp_file_created and temp_file_path and os.path.exists(temp_file_path):
+                self._safe_delete_file(temp_file_path)
+    
+    def upload_text(self, upload_name, text, knowledge_base_id=None, document_id=None):
+        """通过 create-by-text（已有文档时 update-by-text）上传内存中的文本（如索引内容）
+
+        不落地临时文件，也不做multipart编码。返回文档ID，失败时返回None。
+        """
+        try:
+            if not self.api_key:
+                logger.warning("知识库API密钥未设置，跳过上传")
+                return None
+            if knowledge_base_id is None:
+                knowledge_base_id = config.TXT_KNOWLEDGE_BASE_ID
+            request = self.build_text_request(upload_name, text, knowledge_base_id, document_id)
+            response = self.http.post(request['url'], headers=request['headers'], json=request['json'],
+                                      timeout=config.API_TIMEOUT)
+            if self.document_missing(document_id, response.status_code):
+                return self.upload_text(upload_name, text, knowledge_base_id)
+            return self.process_document_response(upload_name, knowledge_base_id, response.status_code,
+                                                  response.text, document_id=document_id)
+        except CircuitOpenError as e:
+            logger.warning(f"上传暂缓: {str(e)}")
+            return None
+        except Exception as e:
+            logger.error(f"💥💥 上传过程异常: {str(e)}")
+            return None
+
+    def build_text_request(self, upload_name, text, knowledge_base_id, document_id=None):
+        """构造 create-by-text（已有文档时为 update-by-text）请求"""
+        if document_id:
+            logger.info(f"原地更新知识库文档: {upload_name} ({document_id})")
+            url = f"{config.DIFY_BASE_URL}/v1/datasets/{knowledge_base_id}/documents/{document_id}/update-by-text"
+            payload = {'name': upload_name, 'text': text}
+        else:
+            logger.info(f"上传到普通知识库: {upload_name}")
+            url = f"{config.DIFY_BASE_URL}/v1/datasets/{knowledge_base_id}/document/create-by-text"
+            # 与上传文件一致，不指定处理规则，让Dify使用知识库的默认设置；配置了才覆盖
+            payload = {'name': upload_name, 'text': text}
+            if config.INDEX_INDEXING_TECHNIQUE:
+                payload['indexing_technique'] = config.INDEX_INDEXING_TECHNIQUE
+            if config.INDEX_PROCESS_MODE:
+                payload['process_rule'] = {'mode': config.INDEX_PROCESS_MODE}
+        return {
+            'url': url,
+            'headers': {
+                "Authorization": f"Bearer {self.api_key}",
+                "User-Agent": "FileMonitor/1.0"
+            },
+            'json': payload,
+        }
+
+    def build_document_request(self, upload_name, knowledge_base_id, use_parent_child_mode=False, document_id=None):
+        """构造 create-by-file（已有文档时为 update-by-file）请求（同步/异步流水线共用），不含文件内容"""
+        upload_ext = os.path.splitext(upload_name)[1].lower()
+        
+        # 🔧🔧 关键修改：使用最简单的配置，只提供文件名
+        # 不指定任何处理规则，让Dify完全使用知识库的默认设置
+        data = {
+            'name': upload_name
+            # 不指定 process_rule，让Dify自动处理
+            # 不指定 indexing_technique，使用知识库默认设置
+        }
+        
+        if document_id:
+            logger.info(f"原地更新知识库文档: {upload_name} ({document_id})")
+            url = f"{config.DIFY_BASE_URL}/v1/datasets/{knowledge_base_id}/documents/{document_id}/update-by-file"
+        else:
             if use_parent_child_mode:
                 logger.info(f"上传到父子模式知识库（使用Dify默认设置）: {upload_name}")
             else:
                 logger.info(f"上传到普通知识库: {upload_name}")
-            
-            headers = {
+            url = f"{config.DIFY_BASE_URL}/v1/datasets/{knowledge_base_id}/document/create-by-file"
+        
+        logger.debug(f"上传请求数据 - 文件名: {upload_name}, 知识库ID: {knowledge_base_id}")
+        return {
+            'url': url,
+            'headers': {
                 "Authorization": f"Bearer {self.api_key}",
                 "User-Agent": "FileMonitor/1.0"
-            }
-            
-            logger.debug(f"上传请求数据 - 文件名: {upload_name}, 知识库ID: {knowledge_base_id}")
-            
-            response = requests.post(
-                url, 
-                headers=headers, 
-                files=files, 
-                data=data, 
+            },
+            'data': data,
+            'mime_type': self._get_mime_type(upload_ext),
+        }
+
+    @staticmethod
+    def document_missing(document_id, status_code):
+        """要更新的文档已在Dify中被删除，需要改为新建"""
+        if document_id and status_code == 404:
+            logger.warning(f"知识库中已没有文档 {document_id}，改为新建")
+            return True
+        return False
+
+    def process_document_response(self, upload_name, knowledge_base_id, status_code, text, use_parent_child_mode=False,
+                                  document_id=None):
+        """处理 create-by-file / update-by-file 响应（同步/异步流水线共用），成功时返回文档ID，失败时返回None"""
+        if status_code in [200, 201]:
+            kb_type = "父子模式知识库" if use_parent_child_mode else "知识库"
+            action = "更新" if document_id else "上传"
+            logger.info(f"✅ {kb_type}{action}成功: {upload_name} -> 知识库 {knowledge_base_id}")
+            logger.debug(f"上传成功响应: {text[:200]}...")
+            try:
+                document_id = json.loads(text)['document']['id']
+            except (ValueError, KeyError, TypeError):
+                pass
+            if not document_id:
+                logger.error(f"❌❌ 响应中没有文档ID，无法记录: {upload_name} - {text[:200]}")
+                return None
+            return document_id
+
+        error_msg = f"❌❌ 知识库上传失败: {status_code} - {text}"
+        logger.error(error_msg)
+        
+        # 详细错误分析
+        error_text = text.lower()
+        if "doc_form" in error_text or "segmentation" in error_text:
+            logger.error("📋📋 文档格式错误：可能与知识库的分段模式设置有关")
+        elif "not found" in error_text:
+            logger.error("🔍🔍 知识库不存在或API密钥无权限")
+        elif "indexing_technique" in error_text:
+            logger.error("⚙⚙️ 索引技术错误")
+        elif "unauthorized" in error_text:
+            logger.error("🔐🔐 认证失败：请检查API密钥")
+            
+        return None
+
+    def build_document_body(self, upload_name, source, request):
+        """create-by-file 的流式请求体；source 为文件路径或 bytes"""
+        return MultipartEncoder(fields=request['data'],
+                                files={'file': (upload_name, source, request['mime_type'])})
+
+    def _send_document(self, upload_name, source, knowledge_base_id, use_parent_child_mode=False, document_id=None):
+        """调用 create-by-file 接口创建文档（有 document_id 时调用 update-by-file 原地更新）
+
+        文件内容按块流式发送，不整体读入内存。成功时返回文档ID，失败时返回None。
+        """
+        request = self.build_document_request(upload_name, knowledge_base_id, use_parent_child_mode, document_id)
+        body = self.build_document_body(upload_name, source, request)
+        try:
+            response = self.http.post(
+                request['url'], 
+                headers={**request['headers'], **body.headers()}, 
+                data=body, 
                 timeout=config.API_TIMEOUT
             )
-            
-            if response.status_code in [200, 201]:
-                kb_type = "父子模式知识库" if use_parent_child_mode else "知识库"
-                logger.info(f"✅ {kb_type}上传成功: {upload_name} -> 知识库 {knowledge_base_id}")
-                
-                # 打印成功响应信息
-                try:
-                    result = response.json()
-                    logger.debug(f"上传成功响应: {json.dumps(result, ensure_ascii=False)[:200]}...")
-                except:
-                    pass
-                    
-                return True
-            else:
-                error_msg = f"❌❌ 知识库上传失败: {response.status_code} - {response.text}"
-                logger.error(error_msg)
-                
-                # 详细错误分析
-                error_text = response.text.lower()
-                if "doc_form" in error_text or "segmentation" in error_text:
-                    logger.error("📋📋 文档格式错误：可能与知识库的分段模式设置有关")
-                elif "not found" in error_text:
-                    logger.error("🔍🔍 知识库不存在或API密钥无权限")
-                elif "indexing_technique" in error_text:
-                    logger.error("⚙⚙️ 索引技术错误")
-                elif "unauthorized" in error_text:
-                    logger.error("🔐🔐 认证失败：请检查API密钥")
-                    
-                return False
-                
         except requests.exceptions.Timeout:
             logger.error("⏰⏰⏰ 上传请求超时")
-            return False
+            return None
         except requests.exceptions.ConnectionError:
             logger.error("🌐🌐 网络连接错误，请检查Dify服务是否可用")
+            return None
+        finally:
+            body.close()
+        if self.document_missing(document_id, response.status_code):
+            return self._send_document(upload_name, source, knowledge_base_id, use_parent_child_mode)
+        return self.process_document_response(upload_name, knowledge_base_id, response.status_code,
+                                              response.text, use_parent_child_mode, document_id)
+
+    def build_delete_request(self, knowledge_base_id, document_id):
+        """构造删除文档请求（同步/异步流水线共用）"""
+        return {
+            'url': f"{config.DIFY_BASE_URL}/v1/datasets/{knowledge_base_id}/documents/{document_id}",
+            'headers': {
+                "Authorization": f"Bearer {self.api_key}",
+                "User-Agent": "FileMonitor/1.0"
+            },
+        }
+
+    def process_delete_response(self, knowledge_base_id, document_id, status_code, text):
+        """处理删除响应，文档已删除或本来就不存在时返回True"""
+        if status_code in [200, 204]:
+            logger.info(f"🗑️ 已删除知识库文档: {document_id} (知识库 {knowledge_base_id})")
+            return True
+        if status_code == 404:
+            logger.info(f"知识库文档已不存在: {document_id} (知识库 {knowledge_base_id})")
+            return True
+        logger.error(f"❌❌ 删除知识库文档失败: {status_code} - {text}")
+        return False
+
+    def delete_document(self, knowledge_base_id, document_id):
+        """删除知识库中的文档，成功时返回True"""
+        if not self.api_key:
+            logger.warning("知识库API密钥未设置，跳过删除")
             return False
-        except Exception as e:
-            logger.error(f"💥💥 上传过程异常: {str(e)}")
+        request = self.build_delete_request(knowledge_base_id, document_id)
+        try:
+            response = self.http.delete(request['url'], headers=request['headers'], timeout=config.API_TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"🌐🌐 删除请求失败: {document_id} - {str(e)}")
             return False
-        finally:
-            # 清理临时文件
-            if temp_file_created and temp_file_path and os.path.exists(temp_file_path):
-                self._safe_delete_file(temp_file_path)
+        return self.process_delete_response(knowledge_base_id, document_id, response.status_code, response.text)
     
     def _safe_delete_file(self, file_path):
         """安全删除文件"""
@@ -1325,9 +1751,315 @@ class FileMonitor:
     def __init__(self):
         self.index_generator = DifyChatflowIndexGenerator()
         self.uploader = EnhancedKnowledgeBaseUploader()
-        self.processed_files = {}  # 文件ID -> 处理时间
-        self.processing_lock = set()  # 正在处理的文件锁
-    
+        # 任务状态持久化在本地数据库中，重启后可以继续未完成的任务
+        self.job_store = JobStore(
+            config.STATE_DB_PATH,
+            max_attempts=config.JOB_MAX_ATTEMPTS,
+            backoff_base=config.JOB_RETRY_BASE_SECONDS,
+            backoff_max=config.JOB_RETRY_MAX_SECONDS
+        )
+        # 已处理文件的指纹清单，用于启动时找出离线期间新增或修改的文件
+        self.manifest = FileManifest(config.STATE_DB_PATH)
+        # 内容哈希 -> 已生成的索引和上传状态，用于去重
+        self.content_store = ContentStore(config.STATE_DB_PATH)
+        # 文件 -> 知识库文档ID，文件修改时原地更新，删除时删除远端文档
+        self.documents = DocumentStore(config.STATE_DB_PATH)
+        self.rules = PathRules(config.MONITOR_DIR, include=config.MONITOR_INCLUDE, exclude=config.MONITOR_EXCLUDE)
+        self._pump_lock = threading.Lock()
+        # 熔断状态写入状态库，进程模式下主进程也能看到工作进程的熔断
+        self.circuits = CircuitStore(config.STATE_DB_PATH)
+        set_state_sink(self.circuits.record)
+        self._probe = None
+        self._fanout = None
+        self._index_uploads = None
+        self._fanout_lock = threading.Lock()
+
+        self.pool = self._create_pool()
+        # 创建/修改事件先合并，文件静默且大小稳定后才进入任务队列
+        self.debouncer = Debouncer(self._dispatch, quiet_period=config.DEBOUNCE_QUIET_SECONDS)
+
+    def _create_pool(self):
+        """按 WORKER_POOL_MODE 创建工作池（thread / process）或异步引擎（async）"""
+        mode = config.WORKER_POOL_MODE
+        if mode == 'async':
+            if HTTPX_AVAILABLE:
+                http = get_http_client()
+                return AsyncEngine(
+                    self.process_job_async,
+                    max_in_flight=config.ASYNC_MAX_IN_FLIGHT,
+                    limits={'chat': config.ASYNC_CHAT_CONCURRENCY, 'dataset': config.ASYNC_UPLOAD_CONCURRENCY},
+                    executor_workers=config.WORKER_POOL_SIZE,
+                    connect_timeout=http.connect_timeout,
+                    read_timeout=config.API_TIMEOUT,
+                    max_retries=http.max_retries,
+                    backoff=http.backoff,
+                    name='file-async'
+                )
+            logger.warning("httpx未安装，异步模式不可用，改用线程模式")
+            mode = 'thread'
+        # 进程模式下任务在子进程中执行，子进程各自持有 FileMonitor
+        handler = _process_job_in_subprocess if mode == 'process' else self.process_job
+        return WorkerPool(
+            handler,
+            workers=config.WORKER_POOL_SIZE,
+            queue_size=config.WORKER_QUEUE_SIZE,
+            mode=mode,
+            name='file-worker'
+        )
+
+    def start_workers(self):
+        """恢复未完成任务，启动工作池和事件合并器"""
+        recovered = self.job_store.recover()
+        if recovered:
+            logger.info(f"恢复上次中断的任务: {recovered} 个")
+        # 上次运行遗留的熔断记录作废，本次按实际请求结果重新判断
+        self.circuits.clear()
+        # 提前启动提取子进程，首个文件不必等待子进程加载
+        service = get_extraction_service()
+        if service is not None:
+            service.start()
+        self.pool.start()
+        self.debouncer.start()
+        self.pump()
+
+    def stop_workers(self, wait=True):
+        """停止事件合并器和工作池"""
+        self.debouncer.stop()
+        self.pool.stop(wait=wait)
+        if self._index_uploads is not None:
+            self._index_uploads.shutdown(wait=wait)
+        if self._fanout is not None:
+            self._fanout.shutdown(wait=wait)
+        if _extraction_service is not None:
+            _extraction_service.stop()
+
+    def submit(self, file_path):
+        """登记文件事件，监控线程不等待处理结果"""
+        # 先做一次廉价过滤，避免无关事件占用时间轮
+        if not self.should_process(file_path):
+            return False
+        self.debouncer.touch(file_path)
+        return True
+
+    def _dispatch(self, file_path):
+        """事件合并器回调：文件已稳定，写入任务队列"""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        self.job_store.enqueue(file_path, stat.st_size, stat.st_mtime_ns)
+        self.pump()
+        return True
+
+    def reconcile(self, root):
+        """启动对账：把清单中没有或已变化的文件登记为任务"""
+        changed, deleted, stats = self.manifest.reconcile(
+            root,
+            accept=self.should_process,
+            recursive=config.MONITOR_RECURSIVE,
+            accept_dir=self.rules.accept_dir
+        )
+        self.job_store.enqueue_many(changed)
+        # 离线期间删除的文件：登记删除任务，清理知识库中的文档
+        self.job_store.enqueue_many((path, None, None) for path in self.documents.tracked(deleted))
+        logger.info(
+            f"启动对账完成: 扫描 {stats['scanned']} 个文件, 待处理 {stats['changed']} 个, "
+            f"已删除 {stats['deleted']} 个, 计算哈希 {stats['hashed']} 个, 耗时 {stats['seconds']}秒"
+        )
+        self.pump()
+        return stats
+
+    def submit_tree(self, directory):
+        """登记新出现目录下已有的文件（目录整体复制/移动进来时）"""
+        count = 0
+        for path, _ in walk_files(directory, recursive=True, accept_dir=self.rules.accept_dir):
+            if self.submit(path):
+                count += 1
+        return count
+
+    def remove(self, file_path):
+        """文件删除事件：有远端文档时登记删除任务，由工作池执行，失败时按退避重试"""
+        if not self.documents.tracked([file_path]):
+            return False
+        self.job_store.enqueue(file_path)
+        self.pump()
+        return True
+
+    def remove_tree(self, directory):
+        """目录删除事件：登记目录下所有有远端文档的文件"""
+        paths = self.documents.paths_under(directory)
+        if paths:
+            self.job_store.enqueue_many((path, None, None) for path in paths)
+            self.pump()
+        return len(paths)
+
+    def move(self, src_path, dest_path):
+        """文件移动/重命名：远端文档和本地记录跟随新路径，内容未变时不重新分析，只按文档ID更新文档名称"""
+        if not self.documents.tracked([src_path]):
+            return self.submit(dest_path)
+        if not self.should_process(dest_path) or self.documents.tracked([dest_path]):
+            # 移出处理范围按删除处理；覆盖了另一个已上传的文件时，新路径按新内容原地更新自己的文档
+            self.remove(src_path)
+            return self.submit(dest_path)
+        self.documents.move(src_path, dest_path)
+        self.index_generator.index_store.move(src_path, dest_path)
+        self.content_store.unlink_path(src_path)
+        self.manifest.remove(src_path)
+        logger.info(f"文件已移动，知识库文档跟随新路径: {os.path.basename(src_path)} -> {dest_path}")
+        # 新路径照常排队：任务中按文档ID把远端文档改为新名称（索引文本中的路径一并更新）
+        return self.submit(dest_path)
+
+    def move_tree(self, src_dir, dest_dir):
+        """目录移动/重命名：目录下已上传文件的文档跟随新路径"""
+        prefix = os.path.join(os.path.abspath(src_dir), '')
+        for path in self.documents.paths_under(src_dir):
+            self.move(path, os.path.join(dest_dir, path[len(prefix):]))
+        if config.MONITOR_RECURSIVE and self.rules.accept_dir(dest_dir):
+            self.submit_tree(dest_dir)
+
+    def pump(self):
+        """按工作池空闲容量领取到期任务（含退避到期的重试任务）
+
+        任务用到的Dify接口熔断中时挂回队列到重试时间；冷却已过、尚未恢复（半开）时只放行一个试探任务，
+        它结束前不再领取。所有任务都用知识库接口，知识库接口熔断期间不领取。
+        """
+        with self._pump_lock:
+            if self._probe_running():
+                return
+            circuits = {endpoints: self._circuit(endpoints) for endpoints in (PROCESS_ENDPOINTS, DELETE_ENDPOINTS)}
+            if circuits[DELETE_ENDPOINTS][0] is not None:
+                return
+            stats = self.pool.stats()
+            free = stats['queue_capacity'] - stats['queue_depth']
+            probing = circuits[PROCESS_ENDPOINTS][1]
+            while free > 0:
+                jobs = self.job_store.claim(1 if probing else free)
+                if not jobs:
+                    return
+                for job in jobs:
+                    free -= 1
+                    endpoints = self._job_endpoints(job['path'])
+                    retry_at, half_open = circuits[endpoints]
+                    if retry_at is not None:
+                        self.job_store.defer(job['id'], retry_at, "Dify接口熔断中")
+                    elif not self.pool.submit(job, block=False):
+                        self.job_store.release(job['id'])
+                        return
+                    elif half_open:
+                        logger.info(f"Dify接口冷却结束，放行试探任务: {os.path.basename(job['path'])}")
+                        self._probe = {'id': job['id'], 'path': job['path'], 'endpoints': endpoints}
+                        return
+                if not probing:
+                    return
+
+    @staticmethod
+    def _job_endpoints(file_path):
+        return PROCESS_ENDPOINTS if os.path.exists(file_path) else DELETE_ENDPOINTS
+
+    def _circuit(self, endpoints):
+        """接口的熔断状态（本进程与状态库中其他工作进程的记录合并）：(重试时间戳或None, 是否等待试探)"""
+        times, probing = [], False
+        for retry_at, half_open in (circuit_state(endpoints), self.circuits.state(endpoints)):
+            if retry_at is not None:
+                times.append(retry_at)
+            probing = probing or half_open
+        if times:
+            return max(times), False
+        return None, probing
+
+    def _probe_running(self):
+        """试探任务是否还在处理；成功完成时关闭状态库中已过重试时间的熔断记录"""
+        if self._probe is None:
+            return False
+        job = self.job_store.get(self._probe['path'])
+        if job is not None and job['id'] == self._probe['id']:
+            if job['state'] in ACTIVE_STATES:
+                return True
+            if job['state'] == DONE:
+                # 试探任务可能由熔断器未打开过的工作进程执行，它的熔断器不会发出关闭通知
+                self.circuits.close(self._probe['endpoints'])
+        self._probe = None
+        return False
+
+    def process_job(self, job):
+        """执行一个队列任务并记录结果"""
+        job_id, file_path = job['id'], job['path']
+        try:
+            if not os.path.exists(file_path):
+                # 文件已删除：删除它在知识库中的文档
+                if self.documents.for_path(file_path):
+                    self._finish_job(job_id, file_path, None, self.remove_file(file_path))
+                    return
+                self.job_store.fail(job_id, "文件不存在", retry=False)
+                return
+            # 处理前记下指纹，成功后写入清单
+            fingerprint = self.manifest.fingerprint(file_path)
+            success = self.process_file(file_path, job_id=job_id, content_hash=fingerprint[2])
+            self._finish_job(job_id, file_path, fingerprint, success)
+        except Exception as e:
+            logger.error(f"任务执行异常: {file_path} - {str(e)}")
+            self._fail_job(job_id, file_path, str(e))
+
+    async def process_job_async(self, job):
+        """异步模式下执行一个队列任务（状态库读写放在线程池）"""
+        engine = self.pool
+        job_id, file_path = job['id'], job['path']
+        try:
+            if not os.path.exists(file_path):
+                if await engine.run_blocking(self.documents.for_path, file_path):
+                    success = await self._remove_file_async(file_path)
+                    await engine.run_blocking(self._finish_job, job_id, file_path, None, success)
+                    return
+                await engine.run_blocking(self.job_store.fail, job_id, "文件不存在", retry=False)
+                return
+            fingerprint = await engine.run_blocking(self.manifest.fingerprint, file_path)
+            success = await self.process_file_async(file_path, job_id=job_id, content_hash=fingerprint[2])
+            await engine.run_blocking(self._finish_job, job_id, file_path, fingerprint, success)
+        except Exception as e:
+            logger.error(f"任务执行异常: {file_path} - {str(e)}")
+            await engine.run_blocking(self._fail_job, job_id, file_path, str(e))
+
+    def _finish_job(self, job_id, file_path, fingerprint, success):
+        """记录任务结果：成功时写入清单（文件已删除时移出清单），失败时按退避重试"""
+        if success:
+            if fingerprint:
+                self.manifest.record(file_path, *fingerprint)
+            else:
+                self.manifest.remove(file_path)
+            self.job_store.complete(job_id)
+        else:
+            self._fail_job(job_id, file_path, "处理失败")
+
+    def _fail_job(self, job_id, file_path, error):
+        """任务失败：Dify接口熔断中时挂回队列等到恢复（不计失败次数），否则按退避重试"""
+        retry_at = self._circuit(self._job_endpoints(file_path))[0]
+        if retry_at is not None:
+            self.job_store.defer(job_id, retry_at, error)
+            logger.info(f"Dify接口熔断中，任务挂起至 {datetime.fromtimestamp(retry_at):%H:%M:%S}: "
+                        f"{os.path.basename(file_path)}")
+            return
+        state = self.job_store.fail(job_id, error)
+        if state == 'pending':
+            logger.info(f"任务将稍后重试: {os.path.basename(file_path)}")
+
+    def get_stats(self):
+        """运行指标"""
+        stats = self.pool.stats()
+        stats['debouncer'] = self.debouncer.stats()
+        stats['jobs'] = self.job_store.counts()
+        stats['http'] = get_http_client().stats()
+        stats['rate_limits'] = endpoint_stats()
+        cache = self.index_generator.chatflow_analyzer.cache
+        if cache:
+            stats['analysis_cache'] = cache.stats()
+        if _extraction_service is not None:
+            stats['extraction'] = _extraction_service.stats()
+        if _extraction_cache is not None:
+            stats['extraction_cache'] = _extraction_cache.stats()
+        if _thumbnail_cache is not None:
+            stats['thumbnail_cache'] = _thumbnail_cache.stats()
+        return stats
+
     def should_process(self, file_path):
         """判断是否应该处理文件"""
         file_name = os.path.basename(file_path)
@@ -1341,93 +2073,437 @@ class FileMonitor:
         file_ext = os.path.splitext(file_name)[1].lower()
         if file_ext not in config.ALLOWED_EXTENSIONS:
             return False
-        
-        # 生成文件唯一标识（路径+大小+修改时间）
-        try:
-            stat = os.stat(file_path)
-            file_id = f"{file_path}_{stat.st_size}_{stat.st_mtime}"
-        except:
-            file_id = file_path
-        
-        # 检查是否正在处理
-        if file_id in self.processing_lock:
+
+        # 包含/排除规则（单次正则匹配）
+        if not self.rules.accept_file(file_path):
             return False
         
-        # 检查是否最近处理过
-        current_time = time.time()
-        if file_id in self.processed_files:
-            time_diff = current_time - self.processed_files[file_id]
-            if time_diff < config.PROCESS_INTERVAL:
-                return False
-        
         return True
     
-    def process_file(self, file_path):
-        """处理文件 - 图片跳过原文件上传"""
-        file_id = None
+    def _set_stage(self, job_id, state):
+        if job_id is not None:
+            self.job_store.set_state(job_id, state)
+
+    @staticmethod
+    def _is_image(file_path):
+        return os.path.splitext(file_path)[1].lower() in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff']
+
+    def _lookup_content(self, file_path, content_hash):
+        """登记路径对应的内容，返回已有处理记录"""
+        self.content_store.link_path(file_path, content_hash)
+        return self.content_store.get(content_hash) or {}
+
+    def _reuse_index(self, file_path, content_hash, known):
+        """已有Chatflow分析结果时直接复用，返回 (索引内容, False)，否则返回None"""
+        if known.get('index_content') and not known.get('is_fallback'):
+            logger.info(f"复用已有分析结果: {os.path.basename(file_path)}")
+            index_content = self.index_generator.retarget_index(known['index_content'], file_path)
+            self.index_generator.index_store.put(file_path, index_content, method="内容哈希复用",
+                                                 content_hash=content_hash)
+            return index_content, False
+        return None
+
+    def _index_duplicate(self, file_path, content_hash, known):
+        """内容已处理过的副本不再上传，但本地索引库中也要有它的记录（沿用该内容已有的索引）"""
+        index_store = self.index_generator.index_store
+        record = index_store.get_by_path(file_path)
+        if record and record['content_hash'] == content_hash:
+            return
+        index_content = known.get('index_content')
+        if not index_content:
+            # 内容库中没有索引文本时，取同内容其他文件的索引记录
+            for other in self.content_store.paths_for(content_hash):
+                other_record = index_store.get_by_path(other) if other != file_path else None
+                if other_record and other_record['content_hash'] == content_hash:
+                    index_content = other_record['index_content']
+                    break
+        if index_content:
+            index_content = self.index_generator.retarget_index(index_content, file_path)
+            index_store.put(file_path, index_content, method="内容哈希复用", content_hash=content_hash)
+        else:
+            logger.warning(f"未找到可复用的索引记录: {os.path.basename(file_path)}")
+
+    @staticmethod
+    def _original_target():
+        """原文件上传目标：(知识库ID, 是否父子模式, 知识库类型名称)"""
+        use_parent_child_mode = bool(config.PARENT_CHILD_KB_ENABLED and config.PARENT_CHILD_KB_ID)
+        kb_type = "父子模式知识库" if use_parent_child_mode else "原文件库"
+        return config.ACTUAL_ORIGINAL_KB_ID, use_parent_child_mode, kb_type
+
+    @staticmethod
+    def _kind_flags(kind):
+        return {'index': kind == INDEX_DOCUMENT, 'original': kind == ORIGINAL_DOCUMENT}
+
+    def _hand_over(self, file_path, record):
+        """文档中的旧内容还有其他文件（副本）在用时，把文档转给该文件，返回是否已转交"""
+        for other in self.content_store.paths_for(record['content_hash']):
+            if other != file_path and os.path.exists(other) and self.documents.get(other, record['kind']) is None:
+                self.documents.reassign(record, other)
+                logger.info(f"知识库文档转交给内容相同的文件: {os.path.basename(file_path)} -> {other}")
+                return True
+        return False
+
+    @staticmethod
+    def _renamed(file_path, kind, record):
+        """文档是否按旧路径上传：索引文档的名称和正文都含文件路径，原文件文档只看文件名"""
+        source_path = record.get('source_path')
+        if not source_path:
+            return False
+        if kind == INDEX_DOCUMENT:
+            return source_path != os.path.abspath(file_path)
+        return os.path.basename(source_path) != os.path.basename(file_path)
+
+    def _document_target(self, file_path, kind, dataset_id, content_hash, shared_uploaded):
+        """文件某一类文档的状态：返回 (已是最新, 要原地更新的文档ID)
+
+        文件有自己的文档时按记录的内容哈希判断；没有时沿用内容去重的结果（副本复用已有文档）。
+        """
+        record = self.documents.get(file_path, kind)
+        if record is not None and record['dataset_id'] != dataset_id:
+            logger.warning(f"知识库配置已更换，在新知识库中新建文档: {os.path.basename(file_path)}")
+            record = None
+        if record is None:
+            return bool(shared_uploaded), None
+        if record['content_hash'] == content_hash:
+            if self._renamed(file_path, kind, record):
+                # 文件移动/重命名后内容未变，按文档ID原地更新，远端文档名称（和索引中的路径）随之更新
+                logger.info(f"文件已移动或重命名，更新知识库文档名称: {os.path.basename(file_path)}")
+                return False, record['document_id']
+            return True, record['document_id']
+        if self._hand_over(file_path, record):
+            return False, None
+        return False, record['document_id']
+
+    def _lookup_targets(self, file_path, content_hash, is_image):
+        """登记路径对应的内容，返回 (已有处理记录, 索引文档状态, 原文件文档状态)"""
+        known = self._lookup_content(file_path, content_hash)
+        index = self._document_target(file_path, INDEX_DOCUMENT, config.TXT_KNOWLEDGE_BASE_ID, content_hash,
+                                      known.get('index_uploaded'))
+        if is_image:
+            return known, index, (True, None)
+        original = self._document_target(file_path, ORIGINAL_DOCUMENT, config.ACTUAL_ORIGINAL_KB_ID, content_hash,
+                                         known.get('original_uploaded'))
+        return known, index, original
+
+    def _record_upload(self, file_path, content_hash, kind, dataset_id, document_id):
+        """记录上传/更新成功的文档"""
+        flags = self._kind_flags(kind)
+        previous = self.documents.get(file_path, kind)
+        self.documents.record(file_path, kind, dataset_id, document_id, content_hash)
+        if previous and previous['content_hash'] != content_hash:
+            # 原地更新后旧内容已不在知识库中
+            self.content_store.clear_uploaded(previous['content_hash'], **flags)
+        self.content_store.mark_uploaded(content_hash, file_path, **flags)
+
+    def _documents_to_delete(self, file_path):
+        """已删除文件的文档中需要删除的部分（内容相同的副本还在时转交给副本）"""
+        return [record for record in self.documents.for_path(file_path) if not self._hand_over(file_path, record)]
+
+    def _drop_document(self, file_path, record):
+        """远端文档已删除"""
+        self.documents.remove(file_path, record['kind'])
+        self.content_store.clear_uploaded(record['content_hash'], **self._kind_flags(record['kind']))
+
+    def _forget_path(self, file_path):
+        """清理已删除文件的本地记录"""
+        self.content_store.unlink_path(file_path)
+        self.index_generator.index_store.delete(file_path)
+
+    def remove_file(self, file_path):
+        """本地文件已删除：删除它在各知识库中的文档，全部成功时返回True"""
+        success = True
+        for record in self._documents_to_delete(file_path):
+            if self.uploader.delete_document(record['dataset_id'], record['document_id']):
+                self._drop_document(file_path, record)
+            else:
+                success = False
+        if success:
+            self._forget_path(file_path)
+            logger.info(f"已清理删除文件的知识库文档: {os.path.basename(file_path)}")
+        return success
+
+    def process_file(self, file_path, job_id=None, content_hash=None):
+        """处理文件 - 图片跳过原文件上传，全部成功时返回True
+
+        索引（分析后上传到.txt知识库）和原文件上传互不依赖，两者并发执行，
+        单个文件的耗时接近较慢的一路。
+        """
+        file_name = os.path.basename(file_path)
         try:
             if not self.should_process(file_path):
-                return
-            
-            file_name = os.path.basename(file_path)
-            file_ext = os.path.splitext(file_name)[1].lower()
-            is_image = file_ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff']
-            
+                return True
+
+            is_image = self._is_image(file_path)
+
             logger.info(f"开始处理文件: {file_name} (类型: {'图片' if is_image else '文档'})")
-            
-            # 生成文件ID并加锁
-            try:
-                stat = os.stat(file_path)
-                file_id = f"{file_path}_{stat.st_size}_{stat.st_mtime}"
-            except:
-                file_id = file_path
-            
-            self.processing_lock.add(file_id)
-            
-            # 等待文件稳定
-            time.sleep(2)
-            
-            # 1. 生成索引文件（图片和文档都执行）
-            index_path = self.index_generator.generate_index_file(file_path)
-            
-            if index_path:
-                # 2. 上传索引文件到.txt知识库
-                index_success = self.uploader.upload_file(index_path, config.TXT_KNOWLEDGE_BASE_ID)
-                if index_success:
-                    logger.info(f"索引文件上传成功: {file_name}")
-            
-            # 3. 只有非图片文件才上传原文件到知识库
-            if not is_image:
-                original_kb_id = config.ACTUAL_ORIGINAL_KB_ID
-                use_parent_child_mode = config.PARENT_CHILD_KB_ENABLED and config.PARENT_CHILD_KB_ID
-                
-                if use_parent_child_mode:
-                    kb_type = "父子模式知识库"
-                    original_success = self.uploader.upload_file(
-                        file_path, 
-                        original_kb_id, 
-                        use_parent_child_mode=True
-                    )
-                else:
-                    kb_type = "原文件库"
-                    original_success = self.uploader.upload_file(file_path, original_kb_id)
-                
-                if original_success:
-                    logger.info(f"原文件上传成功到{kb_type}: {file_name} -> {original_kb_id}")
-                else:
-                    logger.error(f"原文件上传到{kb_type}失败: {file_name}")
+
+            # 相同内容（复制/重命名/只改时间戳）复用已有索引和知识库文档
+            if content_hash is None:
+                content_hash = hash_file(file_path)
+            known, (index_uploaded, index_document), (original_uploaded, original_document) = \
+                self._lookup_targets(file_path, content_hash, is_image)
+            if index_uploaded and original_uploaded:
+                logger.info(f"内容已处理过，复用已有索引和知识库文档: {file_name}")
+                self._index_duplicate(file_path, content_hash, known)
+                return True
+
+            # 原文件上传不依赖索引，先提交到上传线程池，与索引生成/上传并发执行
+            results = {}
+            original_future = None
+            if not original_uploaded:
+                original_future = self._upload_executor().submit(self._upload_original, file_path, content_hash,
+                                                                 original_document)
+            elif is_image:
+                logger.info(f"图片文件跳过原文件上传: {file_name}")
+            if not index_uploaded:
+                # 生成索引（图片和文档都执行）并直接从内存上传到.txt知识库
+                results[INDEX_DOCUMENT] = self._index_and_upload(file_path, content_hash, known, job_id,
+                                                                 index_document)
             else:
+                self._set_stage(job_id, 'uploading')
+            if original_future is not None:
+                try:
+                    results[ORIGINAL_DOCUMENT] = original_future.result()
+                except Exception as e:
+                    logger.error(f"原文件上传异常: {file_name} - {str(e)}")
+                    results[ORIGINAL_DOCUMENT] = False
+            return self._report_targets(file_name, results)
+
+        except Exception as e:
+            logger.error(f"处理文件异常: {file_name} - {str(e)}")
+            return False
+
+    def _upload_executor(self):
+        """原文件上传线程池（同步流水线的扇出阶段），第一次使用时创建"""
+        with self._fanout_lock:
+            if self._fanout is None:
+                # 每个工作线程同时最多有一个原文件上传在途；连接来自共享的HTTP连接池
+                self._fanout = ThreadPoolExecutor(max_workers=config.WORKER_POOL_SIZE,
+                                                  thread_name_prefix='file-upload')
+            return self._fanout
+
+    def _index_executor(self):
+        """索引摘要上传线程池，第一次使用时创建；大量文件一起导入时在途的 create-by-text 请求数有上限"""
+        with self._fanout_lock:
+            if self._index_uploads is None:
+                self._index_uploads = ThreadPoolExecutor(max_workers=max(1, config.INDEX_UPLOAD_CONCURRENCY),
+                                                         thread_name_prefix='index-upload')
+            return self._index_uploads
+
+    @staticmethod
+    def _report_targets(file_name, results):
+        """汇总各上传目标的结果，全部成功时返回True
+
+        成功的目标已各自记录文档，任务重试时只会重新上传失败的目标。
+        """
+        failed = [kind for kind, ok in results.items() if not ok]
+        if failed and len(failed) < len(results):
+            names = {INDEX_DOCUMENT: '索引', ORIGINAL_DOCUMENT: '原文件'}
+            logger.warning(f"部分目标上传失败，重试时只上传: {'、'.join(names[kind] for kind in failed)} - {file_name}")
+        return not failed
+
+    def _index_and_upload(self, file_path, content_hash, known, job_id=None, document_id=None):
+        """生成索引并上传到.txt知识库（已有文档时原地更新），已有Chatflow分析结果时跳过分析"""
+        file_name = os.path.basename(file_path)
+        self._set_stage(job_id, 'analyzing')
+        result = self._reuse_index(file_path, content_hash, known)
+        if not result:
+            result = self.index_generator.generate_index_content(file_path, content_hash=content_hash)
+            if not result:
+                return False
+            self.content_store.save_index(content_hash, file_path, *result)
+        index_content, is_fallback = result
+
+        self._set_stage(job_id, 'uploading')
+        # 索引摘要直接从内存通过 create-by-text 发送，经上传线程池限制在途请求数
+        index_name = self.index_generator.index_document_name(file_path, is_fallback)
+        document_id = self._index_executor().submit(self.uploader.upload_text, index_name, index_content,
+                                                    config.TXT_KNOWLEDGE_BASE_ID, document_id).result()
+        if not document_id:
+            return False
+        logger.info(f"索引文件上传成功: {file_name}")
+        self._record_upload(file_path, content_hash, INDEX_DOCUMENT, config.TXT_KNOWLEDGE_BASE_ID, document_id)
+        return True
+
+    def _upload_original(self, file_path, content_hash, document_id=None):
+        """上传原文件到原文件库/父子模式知识库（已有文档时原地更新）"""
+        file_name = os.path.basename(file_path)
+        original_kb_id, use_parent_child_mode, kb_type = self._original_target()
+        document_id = self.uploader.upload_file(
+            file_path, 
+            original_kb_id, 
+            use_parent_child_mode=use_parent_child_mode,
+            content_hash=content_hash,
+            document_id=document_id
+        )
+        if not document_id:
+            logger.error(f"原文件上传到{kb_type}失败: {file_name}")
+            return False
+        logger.info(f"原文件上传成功到{kb_type}: {file_name} -> {original_kb_id}")
+        self._record_upload(file_path, content_hash, ORIGINAL_DOCUMENT, original_kb_id, document_id)
+        return True
+
+    async def process_file_async(self, file_path, job_id=None, content_hash=None):
+        """process_file 的异步版本：分析（及随后的索引上传）与原文件上传并发执行"""
+        engine = self.pool
+        file_name = os.path.basename(file_path)
+        try:
+            if not self.should_process(file_path):
+                return True
+
+            is_image = self._is_image(file_path)
+            logger.info(f"开始处理文件: {file_name} (类型: {'图片' if is_image else '文档'}, 异步)")
+
+            if content_hash is None:
+                content_hash = await engine.run_blocking(hash_file, file_path)
+            known, (index_uploaded, index_document), (original_uploaded, original_document) = \
+                await engine.run_blocking(self._lookup_targets, file_path, content_hash, is_image)
+            if index_uploaded and original_uploaded:
+                logger.info(f"内容已处理过，复用已有索引和知识库文档: {file_name}")
+                await engine.run_blocking(self._index_duplicate, file_path, content_hash, known)
+                return True
+
+            await engine.run_blocking(self._set_stage, job_id, 'analyzing')
+            tasks = {}
+            if not index_uploaded:
+                tasks[INDEX_DOCUMENT] = self._index_and_upload_async(file_path, content_hash, known, job_id,
+                                                                     index_document)
+            if not original_uploaded:
+                tasks[ORIGINAL_DOCUMENT] = self._upload_original_async(file_path, content_hash, original_document)
+            elif is_image:
                 logger.info(f"图片文件跳过原文件上传: {file_name}")
-            
-            # 记录处理时间
-            self.processed_files[file_id] = time.time()
-            
+            results = dict(zip(tasks, await asyncio.gather(*tasks.values(), return_exceptions=True)))
+            for result in results.values():
+                if isinstance(result, Exception):
+                    logger.error(f"处理文件异常: {file_name} - {str(result)}")
+            return self._report_targets(file_name, {kind: result is True for kind, result in results.items()})
+
         except Exception as e:
             logger.error(f"处理文件异常: {file_name} - {str(e)}")
+            return False
+
+    async def _index_and_upload_async(self, file_path, content_hash, known, job_id=None, document_id=None):
+        """生成索引并上传到.txt知识库（已有文档时原地更新）"""
+        engine = self.pool
+        file_name = os.path.basename(file_path)
+        result = await engine.run_blocking(self._reuse_index, file_path, content_hash, known)
+        if not result:
+            result = await self._generate_index_async(file_path, content_hash)
+            if not result:
+                return False
+            await engine.run_blocking(self.content_store.save_index, content_hash, file_path, *result)
+        index_content, is_fallback = result
+
+        await engine.run_blocking(self._set_stage, job_id, 'uploading')
+        index_name = self.index_generator.index_document_name(file_path, is_fallback)
+        document_id = await asyncio.wrap_future(self._index_executor().submit(
+            self.uploader.upload_text, index_name, index_content, config.TXT_KNOWLEDGE_BASE_ID, document_id))
+        if not document_id:
+            return False
+        logger.info(f"索引文件上传成功: {file_name}")
+        await engine.run_blocking(self._record_upload, file_path, content_hash, INDEX_DOCUMENT,
+                                  config.TXT_KNOWLEDGE_BASE_ID, document_id)
+        return True
+
+    async def _generate_index_async(self, file_path, content_hash):
+        """异步调用Chatflow：内容提取和索引格式化在线程池，请求本身在事件循环中等待"""
+        engine = self.pool
+        generator = self.index_generator
+        analyzer = generator.chatflow_analyzer
+        file_info = await engine.run_blocking(generator.info_extractor.extract_file_info, file_path,
+                                              content_hash=content_hash)
+        if not file_info:
+            return None
+        chatflow_result = await engine.run_blocking(analyzer.cached_result, file_info['hash'], file_path)
+        try:
+            if not chatflow_result:
+                request = await engine.run_blocking(analyzer.build_chatflow_request, file_path, file_info['hash'])
+                if request:
+                    response = await engine.request('chat', 'POST', request['url'], headers=request['headers'],
+                                                    json=request['json'])
+                    chatflow_result = analyzer.process_chatflow_response(request, response.status_code, response.text)
+                    await engine.run_blocking(analyzer.cache_result, file_info['hash'], chatflow_result)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logger.error(f"Dify Chatflow分析异常: {file_info['name']} - {str(e)}")
+        return await engine.run_blocking(generator.build_index, file_path, file_info, chatflow_result)
+
+    async def _upload_original_async(self, file_path, content_hash, document_id=None):
+        """上传原文件到原文件库/父子模式知识库（已有文档时原地更新）"""
+        engine = self.pool
+        file_name = os.path.basename(file_path)
+        original_kb_id, use_parent_child_mode, kb_type = self._original_target()
+        prepared = await engine.run_blocking(self.uploader.prepare_upload, file_path, content_hash=content_hash)
+        if prepared:
+            upload_name, source = prepared
+            document_id = await self._send_document_async(upload_name, source, original_kb_id,
+                                                          use_parent_child_mode, document_id)
+        else:
+            document_id = None
+        if not document_id:
+            logger.error(f"原文件上传到{kb_type}失败: {file_name}")
+            return False
+        logger.info(f"原文件上传成功到{kb_type}: {file_name} -> {original_kb_id}")
+        await engine.run_blocking(self._record_upload, file_path, content_hash, ORIGINAL_DOCUMENT, original_kb_id,
+                                  document_id)
+        return True
+
+    async def _send_document_async(self, upload_name, source, knowledge_base_id, use_parent_child_mode=False,
+                                   document_id=None):
+        """异步调用 create-by-file（有 document_id 时为 update-by-file）接口，返回文档ID，失败时返回None
+
+        source 为文件路径或 bytes，按块流式发送。
+        """
+        uploader = self.uploader
+        if not uploader.api_key:
+            logger.warning("知识库API密钥未设置，跳过上传")
+            return None
+        request = uploader.build_document_request(upload_name, knowledge_base_id, use_parent_child_mode, document_id)
+        try:
+            body = uploader.build_document_body(upload_name, source, request)
+        except OSError as e:
+            logger.error(f"读取待上传文件失败: {upload_name} - {str(e)}")
+            return None
+        try:
+            response = await self.pool.request('dataset', 'POST', request['url'],
+                                               headers={**request['headers'], **body.headers()},
+                                               content=body.async_stream())
+        except Exception as e:
+            logger.error(f"🌐🌐 上传请求失败: {upload_name} - {type(e).__name__}: {str(e)}")
+            return None
         finally:
-            # 释放处理锁
-            if file_id and file_id in self.processing_lock:
-                self.processing_lock.remove(file_id)
+            body.close()
+        if uploader.document_missing(document_id, response.status_code):
+            return await self._send_document_async(upload_name, source, knowledge_base_id, use_parent_child_mode)
+        return uploader.process_document_response(upload_name, knowledge_base_id, response.status_code,
+                                                  response.text, use_parent_child_mode, document_id)
+
+    async def _remove_file_async(self, file_path):
+        """remove_file 的异步版本：删除请求在事件循环中发送"""
+        engine = self.pool
+        uploader = self.uploader
+        if not uploader.api_key:
+            logger.warning("知识库API密钥未设置，跳过删除")
+            return False
+        success = True
+        for record in await engine.run_blocking(self._documents_to_delete, file_path):
+            request = uploader.build_delete_request(record['dataset_id'], record['document_id'])
+            try:
+                response = await engine.request('dataset', 'DELETE', request['url'], headers=request['headers'])
+                deleted = uploader.process_delete_response(record['dataset_id'], record['document_id'],
+                                                           response.status_code, response.text)
+            except Exception as e:
+                logger.error(f"🌐🌐 删除请求失败: {record['document_id']} - {type(e).__name__}: {str(e)}")
+                deleted = False
+            if deleted:
+                await engine.run_blocking(self._drop_document, file_path, record)
+            else:
+                success = False
+        if success:
+            await engine.run_blocking(self._forget_path, file_path)
+            logger.info(f"已清理删除文件的知识库文档: {os.path.basename(file_path)}")
+        return success
     
     def open_image_by_filename(self, filename):
         """根据文件名打开图片"""
@@ -1455,16 +2531,51 @@ class FileMonitor:
 class FileEventHandler(FileSystemEventHandler):
     """文件事件处理器"""
     
-    def __init__(self, monitor):
+    def __init__(self, monitor, observer=None):
         self.monitor = monitor
+        self.observer = observer
+        self.tree = TreeWatcher(observer, self, monitor.rules, recursive=config.MONITOR_RECURSIVE) if observer else None
     
+    def _schedule(self, directory):
+        # 非递归监控的目录下新建的子目录需要单独注册监控
+        if self.tree:
+            self.tree.add_directory(directory)
+
     def on_created(self, event):
         if not event.is_directory:
-            self.monitor.process_file(event.src_path)
+            self.monitor.submit(event.src_path)
+        elif self.monitor.rules.accept_dir(event.src_path):
+            self._schedule(event.src_path)
+            if config.MONITOR_RECURSIVE:
+                self.monitor.submit_tree(event.src_path)
     
     def on_modified(self, event):
         if not event.is_directory:
-            self.monitor.process_file(event.src_path)
+            self.monitor.submit(event.src_path)
+
+    def on_deleted(self, event):
+        if event.is_directory:
+            self.monitor.remove_tree(event.src_path)
+        else:
+            self.monitor.remove(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.monitor.move(event.src_path, event.dest_path)
+            return
+        if self.monitor.rules.accept_dir(event.dest_path):
+            self._schedule(event.dest_path)
+        self.monitor.move_tree(event.src_path, event.dest_path)
+
+# 进程模式下每个子进程独立持有的监控器
+_worker_monitor = None
+
+def _process_job_in_subprocess(job):
+    """进程池任务入口（需为模块级函数以便pickle），任务状态直接写入共享的状态库"""
+    global _worker_monitor
+    if _worker_monitor is None:
+        _worker_monitor = FileMonitor()
+    _worker_monitor.process_job(job)
 
 def start_monitoring():
     """启动文件监控"""
@@ -1492,22 +2603,35 @@ def start_monitoring():
         
         # 创建监控器
         monitor = FileMonitor()
-        event_handler = FileEventHandler(monitor)
+        monitor.start_workers()
         observer = Observer()
-        observer.schedule(event_handler, path=config.MONITOR_DIR, recursive=False)
+        event_handler = FileEventHandler(monitor, observer)
+        watched = event_handler.tree.schedule(config.MONITOR_DIR)
         observer.start()
+        logger.info(f"监控范围: {'递归' if config.MONITOR_RECURSIVE else '仅顶层'}, 注册监控 {len(watched)} 个目录")
+
+        # 监控启动后再对账，对账期间发生的变化同样会被事件捕获
+        if config.RECONCILE_ON_START:
+            monitor.reconcile(config.MONITOR_DIR)
         
         logger.info("✅ Dify Chatflow监控服务已启动")
         logger.info("📁 将文件放入监控目录，系统将自动处理")
         
         # 保持运行
+        last_stats_time = time.time()
         try:
             while True:
                 time.sleep(1)
+                # 领取退避到期的重试任务
+                monitor.pump()
+                if config.STATS_LOG_INTERVAL > 0 and time.time() - last_stats_time >= config.STATS_LOG_INTERVAL:
+                    last_stats_time = time.time()
+                    logger.info(f"📊 运行指标: {json.dumps(monitor.get_stats(), ensure_ascii=False)}")
         except KeyboardInterrupt:
             logger.info("监控服务已停止")
             observer.stop()
         observer.join()
+        monitor.stop_workers()
             
     except Exception as e:
         logger.error(f"监控服务启动失败: {str(e)}")
@@ -1535,17 +2659,15 @@ if __name__ == "__main__":
     print("图片处理: 生成索引文件，跳过原文件上传")
     print("正在启动...")
     
-    # 检查必要的库
-    try:
-        import docx
+    # 检查必要的库（只查找不导入，解析库在第一次用到时才加载）
+    if module_available('docx'):
         print("✅ python-docx 已安装")
-    except ImportError:
+    else:
         print("⚠️ python-docx 未安装，Word文档解析将受限")
     
-    try:
-        import PyPDF2
+    if module_available('PyPDF2'):
         print("✅ PyPDF2 已安装")
-    except ImportError:
+    else:
         print("⚠️ PyPDF2 未安装，PDF文档解析将受限")
     
     if PIL_AVAILABLE:
@@ -0,0 +1,220 @@
+# http_client.py - 所有Dify调用共享的HTTP客户端（连接池 + 长连接 + 重试）
+import os
+import time
+import random
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from endpoint_guard import get_endpoint_guard, endpoint_for_url
+
+logger = logging.getLogger(__name__)
+
+# 可重试的状态码；POST只在服务端明确拒绝（未处理）时重试
+RETRY_STATUS = {429, 502, 503, 504}
+POST_RETRY_STATUS = {429, 503}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+
+class _Counters:
+    """连接复用统计"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.retries = 0
+        self.errors = 0
+
+    def add(self, name, n=1):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + n)
+
+
+_counters = _Counters()
+
+
+class _CountingHTTPConnection(HTTPConnection):
+    def connect(self):
+        _counters.add('new_connections')
+        return super().connect()
+
+
+class _CountingHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        _counters.add('new_connections')
+        return super().connect()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+
+class _PooledAdapter(HTTPAdapter):
+    """使用计数连接池的适配器"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+
+def _rewind(kwargs):
+    """重试前把请求体中的文件对象移回开头"""
+    bodies = [kwargs.get('data')]
+    files = kwargs.get('files') or {}
+    for value in (files.values() if isinstance(files, dict) else [v for _, v in files]):
+        bodies.append(value[1] if isinstance(value, (tuple, list)) else value)
+    for body in bodies:
+        if hasattr(body, 'seek'):
+            body.seek(0)
+
+
+class DifyHttpClient:
+    """基于 requests.Session 的共享客户端
+
+    - 每个主机一个连接池，最多 pool_maxsize 条长连接，超出时等待空闲连接
+    - 超时拆分为连接超时和读取超时
+    - 连接失败/超时和 429/5xx 按带抖动的指数退避重试
+    - 每次发送前经过接口的限流器和熔断器（endpoint_guard），熔断中抛出 CircuitOpenError
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=16, connect_timeout=5.0, read_timeout=60.0,
+                 max_retries=3, backoff=0.5, backoff_max=30.0):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max(0, int(max_retries))
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        adapter = _PooledAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=True,
+            max_retries=0
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Connection': 'keep-alive'})
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            pool_connections=int(os.getenv('HTTP_POOL_CONNECTIONS', '10')),
+            pool_maxsize=int(os.getenv('HTTP_POOL_MAXSIZE', '16')),
+            connect_timeout=float(os.getenv('HTTP_CONNECT_TIMEOUT', '5')),
+            read_timeout=float(os.getenv('API_TIMEOUT', '60')),
+            max_retries=int(os.getenv('HTTP_MAX_RETRIES', '3')),
+            backoff=float(os.getenv('HTTP_RETRY_BACKOFF', '0.5')),
+        )
+
+    def _timeout(self, timeout):
+        # 调用方传入的单个数值视为读取超时，连接超时统一使用短超时
+        if timeout is None:
+            return (self.connect_timeout, self.read_timeout)
+        if isinstance(timeout, (tuple, list)):
+            return tuple(timeout)
+        return (min(self.connect_timeout, timeout), timeout)
+
+    def _sleep_before_retry(self, attempt, response=None):
+        delay = min(self.backoff_max, self.backoff * (2 ** attempt))
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = min(self.backoff_max, max(delay, float(retry_after)))
+        # 全抖动，避免多个工作线程同时重试
+        time.sleep(random.uniform(0, delay))
+        _counters.add('retries')
+
+    def request(self, method, url, timeout=None, retries=None, endpoint=None, **kwargs):
+        """发送请求；返回 requests.Response，网络异常在重试耗尽后抛出
+
+        endpoint 为限流/熔断使用的接口名，默认按URL归类。
+        """
+        method = method.upper()
+        retries = self.max_retries if retries is None else retries
+        idempotent = method in IDEMPOTENT_METHODS
+        retry_status = RETRY_STATUS if idempotent else POST_RETRY_STATUS
+        timeout = self._timeout(timeout)
+        guard = get_endpoint_guard(endpoint or endpoint_for_url(url))
+        attempt = 0
+        while True:
+            wait = guard.acquire()
+            if wait > 0:
+                time.sleep(wait)
+            _counters.add('requests')
+            try:
+                response = self.session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                _counters.add('errors')
+                guard.record_overload(type(e).__name__)
+                # 非幂等请求只在连接阶段失败（请求未发出）时重试
+                can_retry = idempotent or isinstance(e, requests.exceptions.ConnectTimeout)
+                if attempt >= retries or not can_retry:
+                    raise
+                logger.warning(f"请求失败，准备重试({attempt + 1}/{retries}): {method} {url} - {str(e)}")
+                self._sleep_before_retry(attempt)
+                attempt += 1
+                _rewind(kwargs)
+                continue
+            except Exception:
+                guard.release()
+                raise
+            guard.record_status(response.status_code)
+            if response.status_code in retry_status and attempt < retries:
+                logger.warning(f"服务端返回{response.status_code}，准备重试({attempt + 1}/{retries}): {method} {url}")
+                response.close()
+                self._sleep_before_retry(attempt, response)
+                attempt += 1
+                _rewind(kwargs)
+                continue
+            return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request('PATCH', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    @staticmethod
+    def stats():
+        """请求数、新建连接数和复用连接数"""
+        with _counters.lock:
+            reused = max(0, _counters.requests - _counters.errors - _counters.new_connections)
+            return {
+                'requests': _counters.requests,
+                'new_connections': _counters.new_connections,
+                'reused_connections': reused,
+                'retries': _counters.retries,
+                'errors': _counters.errors,
+            }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """进程内共享的客户端（按环境变量配置）"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = DifyHttpClient.from_env()
+    return _client
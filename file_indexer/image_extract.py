@@ -0,0 +1,165 @@
+# image_extract.py - 图片元数据与缩略图：只读文件头/EXIF，缩略图按内容哈希缓存
+import io
+import os
+import time
+import logging
+import threading
+from local_db import LocalDatabase
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image, ExifTags, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    Image = ExifTags = ImageOps = None
+    PIL_AVAILABLE = False
+
+# 单个EXIF值保留的最大长度（MakerNote等二进制大字段直接跳过）
+MAX_EXIF_VALUE_CHARS = 200
+# Exif子IFD，拍摄时间、曝光参数等在这里
+_EXIF_IFD = 0x8769
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS thumbnail_cache (
+    cache_key TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_thumbnail_cache_lru ON thumbnail_cache(last_used_at);
+"""
+
+
+def _require_pil():
+    if not PIL_AVAILABLE:
+        raise ImportError("PIL/Pillow未安装")
+
+
+def _exif_items(exif):
+    """可读的EXIF标签（含Exif子IFD），跳过二进制和过长的值"""
+    tags = dict(exif)
+    try:
+        tags.update(exif.get_ifd(_EXIF_IFD))
+    except Exception:
+        pass
+    for tag, value in tags.items():
+        if tag == _EXIF_IFD or isinstance(value, (bytes, bytearray, dict)):
+            continue
+        text = str(value).strip('\x00 ')
+        if not text or len(text) > MAX_EXIF_VALUE_CHARS:
+            continue
+        yield ExifTags.TAGS.get(tag, tag), text
+
+
+def image_info(file_path):
+    """读取图片格式、尺寸和EXIF
+
+    Image.open 只解析文件头，不解码像素，内存占用与图片大小无关。
+    """
+    _require_pil()
+    with Image.open(file_path) as img:
+        info = {
+            'format': img.format,
+            'size': img.size,
+            'mode': img.mode,
+            'filename': os.path.basename(file_path)
+        }
+        try:
+            for name, value in _exif_items(img.getexif()):
+                info[f'exif_{name}'] = value
+        except Exception as e:
+            logger.debug(f"读取EXIF失败: {os.path.basename(file_path)} - {str(e)}")
+    return info
+
+
+def make_thumbnail(file_path, max_size=512, quality=75):
+    """生成长边不超过 max_size 的JPEG缩略图，返回字节串
+
+    JPEG 通过 draft 模式按 1/2、1/4、1/8 比例直接解码，不需要先解出全尺寸像素；
+    其他格式仍需完整解码一次，但只保留缩略图。
+    """
+    _require_pil()
+    with Image.open(file_path) as img:
+        img.draft('RGB', (max_size, max_size))
+        try:
+            # 按EXIF方向旋转，避免手机照片横竖颠倒
+            img = ImageOps.exif_transpose(img)
+        except Exception:
+            pass
+        img.thumbnail((max_size, max_size))
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+class ThumbnailCache:
+    """按内容哈希和尺寸缓存缩略图，总大小超过上限时淘汰最久未使用的条目"""
+
+    def __init__(self, db_path, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max(1, int(max_bytes))
+        self.db = LocalDatabase(db_path)
+        with self.db.lock:
+            self.db.conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, content_hash, max_size):
+        key = f"{content_hash}:{max_size}"
+        with self.db.lock:
+            row = self.db.execute("SELECT data FROM thumbnail_cache WHERE cache_key = ?", (key,)).fetchone()
+            if row:
+                self.db.execute("UPDATE thumbnail_cache SET last_used_at = ? WHERE cache_key = ?", (time.time(), key))
+        with self._lock:
+            self._stats['hits' if row else 'misses'] += 1
+        return bytes(row['data']) if row else None
+
+    def put(self, content_hash, max_size, data):
+        if len(data) > self.max_bytes:
+            return
+        key = f"{content_hash}:{max_size}"
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO thumbnail_cache (cache_key, content_hash, data, size, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, content_hash, data, len(data), time.time())
+            )
+            evicted = self._evict(conn)
+        if evicted:
+            with self._lock:
+                self._stats['evictions'] += evicted
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM thumbnail_cache").fetchone()[0]
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return 0
+        victims = []
+        for row in conn.execute("SELECT cache_key, size FROM thumbnail_cache ORDER BY last_used_at"):
+            if excess <= 0:
+                break
+            victims.append((row['cache_key'],))
+            excess -= row['size']
+        conn.executemany("DELETE FROM thumbnail_cache WHERE cache_key = ?", victims)
+        return len(victims)
+
+    def get_or_create(self, file_path, content_hash, max_size=512, quality=75):
+        """先查缓存，未命中时生成并写入"""
+        data = self.get(content_hash, max_size)
+        if data is None:
+            data = make_thumbnail(file_path, max_size, quality)
+            self.put(content_hash, max_size, data)
+        return data
+
+    def stats(self):
+        entries, total = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM thumbnail_cache"
+        ).fetchone()
+        with self._lock:
+            stats = dict(self._stats)
+        stats['entries'] = entries
+        stats['bytes'] = total
+        return stats
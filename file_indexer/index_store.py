@@ -0,0 +1,122 @@
+# index_store.py - 本地索引库：保存文件摘要、类型和元数据
+import os
+import time
+import hashlib
+from local_db import LocalDatabase
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_index (
+    file_id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    doc_type TEXT,
+    summary TEXT,
+    index_content TEXT NOT NULL,
+    method TEXT,
+    content_hash TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_file_index_path ON file_index(path);
+"""
+
+# 索引内容中的字段名（与 _format_chatflow_index / _format_fallback_index 保持一致）
+_FIELD_PREFIXES = {
+    'doc_type': ('文件类型:', '文件类型：'),
+    'summary': ('内容总结:', '内容总结：'),
+}
+
+
+def file_id_for(path):
+    """由文件绝对路径得到稳定的文件ID"""
+    normalized = os.path.normcase(os.path.abspath(path))
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def parse_index_fields(index_content):
+    """从索引文本中取出文件类型和内容总结"""
+    fields = {'doc_type': None, 'summary': None}
+    for line in index_content.splitlines():
+        line = line.strip()
+        for key, prefixes in _FIELD_PREFIXES.items():
+            for prefix in prefixes:
+                if fields[key] is None and line.startswith(prefix):
+                    fields[key] = line[len(prefix):].strip()
+    return fields
+
+
+class IndexStore:
+    """按文件ID保存索引，索引文件不再写回监控目录"""
+
+    def __init__(self, db_path):
+        self.db = LocalDatabase(db_path)
+        with self.db.lock:
+            self.db.conn.executescript(_SCHEMA)
+
+    def put(self, path, index_content, method=None, content_hash=None):
+        """保存（覆盖）一个文件的索引，返回文件ID"""
+        file_id = file_id_for(path)
+        fields = parse_index_fields(index_content)
+        self.db.execute(
+            "INSERT OR REPLACE INTO file_index "
+            "(file_id, path, name, doc_type, summary, index_content, method, content_hash, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (file_id, os.path.abspath(path), os.path.basename(path), fields['doc_type'], fields['summary'],
+             index_content, method, content_hash, time.time())
+        )
+        return file_id
+
+    def get(self, file_id):
+        row = self.db.execute("SELECT * FROM file_index WHERE file_id = ?", (file_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_by_path(self, path):
+        return self.get(file_id_for(path))
+
+    def get_many(self, file_ids):
+        """批量读取"""
+        file_ids = list(file_ids)
+        result = {}
+        for start in range(0, len(file_ids), 500):
+            chunk = file_ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.db.execute(f"SELECT * FROM file_index WHERE file_id IN ({placeholders})", chunk).fetchall()
+            result.update({row['file_id']: dict(row) for row in rows})
+        return result
+
+    def all(self, columns=('file_id', 'path', 'name', 'doc_type', 'summary', 'updated_at')):
+        """整表批量读取（搜索用，默认不带完整索引文本）"""
+        rows = self.db.execute(f"SELECT {', '.join(columns)} FROM file_index").fetchall()
+        return [dict(row) for row in rows]
+
+    def search(self, keyword, limit=50):
+        """按文件名/类型/总结做子串匹配"""
+        pattern = f"%{keyword}%"
+        rows = self.db.execute(
+            "SELECT file_id, path, name, doc_type, summary, updated_at FROM file_index "
+            "WHERE name LIKE ? OR summary LIKE ? OR doc_type LIKE ? ORDER BY updated_at DESC LIMIT ?",
+            (pattern, pattern, pattern, int(limit))
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete(self, path):
+        self.db.execute("DELETE FROM file_index WHERE file_id = ?", (file_id_for(path),))
+
+    def move(self, old_path, new_path):
+        """文件移动/重命名后迁移索引记录"""
+        self.db.execute(
+            "UPDATE file_index SET file_id = ?, path = ?, name = ?, updated_at = ? WHERE file_id = ?",
+            (file_id_for(new_path), os.path.abspath(new_path), os.path.basename(new_path), time.time(),
+             file_id_for(old_path))
+        )
+
+    def export(self, file_id, export_dir, suffix='_index'):
+        """导出为文本文件（放在监控目录之外），返回文件路径"""
+        record = self.get(file_id)
+        if not record:
+            return None
+        os.makedirs(export_dir, exist_ok=True)
+        base_name = os.path.splitext(record['name'])[0]
+        export_path = os.path.join(export_dir, f"{base_name}_{file_id}{suffix}.txt")
+        with open(export_path, 'w', encoding='utf-8') as f:
+            f.write(record['index_content'])
+        return export_path
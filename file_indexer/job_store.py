@@ -0,0 +1,182 @@
+# job_store.py - 持久化的文件处理任务队列
+import time
+import random
+import logging
+from local_db import LocalDatabase
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+PENDING = 'pending'
+EXTRACTING = 'extracting'
+ANALYZING = 'analyzing'
+UPLOADING = 'uploading'
+DONE = 'done'
+FAILED = 'failed'
+ACTIVE_STATES = (EXTRACTING, ANALYZING, UPLOADING)
+
+_ACTIVE_SQL = "('extracting', 'analyzing', 'uploading')"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL UNIQUE,
+    state TEXT NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    rerun INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs(state, next_attempt_at);
+"""
+
+# 同一路径只保留一条任务：
+# - 处理中的任务标记 rerun，完成后重新排队
+# - 已完成且大小/修改时间未变的任务保持不变
+# - 其余情况（新版本、失败、待处理）重置为立即可执行的 pending
+_ENQUEUE_SQL = f"""
+INSERT INTO jobs (path, state, size, mtime_ns, attempts, next_attempt_at, created_at, updated_at)
+VALUES (?, 'pending', ?, ?, 0, ?, ?, ?)
+ON CONFLICT(path) DO UPDATE SET
+    rerun = CASE WHEN state IN {_ACTIVE_SQL} THEN 1 ELSE rerun END,
+    state = CASE
+        WHEN state IN {_ACTIVE_SQL} THEN state
+        WHEN state = 'done' AND size IS excluded.size AND mtime_ns IS excluded.mtime_ns THEN 'done'
+        ELSE 'pending' END,
+    attempts = CASE
+        WHEN state IN {_ACTIVE_SQL} THEN attempts
+        WHEN state = 'done' AND size IS excluded.size AND mtime_ns IS excluded.mtime_ns THEN attempts
+        ELSE 0 END,
+    next_attempt_at = CASE
+        WHEN state IN {_ACTIVE_SQL} THEN next_attempt_at
+        WHEN state = 'done' AND size IS excluded.size AND mtime_ns IS excluded.mtime_ns THEN next_attempt_at
+        ELSE excluded.next_attempt_at END,
+    error = CASE WHEN state = 'done' AND size IS excluded.size AND mtime_ns IS excluded.mtime_ns THEN error ELSE NULL END,
+    size = excluded.size,
+    mtime_ns = excluded.mtime_ns,
+    updated_at = excluded.updated_at
+"""
+
+
+class JobStore:
+    """SQLite(WAL)持久化任务队列
+
+    状态流转: pending -> extracting -> analyzing -> uploading -> done / failed，
+    失败任务按指数退避重新排队，超过最大次数后停在 failed。
+    """
+
+    def __init__(self, db_path, max_attempts=5, backoff_base=5.0, backoff_max=600.0):
+        self.db = LocalDatabase(db_path)
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff_base = float(backoff_base)
+        self.backoff_max = float(backoff_max)
+        with self.db.lock:
+            self.db.conn.executescript(_SCHEMA)
+
+    def enqueue(self, path, size=None, mtime_ns=None):
+        """登记一个待处理文件"""
+        now = time.time()
+        self.db.execute(_ENQUEUE_SQL, (path, size, mtime_ns, now, now, now))
+
+    def enqueue_many(self, items):
+        """批量登记 [(path, size, mtime_ns), ...]，单个事务提交"""
+        now = time.time()
+        rows = [(path, size, mtime_ns, now, now, now) for path, size, mtime_ns in items]
+        if rows:
+            self.db.executemany(_ENQUEUE_SQL, rows)
+        return len(rows)
+
+    def claim(self, limit):
+        """取出到期的待处理任务并标记为 extracting"""
+        if limit <= 0:
+            return []
+        now = time.time()
+        with self.db.transaction() as conn:
+            rows = conn.execute(
+                "SELECT id, path, attempts FROM jobs WHERE state = 'pending' AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at LIMIT ?",
+                (now, int(limit))
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE jobs SET state = 'extracting', updated_at = ? WHERE id = ?",
+                    [(now, row['id']) for row in rows]
+                )
+        return [dict(row) for row in rows]
+
+    def release(self, job_id):
+        """未能执行的任务放回队列，不计失败次数"""
+        self.db.execute(
+            "UPDATE jobs SET state = 'pending', updated_at = ? WHERE id = ?",
+            (time.time(), job_id)
+        )
+
+    def set_state(self, job_id, state):
+        """更新处理阶段"""
+        self.db.execute(
+            "UPDATE jobs SET state = ?, updated_at = ? WHERE id = ?",
+            (state, time.time(), job_id)
+        )
+
+    def complete(self, job_id):
+        """任务完成；处理期间文件又有变化时重新排队"""
+        now = time.time()
+        self.db.execute(
+            "UPDATE jobs SET state = CASE WHEN rerun THEN 'pending' ELSE 'done' END, "
+            "attempts = 0, rerun = 0, error = NULL, next_attempt_at = ?, updated_at = ? WHERE id = ?",
+            (now, now, job_id)
+        )
+
+    def fail(self, job_id, error, retry=True):
+        """任务失败：按指数退避重试，或直接标记为 failed"""
+        now = time.time()
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT attempts, rerun FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            attempts = row['attempts'] + 1
+            if row['rerun']:
+                # 文件已有新版本，立即按新版本重试
+                state, attempts, next_at = PENDING, 0, now
+            elif retry and attempts < self.max_attempts:
+                delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+                state, next_at = PENDING, now + delay * random.uniform(0.5, 1.0)
+            else:
+                state, next_at = FAILED, now
+            conn.execute(
+                "UPDATE jobs SET state = ?, attempts = ?, rerun = 0, error = ?, next_attempt_at = ?, "
+                "updated_at = ? WHERE id = ?",
+                (state, attempts, str(error)[:1000], next_at, now, job_id)
+            )
+        return state
+
+    def defer(self, job_id, until, error=None):
+        """任务挂回队列，到 until 时再处理，不计失败次数（Dify接口熔断期间使用）"""
+        now = time.time()
+        self.db.execute(
+            "UPDATE jobs SET state = 'pending', rerun = 0, error = ?, next_attempt_at = ?, updated_at = ? "
+            "WHERE id = ?",
+            (str(error)[:1000] if error else None, max(now, until), now, job_id)
+        )
+
+    def recover(self):
+        """启动时把上次中断在处理中的任务放回队列"""
+        cursor = self.db.execute(
+            f"UPDATE jobs SET state = 'pending', rerun = 0, next_attempt_at = ?, updated_at = ? "
+            f"WHERE state IN {_ACTIVE_SQL}",
+            (time.time(), time.time())
+        )
+        return cursor.rowcount
+
+    def get(self, path):
+        row = self.db.execute("SELECT * FROM jobs WHERE path = ?", (path,)).fetchone()
+        return dict(row) if row else None
+
+    def counts(self):
+        """各状态任务数"""
+        rows = self.db.execute("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state").fetchall()
+        return {row['state']: row['n'] for row in rows}
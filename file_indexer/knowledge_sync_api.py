@@ -1,10 +1,10 @@
 # knowledge_sync_api.py
 import os
 import logging
-import requests
 import json
 import time
 from config import config
+from http_client import get_http_client
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -29,7 +29,7 @@ class DifyAPIManager:
         url = f"{self.base_url}/v1/datasets"
         
         try:
-            response = requests.get(
+            response = get_http_client().get(
                 url,
                 headers=self.get_headers(),
                 timeout=10
@@ -82,7 +82,7 @@ class DifyAPIManager:
             
             logger.info(f"开始上传文件: {file_name}")
             
-            response = requests.post(
+            response = get_http_client().post(
                 url,
                 headers=headers,
                 files=files,
@@ -125,7 +125,7 @@ class DifyAPIManager:
         }
         
         try:
-            response = requests.post(
+            response = get_http_client().post(
                 url,
                 headers=self.get_headers(),
                 json=data,
@@ -151,7 +151,7 @@ class DifyAPIManager:
         url = f"{self.base_url}/v1/datasets/{self.knowledge_base_id}/documents/{document_id}"
         
         try:
-            response = requests.get(
+            response = get_http_client().get(
                 url,
                 headers=self.get_headers(),
                 timeout=10
@@ -1,10 +1,10 @@
 # knowledge_sync_corrected.py
 import os
 import logging
-import requests
 import json
 import time
 from config import config
+from http_client import get_http_client
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -40,7 +40,7 @@ class DifySessionManager:
         url = f"{config.DIFY_BASE_URL}/console/api/datasets"
         
         try:
-            response = requests.get(
+            response = get_http_client().get(
                 url,
                 headers=self.get_headers(),
                 cookies=self.cookies,
@@ -113,7 +113,7 @@ def sync_to_dify_knowledge(original_file_path, index_txt_path):
             single_file = {"file": (file_name, file_handle, file_info[1][2])}
             
             # 发送上传请求
-            response = requests.post(
+            response = get_http_client().post(
                 upload_url,
                 headers=headers,
                 cookies=cookies,
@@ -179,7 +179,7 @@ def sync_to_dify_knowledge(original_file_path, index_txt_path):
             }
             
             # 发送创建文档请求
-            response = requests.post(
+            response = get_http_client().post(
                 create_doc_url,
                 headers=headers,
                 cookies=cookies,
@@ -261,7 +261,7 @@ def test_complete_upload():
         headers = session_manager.get_headers()
         cookies = session_manager.cookies
         
-        response = requests.get(docs_url, headers=headers, cookies=cookies, timeout=10)
+        response = get_http_client().get(docs_url, headers=headers, cookies=cookies, timeout=10)
         if response.status_code == 200:
             data = response.json()
             if isinstance(data, dict) and 'data' in data:
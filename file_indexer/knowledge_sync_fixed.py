@@ -1,10 +1,10 @@
 # knowledge_sync_fixed.py
 import os
 import logging
-import requests
 import json
 import time
 from config import config
+from http_client import get_http_client
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -40,7 +40,7 @@ class DifySessionManager:
         url = f"{config.DIFY_BASE_URL}/console/api/datasets"
         
         try:
-            response = requests.get(
+            response = get_http_client().get(
                 url,
                 headers=self.get_headers(),
                 cookies=self.cookies,
@@ -88,7 +88,7 @@ def sync_to_dify_knowledge(original_file_path, index_txt_path):
         }
         
         # 发送请求
-        response = requests.post(
+        response = get_http_client().post(
             url,
             headers=headers,
             cookies=cookies,
@@ -4,6 +4,7 @@ import logging
 import requests
 import json
 from config import config
+from http_client import get_http_client
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -42,7 +43,7 @@ class DifySessionManager:
         url = f"{config.DIFY_BASE_URL}/console/api/datasets"
         
         try:
-            response = requests.get(
+            response = get_http_client().get(
                 url,
                 headers=self.get_headers(),
                 cookies=self.cookies,
@@ -111,7 +112,7 @@ def sync_to_dify_knowledge(original_file_path, index_txt_path):
         logger.info(f"开始同步文件到知识库: {os.path.basename(original_file_path)}")
         
         # 发送POST请求 - 使用会话认证
-        response = requests.post(
+        response = get_http_client().post(
             url,
             headers=headers,
             cookies=cookies,
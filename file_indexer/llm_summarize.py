@@ -6,6 +6,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 import docx
 import logging
 from config import config
+from index_store import IndexStore
 
 # 配置日志，无需修改
 logging.basicConfig(
@@ -14,6 +15,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 索引保存到本地索引库，不再写回监控目录
+index_store = IndexStore(config.STATE_DB_PATH)
+
 def read_file_content(file_path):
     """读取文件内容并截断，无需修改"""
     if not os.path.exists(file_path):
@@ -59,13 +63,9 @@ def generate_file_index(file_path, file_name, create_time, update_time):
 内容总结：{file_content[:300]}...（完整内容请查阅原文件）
 关键词：{','.join(all_keywords)}"""
         
-        # 保存索引文件，避免重名
-        file_name_no_ext = os.path.splitext(file_name)[0]
-        index_txt_name = f"{file_name_no_ext}_index.txt"
-        index_txt_path = os.path.join(config.TARGET_DIR, index_txt_name)
-        
-        with open(index_txt_path, 'w', encoding='utf-8') as f:
-            f.write(index_content)
+        # 存入索引库，并导出到监控目录之外的导出目录
+        file_id = index_store.put(file_path, index_content, method="本地标准化索引")
+        index_txt_path = index_store.export(file_id, config.INDEX_EXPORT_DIR)
         
         logger.info(f"索引文件已生成: {index_txt_path}")
         return index_txt_path
@@ -0,0 +1,76 @@
+# local_db.py - 本地状态库（SQLite）连接工具
+import os
+import sqlite3
+import threading
+
+
+def default_state_db_path():
+    """本地状态库路径：STATE_DB_PATH，未配置时放在程序目录（不要放进监控目录）"""
+    return os.getenv('STATE_DB_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'file_monitor_state.db')
+
+
+def open_database(db_path):
+    """打开SQLite数据库：WAL模式，允许多线程共享连接"""
+    directory = os.path.dirname(os.path.abspath(db_path))
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    # WAL下读写互不阻塞，NORMAL同步级别只在检查点fsync，崩溃时不会损坏数据库
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA busy_timeout=30000')
+    return conn
+
+
+class LocalDatabase:
+    """带线程锁的SQLite连接，各个本地存储共享这一封装"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = open_database(db_path)
+        self.lock = threading.RLock()
+
+    def execute(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params)
+
+    def executemany(self, sql, seq):
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                cursor = self.conn.executemany(sql, seq)
+                self.conn.execute('COMMIT')
+                return cursor
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def transaction(self):
+        """显式事务：with db.transaction() as conn: ..."""
+        return _Transaction(self)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class _Transaction:
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.lock.acquire()
+        try:
+            self.db.conn.execute('BEGIN IMMEDIATE')
+        except Exception:
+            self.db.lock.release()
+            raise
+        return self.db.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.db.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        finally:
+            self.db.lock.release()
+        return False
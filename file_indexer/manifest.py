@@ -0,0 +1,132 @@
+# manifest.py - 文件指纹清单与启动对账
+import os
+import time
+import logging
+from local_db import LocalDatabase
+from content_hash import hash_file
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS manifest (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT,
+    recorded_ns INTEGER NOT NULL
+);
+"""
+
+# 修改时间落在记录时刻附近时，同一时间戳内可能又被改写过（文件系统时间精度最差约2秒）
+RACY_WINDOW_NS = 2 * 1000 * 1000 * 1000
+
+
+def walk_files(root, recursive=True, accept_dir=None):
+    """用 os.scandir 遍历目录，产出 (路径, stat)；accept_dir 返回False的子树不会进入"""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive and (accept_dir is None or accept_dir(entry.path)):
+                                stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            yield entry.path, entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.warning(f"无法读取目录: {directory} - {str(e)}")
+
+
+class FileManifest:
+    """已成功处理文件的指纹清单 (path, size, mtime_ns, hash)"""
+
+    def __init__(self, db_path):
+        self.db = LocalDatabase(db_path)
+        with self.db.lock:
+            self.db.conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def fingerprint(path):
+        """读取文件当前指纹 (size, mtime_ns, hash)"""
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns, hash_file(path)
+
+    def record(self, path, size, mtime_ns, content_hash):
+        self.db.execute(
+            "INSERT OR REPLACE INTO manifest (path, size, mtime_ns, hash, recorded_ns) VALUES (?, ?, ?, ?, ?)",
+            (path, size, mtime_ns, content_hash, time.time_ns())
+        )
+
+    def remove(self, path):
+        self.db.execute("DELETE FROM manifest WHERE path = ?", (path,))
+
+    def load(self):
+        """整表读入内存：路径 -> (size, mtime_ns, hash, recorded_ns)"""
+        rows = self.db.execute("SELECT path, size, mtime_ns, hash, recorded_ns FROM manifest").fetchall()
+        return {row[0]: (row[1], row[2], row[3], row[4]) for row in rows}
+
+    def reconcile(self, root, accept=None, recursive=True, accept_dir=None):
+        """对比清单与磁盘，返回 (新增或变化的 [(path, size, mtime_ns)], 已删除的路径, 统计)
+
+        先信任stat数据：大小不同直接判定变化，大小和修改时间都相同视为未变；
+        只有大小相同但修改时间不同、或修改时间落在记录时刻附近时才计算哈希。
+        """
+        started = time.time()
+        known = self.load()
+        changed = []
+        touched = []
+        seen = set()
+        hashed = 0
+        for path, stat in walk_files(root, recursive=recursive, accept_dir=accept_dir):
+            if accept and not accept(path):
+                continue
+            seen.add(path)
+            entry = known.get(path)
+            if entry is None:
+                changed.append((path, stat.st_size, stat.st_mtime_ns))
+                continue
+            size, mtime_ns, content_hash, recorded_ns = entry
+            if stat.st_size != size:
+                changed.append((path, stat.st_size, stat.st_mtime_ns))
+                continue
+            racy = stat.st_mtime_ns >= recorded_ns - RACY_WINDOW_NS
+            if stat.st_mtime_ns == mtime_ns and not racy:
+                continue
+            # stat无法判断，比较内容哈希
+            try:
+                hashed += 1
+                current_hash = hash_file(path)
+            except OSError:
+                continue
+            if content_hash and current_hash == content_hash:
+                touched.append((path, stat.st_size, stat.st_mtime_ns, current_hash))
+            else:
+                changed.append((path, stat.st_size, stat.st_mtime_ns))
+
+        prefix = os.path.join(root, '')
+        deleted = [
+            path for path in known
+            if path not in seen and path.startswith(prefix) and (accept is None or accept(path))
+        ]
+        now_ns = time.time_ns()
+        if touched:
+            # 内容未变只是时间戳变化，刷新清单避免下次再算哈希
+            self.db.executemany(
+                "UPDATE manifest SET size = ?, mtime_ns = ?, hash = ?, recorded_ns = ? WHERE path = ?",
+                [(size, mtime_ns, h, now_ns, path) for path, size, mtime_ns, h in touched]
+            )
+        if deleted:
+            self.db.executemany("DELETE FROM manifest WHERE path = ?", [(path,) for path in deleted])
+
+        stats = {
+            'scanned': len(seen),
+            'changed': len(changed),
+            'deleted': len(deleted),
+            'hashed': hashed,
+            'seconds': round(time.time() - started, 3),
+        }
+        return changed, deleted, stats
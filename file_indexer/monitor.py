@@ -11,6 +11,9 @@ from watchdog.events import FileSystemEventHandler
 from llm_summarize import generate_file_index
 from knowledge_sync_api import sync_to_dify_knowledge
 from config import config
+from debouncer import Debouncer
+from worker_pool import WorkerPool
+from path_rules import PathRules, TreeWatcher
 
 # 配置日志，清晰记录运行状态，无需修改
 logging.basicConfig(
@@ -23,9 +26,29 @@ logger = logging.getLogger(__name__)
 last_processed = {}
 
 class FileChangeHandler(FileSystemEventHandler):
+    def __init__(self, observer=None):
+        super().__init__()
+        self.observer = observer
+        self.rules = PathRules(config.TARGET_DIR, include=config.MONITOR_INCLUDE, exclude=config.MONITOR_EXCLUDE)
+        self.tree = TreeWatcher(observer, self, self.rules, recursive=config.MONITOR_RECURSIVE) if observer else None
+        # 事件合并后交给工作池，监控线程和定时线程都不做耗时处理
+        self.pool = WorkerPool(self._process_file, workers=config.WORKER_POOL_SIZE, name='monitor-worker')
+        self.debouncer = Debouncer(self._dispatch, quiet_period=config.DEBOUNCE_QUIET_SECONDS)
+
+    def start(self):
+        self.pool.start()
+        self.debouncer.start()
+
+    def stop(self):
+        self.debouncer.stop()
+        self.pool.stop()
+
     def on_created(self, event):
         if not event.is_directory:
             self._handle_file_event(event.src_path)
+        elif self.tree:
+            # 非递归监控的目录下新建的子目录需要单独注册监控
+            self.tree.add_directory(event.src_path)
     
     def on_modified(self, event):
         if not event.is_directory:
@@ -36,9 +59,22 @@ class FileChangeHandler(FileSystemEventHandler):
         file_name = os.path.basename(file_path)
         if (file_name.startswith('~$') or
             file_name.endswith('_index.txt') or
-            not file_path.lower().endswith(config.ALLOWED_EXTENSIONS)):
+            not file_path.lower().endswith(config.ALLOWED_EXTENSIONS) or
+            not self.rules.accept_file(file_path)):
             return
 
+        # 创建+多次修改事件合并为一次处理，文件静默且大小稳定后触发
+        self.debouncer.touch(file_path)
+
+    def _dispatch(self, file_path):
+        # 在定时线程上执行，不能阻塞：队列已满时挂回去抖器，一个静默期后再提交
+        if not self.pool.submit(file_path, block=False):
+            logger.warning(f"处理队列已满，稍后重试: {file_path}")
+            self.debouncer.rearm(file_path)
+
+    def _process_file(self, file_path):
+        file_name = os.path.basename(file_path)
+
         # 避免短时间重复处理，无需修改
         current_time = time.time()
         if (file_path in last_processed and 
@@ -58,17 +94,6 @@ class FileChangeHandler(FileSystemEventHandler):
             create_time = datetime.fromtimestamp(file_stat.st_ctime).strftime("%Y-%m-%d %H:%M:%S")
             update_time = datetime.fromtimestamp(file_stat.st_mtime).strftime("%Y-%m-%d %H:%M:%S")
 
-            # 等待文件完全写入，无需修改
-            time.sleep(1)
-            if not os.path.exists(file_path):
-                logger.warning(f"文件不存在，跳过处理: {file_path}")
-                return
-            initial_size = os.path.getsize(file_path)
-            time.sleep(1)
-            if os.path.getsize(file_path) != initial_size:
-                logger.info(f"文件{file_name}仍在写入，等待完成后再处理")
-                return
-
             # 核心流程：生成索引 + 全自动同步知识库，无需修改
             index_txt_path = generate_file_index(file_path, file_name, create_time, update_time)
             sync_to_dify_knowledge(file_path, index_txt_path)
@@ -81,9 +106,10 @@ def start_file_monitor():
     try:
         # 验证配置，无需修改
         config.validate()
-        event_handler = FileChangeHandler()
         observer = Observer()
-        observer.schedule(event_handler, path=config.TARGET_DIR, recursive=False)
+        event_handler = FileChangeHandler(observer)
+        event_handler.start()
+        event_handler.tree.schedule(config.TARGET_DIR)
         observer.start()
         logger.info(f"✅ 目录监控已启动，监控路径: {config.TARGET_DIR}")
         logger.info(f"✅ 支持文件格式: {config.ALLOWED_EXTENSIONS}")
@@ -99,6 +125,8 @@ def start_file_monitor():
     finally:
         if 'observer' in locals():
             observer.join()
+        if 'event_handler' in locals():
+            event_handler.stop()
 
 if __name__ == "__main__":
     start_file_monitor()
\ No newline at end of file
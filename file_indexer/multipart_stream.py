@@ -0,0 +1,164 @@
+# multipart_stream.py - 流式 multipart/form-data 请求体：文件内容按块从磁盘读取，每个上传只占用固定大小的缓冲
+import os
+import uuid
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 每次从文件读取的字节数
+CHUNK_BYTES = 64 * 1024
+
+
+def _quote(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\r', ' ').replace('\n', ' ')
+
+
+class _FilePart:
+    """文件内容：路径或可seek的文件对象，发送时才打开/读取"""
+
+    def __init__(self, source):
+        self.path = source if isinstance(source, str) else None
+        self.file = None if self.path else source
+        self.owned = False
+        if self.path:
+            self.size = os.path.getsize(self.path)
+        else:
+            start = source.tell()
+            self.size = source.seek(0, os.SEEK_END) - start
+            source.seek(start)
+        self.start = 0 if self.path else start
+
+    def __len__(self):
+        return self.size
+
+    def read(self, offset, length):
+        if self.file is None:
+            self.file = open(self.path, 'rb')
+            self.owned = True
+        self.file.seek(self.start + offset)
+        data = self.file.read(length)
+        if len(data) < length:
+            # Content-Length 已按原大小发出，文件变短只能中止这次上传
+            raise IOError(f"文件在上传过程中被截断: {self.path or '<stream>'}")
+        return data
+
+    def close(self):
+        if self.owned and self.file is not None:
+            self.file.close()
+            self.file = None
+            self.owned = False
+
+
+class MultipartEncoder:
+    """流式 multipart/form-data 请求体
+
+    字段和各部分的头部预先编码，文件内容在发送时按 CHUNK_BYTES 读取，长度预先算好，
+    以 Content-Length 发送。
+
+    - requests：作为 data 传入（有 read/seek/tell/__len__），重试前 seek(0) 即可重发
+    - httpx：把 async_stream() 作为 content 传入，每次 async for 都从头产出
+    """
+
+    def __init__(self, fields=None, files=None, boundary=None, chunk_size=CHUNK_BYTES):
+        """fields: {字段名: 值}；files: {字段名: (文件名, 路径/bytes/文件对象, MIME类型)}"""
+        self.boundary = boundary or uuid.uuid4().hex
+        self.chunk_size = chunk_size
+        self._parts = []
+        delimiter = f"--{self.boundary}\r\n"
+        for name, value in (fields or {}).items():
+            self._parts.append(
+                (f'{delimiter}Content-Disposition: form-data; name="{_quote(name)}"\r\n\r\n'
+                 f'{value}\r\n').encode('utf-8')
+            )
+        for name, (filename, source, mime_type) in (files or {}).items():
+            self._parts.append(
+                (f'{delimiter}Content-Disposition: form-data; name="{_quote(name)}"; '
+                 f'filename="{_quote(filename)}"\r\nContent-Type: {mime_type}\r\n\r\n').encode('utf-8')
+            )
+            self._parts.append(bytes(source) if isinstance(source, (bytes, bytearray, memoryview))
+                               else _FilePart(source))
+            self._parts.append(b'\r\n')
+        self._parts.append(f"--{self.boundary}--\r\n".encode('utf-8'))
+        self.length = sum(len(part) for part in self._parts)
+        self._position = 0
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def headers(self):
+        return {'Content-Type': self.content_type, 'Content-Length': str(self.length)}
+
+    def __len__(self):
+        return self.length
+
+    def _spans(self, start=0, limit=None):
+        """从 start 开始依次产出 (部分, 部分内偏移, 长度)，每段不超过 chunk_size，共 limit 字节（None 表示到结尾）"""
+        remaining = self.length - start if limit is None else limit
+        offset = 0
+        for part in self._parts:
+            size = len(part)
+            if start >= offset + size:
+                offset += size
+                continue
+            pos = max(0, start - offset)
+            while pos < size and remaining > 0:
+                length = min(self.chunk_size, size - pos, remaining)
+                yield part, pos, length
+                pos += length
+                remaining -= length
+            if remaining <= 0:
+                return
+            offset += size
+
+    def _chunks(self, start=0, limit=None):
+        for part, pos, length in self._spans(start, limit):
+            yield part[pos:pos + length] if isinstance(part, bytes) else part.read(pos, length)
+
+    def read(self, size=-1):
+        """从当前位置读取（requests/urllib3 按块调用）"""
+        if size is None or size < 0:
+            size = self.length - self._position
+        data = b''.join(self._chunks(self._position, size))
+        self._position += len(data)
+        return data
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self.length
+        self._position = min(max(0, offset), self.length)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def __iter__(self):
+        return self._chunks()
+
+    def async_stream(self):
+        """httpx AsyncClient 用的请求体（httpx 会优先把有 __iter__ 的对象当作同步流）"""
+        return _AsyncBody(self)
+
+    def close(self):
+        for part in self._parts:
+            if isinstance(part, _FilePart):
+                part.close()
+
+
+class _AsyncBody:
+    """每次 async for 都从头产出，重试时可以重新发送"""
+
+    def __init__(self, encoder):
+        self.encoder = encoder
+
+    async def __aiter__(self):
+        loop = asyncio.get_running_loop()
+        for part, pos, length in self.encoder._spans():
+            if isinstance(part, bytes):
+                yield part[pos:pos + length]
+            else:
+                # 文件读取放到线程池，磁盘慢时不阻塞事件循环中的其他请求
+                yield await loop.run_in_executor(None, part.read, pos, length)
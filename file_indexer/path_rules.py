@@ -0,0 +1,158 @@
+# path_rules.py - 递归监控的包含/排除规则
+import os
+import re
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 默认排除的目录，整棵子树不会被遍历、监控或计算哈希
+DEFAULT_EXCLUDES = ('.git', '.svn', '.hg', 'node_modules', '__pycache__', '.venv', 'venv', '$RECYCLE.BIN')
+
+
+def _glob_to_regex(pattern):
+    """把一条glob规则翻译为正则片段（相对监控根目录，分隔符统一为/）
+
+    - 不含 / 的规则匹配任意层级的同名文件或目录，如 node_modules、*.tmp
+    - 含 / 的规则从根目录开始匹配，如 projects/archive、docs/**/draft*
+    - 匹配到目录时同时匹配其下整棵子树
+    """
+    pattern = pattern.strip().replace('\\', '/')
+    anchored = '/' in pattern.rstrip('/')
+    pattern = pattern.strip('/')
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            parts.append('.*')
+            i += 2
+        elif pattern[i] == '*':
+            parts.append('[^/]*')
+            i += 1
+        elif pattern[i] == '?':
+            parts.append('[^/]')
+            i += 1
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    body = ''.join(parts)
+    prefix = '' if anchored else '(?:.*/)?'
+    return f'{prefix}{body}(?:/.*)?'
+
+
+def _compile(patterns):
+    patterns = [p for p in patterns if p and p.strip()]
+    if not patterns:
+        return None
+    # 所有规则合并为一个正则，每个事件只需一次匹配
+    return re.compile('^(?:' + '|'.join(_glob_to_regex(p) for p in patterns) + ')$', re.IGNORECASE)
+
+
+def split_patterns(value):
+    """解析逗号分隔的规则配置"""
+    return [p.strip() for p in (value or '').split(',') if p.strip()]
+
+
+class PathRules:
+    """相对于监控根目录的包含/排除规则"""
+
+    def __init__(self, root, include=None, exclude=None, default_excludes=DEFAULT_EXCLUDES):
+        self.root = os.path.abspath(root)
+        self._include = _compile(include or [])
+        self._exclude = _compile(list(default_excludes or []) + list(exclude or []))
+
+    def _relative(self, path):
+        rel = os.path.relpath(os.path.abspath(path), self.root)
+        if rel == '.' or rel.startswith('..'):
+            return None
+        return rel.replace(os.sep, '/')
+
+    def accept_dir(self, path):
+        """目录是否需要遍历/监控"""
+        rel = self._relative(path)
+        if rel is None:
+            return True
+        return not (self._exclude and self._exclude.match(rel))
+
+    def accept_file(self, path):
+        """文件是否需要处理"""
+        rel = self._relative(path)
+        if rel is None:
+            return False
+        if self._exclude and self._exclude.match(rel):
+            return False
+        if self._include and not self._include.match(rel):
+            return False
+        return True
+
+    def is_top_level(self, path):
+        """是否为根目录下的一级条目"""
+        rel = self._relative(path)
+        return rel is not None and '/' not in rel
+
+
+def _plan(path, rules):
+    """规划一个目录的监控：返回 (监控列表[(目录, 是否递归)], 子树中是否有被排除的目录)"""
+    children = []
+    pruned = False
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                if rules.accept_dir(entry.path):
+                    children.append(_plan(entry.path, rules))
+                else:
+                    pruned = True
+    except OSError as e:
+        logger.warning(f"无法读取监控目录: {path} - {str(e)}")
+    if not pruned and not any(has_excludes for _, has_excludes in children):
+        # 整棵子树都要监控，一个递归监控即可
+        return [(path, True)], False
+    watches = [(path, False)]
+    for child_watches, _ in children:
+        watches.extend(child_watches)
+    return watches, True
+
+
+class TreeWatcher:
+    """按排除规则给目录树注册监控，被排除的目录在任意层级都不会被监控后端遍历
+
+    不含排除目录的子树整棵递归监控；通往排除目录（如 proj/node_modules）路径上的
+    各级目录只做非递归监控，排除目录本身不注册。之后在递归监控的子树中新建的
+    排除目录仍由事件过滤兜底。
+    """
+
+    def __init__(self, observer, handler, rules, recursive=True):
+        self.observer = observer
+        self.handler = handler
+        self.rules = rules
+        self.recursive = recursive
+        self._flat = set()  # 非递归监控的目录，其下新建的子目录需要单独注册
+        self._lock = threading.Lock()
+
+    def schedule(self, root):
+        """注册根目录，返回监控列表 [(目录, 是否递归)]"""
+        root = os.path.abspath(root)
+        if not self.recursive:
+            watches = [(root, False)]
+        else:
+            watches, _ = _plan(root, self.rules)
+        with self._lock:
+            for path, recursive in watches:
+                self.observer.schedule(self.handler, path=path, recursive=recursive)
+                if not recursive:
+                    self._flat.add(path)
+        return watches
+
+    def add_directory(self, path):
+        """新建或移入的目录：父目录只做非递归监控时为它注册监控，返回新增的监控列表"""
+        path = os.path.abspath(path)
+        with self._lock:
+            covered = os.path.dirname(path) not in self._flat or path in self._flat
+        if not self.recursive or covered or not self.rules.accept_dir(path):
+            return []
+        return self.schedule(path)
@@ -0,0 +1,52 @@
+# pdf_extract.py - PDF文本流式提取：按页惰性读取、字符预算截断
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import PyPDF2
+    PYPDF2_AVAILABLE = True
+except ImportError:
+    PyPDF2 = None
+    PYPDF2_AVAILABLE = False
+
+
+def _open_reader(file_obj):
+    if not PYPDF2_AVAILABLE:
+        raise ImportError("PyPDF2未安装")
+    reader = PyPDF2.PdfReader(file_obj)
+    if reader.is_encrypted:
+        # 只设置了权限密码（空用户密码）的PDF可以直接解密
+        reader.decrypt('')
+    return reader
+
+
+def iter_pdf_pages(file_path, start=0, stop=None):
+    """逐页产出 (页码, 文本)，只在迭代到某页时才解析该页"""
+    with open(file_path, 'rb') as f:
+        reader = _open_reader(f)
+        total = len(reader.pages)
+        stop = total if stop is None else min(stop, total)
+        for page_no in range(start, stop):
+            try:
+                text = reader.pages[page_no].extract_text() or ''
+            except Exception as e:
+                logger.debug(f"PDF第{page_no + 1}页解析失败: {str(e)}")
+                text = ''
+            yield page_no, text
+
+
+def extract_pdf_text(file_path, max_chars=None):
+    """顺序提取，累计字符数达到 max_chars 后停止读取后续页"""
+    parts = []
+    collected = 0
+    for _, text in iter_pdf_pages(file_path):
+        if not text:
+            continue
+        parts.append(text)
+        collected += len(text) + 1
+        if max_chars and collected >= max_chars:
+            break
+    text = '\n'.join(parts)
+    return text[:max_chars] if max_chars else text
+
@@ -0,0 +1,118 @@
+# slide_extract.py - PPTX文本提取：按顺序流式解析幻灯片XML，只读文本框，不打开图片等媒体部件
+import logging
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+
+logger = logging.getLogger(__name__)
+
+# 含文本的形状：普通形状/文本框（sp）和表格等图形框（graphicFrame）；图片（pic）不含文本
+_TEXT_SHAPES = {'sp', 'graphicFrame'}
+
+
+def _local(tag):
+    """去掉命名空间"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _rel_targets(archive, rels_path, base_dir):
+    """解析 .rels，返回 {关系ID: zip内路径}"""
+    targets = {}
+    with archive.open(rels_path) as f:
+        for _, element in ET.iterparse(f):
+            if _local(element.tag) == 'Relationship' and element.get('TargetMode') != 'External':
+                target = element.get('Target', '')
+                if target.startswith('/'):
+                    path = target.lstrip('/')
+                else:
+                    path = posixpath.normpath(posixpath.join(base_dir, target))
+                targets[element.get('Id')] = path
+    return targets
+
+
+def _slide_paths(archive):
+    """按演示文稿中的放映顺序返回幻灯片XML路径"""
+    rels = _rel_targets(archive, 'ppt/_rels/presentation.xml.rels', 'ppt')
+    paths = []
+    with archive.open('ppt/presentation.xml') as f:
+        for _, element in ET.iterparse(f):
+            if _local(element.tag) == 'sldId':
+                for key, value in element.attrib.items():
+                    if _local(key) == 'id' and value in rels:
+                        paths.append(rels[value])
+            elif _local(element.tag) == 'sldIdLst':
+                break
+    names = set(archive.namelist())
+    return [path for path in paths if path in names]
+
+
+def _shape_texts(archive, path):
+    """流式解析一张幻灯片，返回各文本形状的文本（段落间换行）"""
+    texts = []
+    paragraphs = []
+    runs = []
+    cells = []
+    cell_start = 0
+    depth = 0
+    with archive.open(path) as f:
+        for event, element in ET.iterparse(f, events=('start', 'end')):
+            tag = _local(element.tag)
+            if event == 'start':
+                if tag in _TEXT_SHAPES:
+                    depth += 1
+                elif tag == 'tc':
+                    cell_start = len(paragraphs)
+                continue
+            if tag == 't' and depth:
+                runs.append(element.text or '')
+            elif tag == 'br' and depth:
+                runs.append('\n')
+            elif tag == 'p' and depth:
+                paragraphs.append(''.join(runs))
+                runs = []
+            elif tag == 'tc':
+                # 表格按行输出，单元格之间用 | 分隔
+                cells.append(' '.join(paragraphs[cell_start:]).strip())
+                del paragraphs[cell_start:]
+            elif tag == 'tr':
+                while cells and not cells[-1]:
+                    cells.pop()
+                if cells:
+                    paragraphs.append(' | '.join(cells))
+                cells = []
+            elif tag in _TEXT_SHAPES:
+                depth -= 1
+                if not depth:
+                    text = '\n'.join(paragraphs).strip()
+                    if text:
+                        texts.append(text)
+                    paragraphs = []
+                element.clear()
+            elif tag == 'pic':
+                element.clear()
+    return texts
+
+
+def iter_slide_texts(file_path):
+    """逐张产出 (幻灯片序号, [形状文本])，用到哪张才解析哪张"""
+    with zipfile.ZipFile(file_path) as archive:
+        for index, path in enumerate(_slide_paths(archive), 1):
+            yield index, _shape_texts(archive, path)
+
+
+def extract_pptx_text(file_path, max_chars=None):
+    """按幻灯片顺序提取文本，累计达到 max_chars 后不再解析后续幻灯片"""
+    lines = []
+    used = 0
+    slides = iter_slide_texts(file_path)
+    try:
+        for index, texts in slides:
+            for line in [f"--- 幻灯片 {index} ---"] + texts:
+                lines.append(line)
+                used += len(line) + 1
+            if max_chars and used >= max_chars:
+                break
+    finally:
+        slides.close()
+    text = '\n'.join(lines)
+    return text[:max_chars] if max_chars else text
@@ -1,10 +1,12 @@
 # smart_file_searcher.py
 import os
-import requests
 import json
 import re
 from datetime import datetime, timedelta
 from difflib import SequenceMatcher
+from local_db import default_state_db_path
+from index_store import IndexStore
+from http_client import get_http_client
 
 class SmartFileSearcher:
     """智能文件搜索器 - 结合Dify知识库和本地文件系统"""
@@ -15,6 +17,9 @@ class SmartFileSearcher:
         self.base_url = "http://localhost"
         self.file_opener_url = "http://localhost:5002/open-file"
         self.allowed_dir = "your path"
+        # 本地索引库（由文件监控服务写入），不存在时跳过
+        db_path = default_state_db_path()
+        self.index_store = IndexStore(db_path) if os.path.exists(db_path) else None
     
     def search_knowledge_base(self, query):
         """在Dify知识库中搜索文件"""
@@ -31,7 +36,7 @@ class SmartFileSearcher:
         }
         
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = get_http_client().get(url, headers=headers, params=params, timeout=10)
             if response.status_code == 200:
                 return response.json().get('data', [])
             return []
@@ -58,6 +63,29 @@ class SmartFileSearcher:
         
         return matched_files
     
+    def search_index_store(self, query):
+        """在本地索引库中按文件名和内容总结搜索"""
+        if not self.index_store:
+            return []
+        
+        matched_files = []
+        for record in self.index_store.all():
+            summary = record.get('summary') or ''
+            similarity = max(
+                self.calculate_similarity(query, record['name']),
+                self.calculate_similarity(query, summary)
+            )
+            if similarity > 0.3 and os.path.exists(record['path']):
+                matched_files.append({
+                    'name': record['name'],
+                    'path': record['path'],
+                    'similarity': similarity,
+                    'info': {'文件类型': record.get('doc_type') or '', '文件内容摘要': summary},
+                    'source': 'local_index'
+                })
+        
+        return matched_files
+    
     def is_text_file(self, filename):
         """检查是否为文本文件"""
         text_extensions = {'.txt', '.docx', '.doc', '.pdf', '.md'}
@@ -112,7 +140,7 @@ class SmartFileSearcher:
     def open_file_via_api(self, file_name):
         """通过API打开文件"""
         try:
-            response = requests.get(
+            response = get_http_client().get(
                 self.file_opener_url,
                 params={'file_name': file_name},
                 timeout=10
@@ -209,12 +237,16 @@ class SmartFileSearcher:
         
         print(f"📚 知识库找到 {len(kb_files)} 个文件")
         
+        # 在本地索引库中搜索
+        index_files = self.search_index_store(user_query)
+        print(f"🗂️  本地索引库找到 {len(index_files)} 个文件")
+        
         # 在本地搜索
         local_files = self.search_local_files(user_query)
         print(f"💻 本地搜索找到 {len(local_files)} 个文件")
         
         # 合并结果
-        all_files = kb_files + local_files
+        all_files = kb_files + index_files + local_files
         
         # 去重
         unique_files = []
@@ -0,0 +1,269 @@
+# table_extract.py - 表格文本提取：Excel只打开一次并流式读取，CSV单独走快速路径
+import csv
+import logging
+import zipfile
+import posixpath
+import datetime
+import xml.etree.ElementTree as ET
+from text_extract import detect_encoding
+
+logger = logging.getLogger(__name__)
+
+# 单元格最多保留的字符数
+MAX_CELL_CHARS = 100
+# CSV编码探测读取的字节数
+_SNIFF_BYTES = 64 * 1024
+# 内置的日期/时间数字格式编号
+_BUILTIN_DATE_FORMATS = set(range(14, 23)) | {45, 46, 47}
+_EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+
+
+def _format_cell(value):
+    if value is None:
+        return ''
+    text = str(value).replace('\r', ' ').replace('\n', ' ').strip()
+    return text[:MAX_CELL_CHARS]
+
+
+class _Budget:
+    """按字符预算收集输出行"""
+
+    def __init__(self, max_chars):
+        self.max_chars = max_chars
+        self.lines = []
+        self.used = 0
+
+    def add(self, line):
+        """加入一行，预算用完时返回False"""
+        self.lines.append(line)
+        self.used += len(line) + 1
+        return not (self.max_chars and self.used >= self.max_chars)
+
+    def text(self):
+        text = '\n'.join(self.lines)
+        return text[:self.max_chars] if self.max_chars else text
+
+
+def _local(tag):
+    """去掉命名空间（兼容 Transitional 和 Strict 两套命名空间）"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _attr(element, name):
+    """按本地名读取属性（r:id 等带命名空间的属性）"""
+    for key, value in element.attrib.items():
+        if _local(key) == name:
+            return value
+    return None
+
+
+def _column_index(ref):
+    """单元格引用（如 AB12）的列号，从0开始"""
+    index = 0
+    for char in ref:
+        if not char.isalpha():
+            break
+        index = index * 26 + (ord(char.upper()) - 64)
+    return index - 1
+
+
+def _date_styles(archive):
+    """返回日期格式单元格的样式编号集合"""
+    if 'xl/styles.xml' not in archive.namelist():
+        return set()
+    date_formats = set(_BUILTIN_DATE_FORMATS)
+    styles = set()
+    in_cell_xfs = False
+    index = 0
+    with archive.open('xl/styles.xml') as f:
+        for event, element in ET.iterparse(f, events=('start', 'end')):
+            tag = _local(element.tag)
+            if event == 'start':
+                if tag == 'cellXfs':
+                    in_cell_xfs = True
+                continue
+            if tag == 'numFmt':
+                code = (element.get('formatCode') or '').lower()
+                # 去掉引号内的文字和颜色等方括号内容后再判断是否含日期占位符
+                code = ''.join(part for i, part in enumerate(code.split('"')) if i % 2 == 0)
+                code = ''.join(part.split(']')[-1] for part in code.split('['))
+                if any(char in code for char in 'ymdhs'):
+                    date_formats.add(int(element.get('numFmtId', -1)))
+            elif tag == 'xf' and in_cell_xfs:
+                if int(element.get('numFmtId', 0)) in date_formats:
+                    styles.add(index)
+                index += 1
+            elif tag == 'cellXfs':
+                break
+    return styles
+
+
+def _excel_date(value):
+    try:
+        serial = float(value)
+        moment = _EXCEL_EPOCH + datetime.timedelta(days=serial)
+    except (TypeError, ValueError, OverflowError):
+        return value
+    if serial == int(serial):
+        return moment.strftime('%Y-%m-%d')
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _sheet_paths(archive):
+    """按工作簿顺序返回 [(工作表名, zip内路径)]"""
+    rels = {}
+    with archive.open('xl/_rels/workbook.xml.rels') as f:
+        for _, element in ET.iterparse(f):
+            if _local(element.tag) == 'Relationship':
+                target = element.get('Target', '')
+                if target.startswith('/'):
+                    path = target.lstrip('/')
+                else:
+                    path = posixpath.normpath(posixpath.join('xl', target))
+                rels[element.get('Id')] = path
+    sheets = []
+    with archive.open('xl/workbook.xml') as f:
+        for _, element in ET.iterparse(f):
+            if _local(element.tag) == 'sheet':
+                path = rels.get(_attr(element, 'id'))
+                if path:
+                    sheets.append((element.get('name'), path))
+    return sheets
+
+
+def _read_rows(archive, path, max_rows, max_cols, date_styles=()):
+    """流式读取工作表前 max_rows 行；共享字符串单元格返回 ('s', 索引)，读够即停止解析"""
+    rows = []
+    cells = {}
+    with archive.open(path) as f:
+        context = ET.iterparse(f, events=('start', 'end'))
+        cell_type = cell_ref = cell_style = value = None
+        inline = []
+        for event, element in context:
+            tag = _local(element.tag)
+            if event == 'start':
+                if tag == 'c':
+                    cell_type = element.get('t')
+                    cell_ref = element.get('r')
+                    cell_style = element.get('s')
+                    value = None
+                    inline = []
+                continue
+            if tag == 'v':
+                value = element.text
+            elif tag == 't' and cell_type == 'inlineStr':
+                inline.append(element.text or '')
+            elif tag == 'c':
+                column = _column_index(cell_ref) if cell_ref else len(cells)
+                if column < max_cols:
+                    if cell_type == 's' and value is not None:
+                        cells[column] = ('s', int(value))
+                    elif cell_type == 'inlineStr':
+                        cells[column] = ''.join(inline)
+                    elif cell_type == 'b':
+                        cells[column] = 'TRUE' if value == '1' else 'FALSE'
+                    elif cell_type in (None, 'n') and cell_style and int(cell_style) in date_styles:
+                        cells[column] = _excel_date(value)
+                    else:
+                        cells[column] = value
+                element.clear()
+            elif tag == 'row':
+                if cells:
+                    width = max(cells) + 1
+                    rows.append([cells.get(i) for i in range(width)])
+                cells = {}
+                element.clear()
+                if len(rows) >= max_rows:
+                    break
+    return rows
+
+
+def _shared_strings(archive, needed):
+    """只解析到用到的最大索引为止"""
+    strings = []
+    if needed < 0 or 'xl/sharedStrings.xml' not in archive.namelist():
+        return strings
+    parts = []
+    with archive.open('xl/sharedStrings.xml') as f:
+        for _, element in ET.iterparse(f):
+            tag = _local(element.tag)
+            if tag == 't':
+                parts.append(element.text or '')
+            elif tag == 'rPh':
+                # 注音文本不计入单元格内容
+                parts = parts[:-1] if parts else parts
+            elif tag == 'si':
+                strings.append(''.join(parts))
+                parts = []
+                element.clear()
+                if len(strings) > needed:
+                    break
+    return strings
+
+
+def extract_xlsx_text(file_path, max_rows=10, max_cols=30, max_chars=20000):
+    """只打开一次工作簿，逐个工作表流式读取前 max_rows 行、前 max_cols 列
+
+    不依赖工作表的 dimension 信息，不会为了计算表格尺寸解析整张工作表。
+    """
+    budget = _Budget(max_chars)
+    with zipfile.ZipFile(file_path) as archive:
+        sheets = []
+        needed = -1
+        used = 0
+        date_styles = _date_styles(archive)
+        for name, path in _sheet_paths(archive):
+            rows = _read_rows(archive, path, max_rows, max_cols, date_styles)
+            sheets.append((name, rows))
+            used += len(name) + 6
+            for row in rows:
+                for cell in row:
+                    if isinstance(cell, tuple):
+                        needed = max(needed, cell[1])
+                        used += 8
+                    else:
+                        used += len(cell or '') + 3
+            # 估计已足够填满预算时不再读取后续工作表（共享字符串按平均长度估计）
+            if max_chars and used >= max_chars:
+                break
+        strings = _shared_strings(archive, needed)
+
+    for name, rows in sheets:
+        if not budget.add(f"工作表: {name}"):
+            break
+        full = False
+        for row in rows:
+            cells = []
+            for cell in row:
+                if isinstance(cell, tuple):
+                    cell = strings[cell[1]] if cell[1] < len(strings) else ''
+                cells.append(_format_cell(cell))
+            while cells and not cells[-1]:
+                cells.pop()
+            if cells and not budget.add(' | '.join(cells)):
+                full = True
+                break
+        if full:
+            break
+    return budget.text()
+
+
+def extract_csv_text(file_path, max_rows=10, max_cols=30, max_chars=20000):
+    """流式读取CSV前 max_rows 行"""
+    with open(file_path, 'rb') as f:
+        sample = f.read(_SNIFF_BYTES)
+    encoding = detect_encoding(sample)
+    try:
+        dialect = csv.Sniffer().sniff(sample[:8192].decode(encoding, errors='ignore'), delimiters=',;\t|')
+    except csv.Error:
+        dialect = csv.excel
+
+    budget = _Budget(max_chars)
+    with open(file_path, 'r', encoding=encoding, errors='replace', newline='') as f:
+        for index, row in enumerate(csv.reader(f, dialect)):
+            if index >= max_rows:
+                break
+            cells = [_format_cell(value) for value in row[:max_cols]]
+            if any(cells) and not budget.add(' | '.join(cells)):
+                break
+    return budget.text()
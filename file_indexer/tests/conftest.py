@@ -0,0 +1,20 @@
+# conftest.py - 测试公共设置：模块按程序目录平铺导入，日志写到临时目录
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LOG_DIR', tempfile.mkdtemp(prefix='file_indexer_test_logs_'))
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def wait_until(predicate, timeout=5.0, interval=0.01):
+    """轮询直到 predicate() 为真，超时返回False"""
+    import time
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(interval)
+    return predicate()
@@ -0,0 +1,161 @@
+# make_doc.py - 由真实.doc重新生成派生测试样本（python tests/fixtures/make_doc.py）
+#
+# 找不到公开可再分发的快速保存文档和4096字节扇区（v4）文档，两者都由真实文档派生：
+# fast_saved.doc  harmless-clean.doc 的正文拆成三个片段，中间一段改为UTF-16并追加到
+#                 WordDocument流末尾（与Word快速保存追加新片段的方式相同），置 fComplex 标志
+# cfb_v4.doc      dde-test-from-office2016.doc 的全部流重新打包为 4096 字节扇区的复合文档
+import os
+import sys
+import struct
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(HERE)))
+
+from doc_extract import CompoundFile, _read_fib, _read_pieces, _CLX_INDEX  # noqa: E402
+
+FREE = 0xFFFFFFFF
+END_OF_CHAIN = 0xFFFFFFFE
+FAT_SECTOR = 0xFFFFFFFD
+NO_STREAM = 0xFFFFFFFF
+MINI_CUTOFF = 4096
+MINI_SECTOR = 64
+
+
+def read_streams(path):
+    """读出根存储下的全部流：[(名称, 数据)]"""
+    with open(path, 'rb') as f:
+        cfb = CompoundFile(f)
+        names = [cfb._name(entry) for _, entry in cfb._children(0) if entry[66] == 2]
+        streams = []
+        for name in names:
+            stream = cfb.open_stream(name)
+            streams.append((name, stream.read(0, stream.size)))
+    return streams
+
+
+def _entry(name, kind, start, size, left=NO_STREAM, right=NO_STREAM, child=NO_STREAM):
+    raw = name.encode('utf-16-le') + b'\x00\x00' if name else b''
+    return (raw.ljust(64, b'\x00') + struct.pack('<HBB3I', len(raw), kind, 1, left, right, child)
+            + b'\x00' * 36 + struct.pack('<IQ', start, size))
+
+
+def write_compound(path, streams, sector_shift=9):
+    """写出只含根存储下若干流的复合文档（sector_shift=9 为v3，12 为v4）"""
+    sector_size = 1 << sector_shift
+    sectors, fat = [], []
+
+    def allocate(data, size, table, chunks):
+        count = -(-len(data) // size)
+        start = len(chunks)
+        for i in range(count):
+            chunks.append(data[i * size:(i + 1) * size].ljust(size, b'\x00'))
+            table.append(start + i + 1 if i < count - 1 else END_OF_CHAIN)
+        return start if count else END_OF_CHAIN
+
+    mini_chunks, minifat, starts = [], [], {}
+    for name, data in streams:
+        if len(data) >= MINI_CUTOFF:
+            starts[name] = allocate(data, sector_size, fat, sectors)
+        else:
+            starts[name] = allocate(data, MINI_SECTOR, minifat, mini_chunks)
+    mini_data = b''.join(mini_chunks)
+    mini_start = allocate(mini_data, sector_size, fat, sectors)
+    minifat_bytes = struct.pack(f'<{len(minifat)}I', *minifat) if minifat else b''
+    minifat_start = allocate(minifat_bytes, sector_size, fat, sectors)
+
+    # 目录：子项按（名称长度, 大写名称）排序后建平衡二叉树
+    order = sorted(range(len(streams)), key=lambda i: (len(streams[i][0]), streams[i][0].upper()))
+    links = {}
+
+    def build(items):
+        if not items:
+            return NO_STREAM
+        middle = len(items) // 2
+        links[items[middle]] = (build(items[:middle]), build(items[middle + 1:]))
+        return items[middle] + 1
+
+    root_child = build(order)
+    entries = [_entry('Root Entry', 5, mini_start, len(mini_data), child=root_child)]
+    for i, (name, data) in enumerate(streams):
+        left, right = links[i]
+        entries.append(_entry(name, 2, starts[name], len(data), left, right))
+    per_sector = sector_size // 128
+    while len(entries) % per_sector:
+        entries.append(_entry('', 0, 0, 0))
+    directory = b''.join(entries)
+    dir_start = allocate(directory, sector_size, fat, sectors)
+
+    fat_count = 1
+    while len(sectors) + fat_count > fat_count * sector_size // 4:
+        fat_count += 1
+    fat_start = len(sectors)
+    fat.extend([FAT_SECTOR] * fat_count)
+    fat.extend([FREE] * (fat_count * sector_size // 4 - len(fat)))
+    fat_bytes = struct.pack(f'<{len(fat)}I', *fat)
+    sectors.extend(fat_bytes[i:i + sector_size] for i in range(0, len(fat_bytes), sector_size))
+
+    difat = [fat_start + i for i in range(fat_count)] + [FREE] * (109 - fat_count)
+    header = (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + b'\x00' * 16
+              + struct.pack('<5H', 0x3E, 3 if sector_shift == 9 else 4, 0xFFFE, sector_shift, 6) + b'\x00' * 6
+              + struct.pack('<9I', 0 if sector_shift == 9 else len(directory) // sector_size, fat_count, dir_start,
+                            0, MINI_CUTOFF, minifat_start, -(-len(minifat_bytes) // sector_size),
+                            END_OF_CHAIN, 0)
+              + struct.pack('<109I', *difat))
+    with open(path, 'wb') as f:
+        f.write(header.ljust(sector_size, b'\x00'))
+        f.write(b''.join(sectors))
+
+
+def _fib_clx_offset(word):
+    """FIB 中 fcClx 字段在 WordDocument 流中的偏移"""
+    offset = 32
+    offset += 2 + struct.unpack_from('<H', word, offset)[0] * 2
+    offset += 2 + struct.unpack_from('<H', word, offset)[0] * 4
+    return offset + 2 + _CLX_INDEX * 8
+
+
+class _Bytes:
+    """给 doc_extract 的解析函数用的内存流"""
+
+    def __init__(self, data):
+        self.data = data
+        self.size = len(data)
+
+    def read(self, offset, length):
+        return self.data[offset:offset + length]
+
+
+def make_fast_saved(source, path, split=(6, 60)):
+    streams = dict(read_streams(source))
+    word = bytearray(streams['WordDocument'])
+    table_name, ccp_text, fc_clx, lcb_clx = _read_fib(_Bytes(bytes(word)))
+    (cp_start, cp_end, offset, compressed), = _read_pieces(_Bytes(streams[table_name]), fc_clx, lcb_clx)
+    assert compressed and cp_start == 0
+
+    # 中间一段以UTF-16追加到流末尾，三个片段的文件偏移不再按顺序排列
+    first, second = split
+    appended = len(word) + len(word) % 2
+    word.extend(b'\x00' * (appended - len(word)))
+    word.extend(bytes(word[offset + first:offset + second]).decode('cp1252').encode('utf-16-le'))
+    pieces = [(0, first, (offset * 2) | 0x40000000),
+              (first, second, appended),
+              (second, cp_end, ((offset + second) * 2) | 0x40000000)]
+    plc = struct.pack(f'<{len(pieces) + 1}I', *[p[0] for p in pieces], cp_end)
+    plc += b''.join(struct.pack('<HIH', 0, fc, 0) for _, _, fc in pieces)
+    clx = b'\x02' + struct.pack('<I', len(plc)) + plc
+    table = streams[table_name] + clx
+    struct.pack_into('<II', word, _fib_clx_offset(word), len(streams[table_name]), len(clx))
+    # fComplex：最后一次保存是快速保存
+    struct.pack_into('<H', word, 0x0A, struct.unpack_from('<H', word, 0x0A)[0] | 0x0004)
+    streams['WordDocument'] = bytes(word)
+    streams[table_name] = table
+    write_compound(path, list(streams.items()))
+
+
+def make_v4(source, path):
+    write_compound(path, read_streams(source), sector_shift=12)
+
+
+if __name__ == '__main__':
+    make_fast_saved(os.path.join(HERE, 'harmless-clean.doc'), os.path.join(HERE, 'fast_saved.doc'))
+    make_v4(os.path.join(HERE, 'dde-test-from-office2016.doc'), os.path.join(HERE, 'cfb_v4.doc'))
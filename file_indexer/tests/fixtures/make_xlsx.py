@@ -0,0 +1,110 @@
+# make_xlsx.py - 重新生成 xlsx 测试样本（python tests/fixtures/make_xlsx.py）
+#
+# phonetic.xlsx 手写XML，模拟日文版Excel保存的工作簿：注音(rPh)、富文本、内联字符串、
+# 自定义日期格式，工作表顺序与文件编号不一致；multi_sheet.xlsx 由 openpyxl 写出。
+import os
+import datetime
+import zipfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PKG_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+WORKSHEET = f'{REL}/worksheet'
+
+PHONETIC_PARTS = {
+    '[Content_Types].xml': f'''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/worksheets/sheet2.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/worksheets/sheet3.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>
+</Types>''',
+    '_rels/.rels': f'''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="{PKG_REL}"><Relationship Id="rId1" Type="{REL}/officeDocument" Target="xl/workbook.xml"/></Relationships>''',
+    'xl/workbook.xml': f'''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="{MAIN}" xmlns:r="{REL}"><sheets>
+<sheet name="売上" sheetId="3" r:id="rId3"/>
+<sheet name="Summary" sheetId="1" r:id="rId1"/>
+<sheet name="空" sheetId="2" r:id="rId2"/>
+</sheets></workbook>''',
+    'xl/_rels/workbook.xml.rels': f'''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="{PKG_REL}">
+<Relationship Id="rId1" Type="{WORKSHEET}" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="{WORKSHEET}" Target="/xl/worksheets/sheet2.xml"/>
+<Relationship Id="rId3" Type="{WORKSHEET}" Target="worksheets/sheet3.xml"/>
+<Relationship Id="rId4" Type="{REL}/styles" Target="styles.xml"/>
+<Relationship Id="rId5" Type="{REL}/sharedStrings" Target="sharedStrings.xml"/>
+</Relationships>''',
+    'xl/styles.xml': f'''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="{MAIN}">
+<numFmts count="3">
+<numFmt numFmtId="164" formatCode="yyyy/mm/dd"/>
+<numFmt numFmtId="165" formatCode="&quot;days &quot;0"/>
+<numFmt numFmtId="166" formatCode="[Red]0.00"/>
+</numFmts>
+<cellStyleXfs count="1"><xf numFmtId="0"/></cellStyleXfs>
+<cellXfs count="6">
+<xf numFmtId="0" xfId="0"/>
+<xf numFmtId="14" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="164" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="165" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="22" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="166" xfId="0" applyNumberFormat="1"/>
+</cellXfs>
+</styleSheet>''',
+    'xl/sharedStrings.xml': f'''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<sst xmlns="{MAIN}" count="4" uniqueCount="4">
+<si><t>東京</t><rPh sb="0" eb="2"><t>トウキョウ</t></rPh><phoneticPr fontId="1"/></si>
+<si><r><rPr><b/><sz val="11"/></rPr><t>売上</t></r><r><rPr><sz val="11"/></rPr><t xml:space="preserve"> 合計</t></r><rPh sb="0" eb="2"><t>ウリアゲ</t></rPh><phoneticPr fontId="1"/></si>
+<si><t>Name</t></si>
+<si><t>大阪</t><rPh sb="0" eb="2"><t>オオサカ</t></rPh></si>
+</sst>''',
+    'xl/worksheets/sheet3.xml': f'''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="{MAIN}"><sheetData>
+<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c><c r="C1" t="s"><v>3</v></c></row>
+<row r="2"><c r="A2" t="inlineStr"><is><r><t>インライン</t></r><r><rPr><i/></rPr><t>文字</t></r></is></c><c r="B2" s="1"><v>45000</v></c><c r="C2" s="4"><v>45000.5</v></c><c r="D2" s="3"><v>42</v></c><c r="E2" t="b"><v>1</v></c><c r="F2" s="5"><v>3.5</v></c></row>
+<row r="3"><c r="A3" s="2"><v>45292</v></c><c r="B3" t="inlineStr"><is><t>単独</t></is></c></row>
+<row r="5"><c r="A5"><v>1</v></c><c r="C5" t="str"><v>式の結果</v></c></row>
+</sheetData></worksheet>''',
+    'xl/worksheets/sheet1.xml': f'''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="{MAIN}"><sheetData>
+<row r="1"><c r="A1" t="s"><v>2</v></c><c r="B1" t="s"><v>0</v></c></row>
+</sheetData></worksheet>''',
+    'xl/worksheets/sheet2.xml': f'''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="{MAIN}"><sheetData/></worksheet>''',
+}
+
+
+def make_phonetic(path):
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, text in PHONETIC_PARTS.items():
+            archive.writestr(name, text.encode('utf-8'))
+
+
+def make_multi_sheet(path):
+    import openpyxl
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for month in (1, 2, 3):
+        sheet = workbook.create_sheet(f'{month}月')
+        sheet.append(['日期', '时间', '项目', '金额'])
+        for day in range(1, 29):
+            sheet.append([datetime.date(2024, month, day), datetime.datetime(2024, month, day, 9, 30),
+                          f'{month}月第{day}笔', day * 100 + month])
+    summary = workbook.create_sheet('汇总')
+    summary.append(['月份', '合计'])
+    for month in (1, 2, 3):
+        summary.append([f'{month}月', sum(day * 100 + month for day in range(1, 29))])
+    # 汇总表最后创建，移到工作簿最前面
+    workbook.move_sheet(summary, offset=-3)
+    workbook.save(path)
+
+
+if __name__ == '__main__':
+    make_phonetic(os.path.join(HERE, 'phonetic.xlsx'))
+    make_multi_sheet(os.path.join(HERE, 'multi_sheet.xlsx'))
@@ -0,0 +1,176 @@
+import os
+import time
+import threading
+
+from conftest import wait_until
+from debouncer import Debouncer
+
+
+class _Recorder:
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, path):
+        with self.lock:
+            self.calls.append((path, time.monotonic()))
+
+    def paths(self):
+        with self.lock:
+            return [path for path, _ in self.calls]
+
+
+def _debouncer(callback, quiet=0.2, check_stable=False):
+    debouncer = Debouncer(callback, quiet_period=quiet, tick=0.01, wheel_size=16, check_stable=check_stable)
+    debouncer.start()
+    return debouncer
+
+
+def test_burst_of_events_fires_once():
+    recorder = _Recorder()
+    debouncer = _debouncer(recorder)
+    try:
+        for _ in range(20):
+            debouncer.touch('/data/a.txt')
+        assert wait_until(lambda: recorder.paths())
+        time.sleep(0.3)
+        assert recorder.paths() == ['/data/a.txt']
+        stats = debouncer.stats()
+        assert stats['events'] == 20
+        assert stats['fired'] == 1
+        assert stats['pending'] == 0
+    finally:
+        debouncer.stop()
+
+
+def test_each_path_fires_separately():
+    recorder = _Recorder()
+    debouncer = _debouncer(recorder, quiet=0.05)
+    try:
+        for name in ('a', 'b', 'c'):
+            debouncer.touch(name)
+            debouncer.touch(name)
+        assert wait_until(lambda: len(recorder.paths()) == 3)
+        assert sorted(recorder.paths()) == ['a', 'b', 'c']
+    finally:
+        debouncer.stop()
+
+
+def test_new_event_postpones_until_quiet():
+    recorder = _Recorder()
+    debouncer = _debouncer(recorder, quiet=0.2)
+    try:
+        started = time.monotonic()
+        for _ in range(5):
+            debouncer.touch('a')
+            time.sleep(0.1)
+        last_event = time.monotonic()
+        assert wait_until(lambda: recorder.paths())
+        fired_at = recorder.calls[0][1]
+        # 静默期从最后一次事件算起
+        assert fired_at - last_event >= 0.1
+        assert fired_at - started >= 0.6
+        assert recorder.paths() == ['a']
+    finally:
+        debouncer.stop()
+
+
+def test_quiet_period_longer_than_one_wheel_turn():
+    # 16个槽位 x 10ms = 160ms一圈，静默期跨越多圈时靠圈数计数
+    recorder = _Recorder()
+    debouncer = _debouncer(recorder, quiet=0.5)
+    try:
+        touched = time.monotonic()
+        debouncer.touch('a')
+        assert wait_until(lambda: recorder.paths())
+        assert recorder.calls[0][1] - touched >= 0.45
+    finally:
+        debouncer.stop()
+
+
+def test_file_still_being_written_waits_for_stable_size(tmp_path):
+    path = str(tmp_path / 'growing.log')
+    with open(path, 'w') as f:
+        f.write('x')
+    recorder = _Recorder()
+    debouncer = _debouncer(recorder, quiet=0.1, check_stable=True)
+    try:
+        debouncer.touch(path)
+        # 不再产生事件，但文件仍在变大：签名不同时再等一个静默期
+        for i in range(4):
+            time.sleep(0.06)
+            with open(path, 'a') as f:
+                f.write('more data %d' % i)
+        written = time.monotonic()
+        assert wait_until(lambda: recorder.paths())
+        assert recorder.calls[0][1] >= written
+        assert recorder.paths() == [path]
+    finally:
+        debouncer.stop()
+
+
+def test_deleted_file_is_dropped(tmp_path):
+    path = str(tmp_path / 'tmp.txt')
+    with open(path, 'w') as f:
+        f.write('x')
+    recorder = _Recorder()
+    debouncer = _debouncer(recorder, quiet=0.05, check_stable=True)
+    try:
+        debouncer.touch(path)
+        os.remove(path)
+        assert wait_until(lambda: debouncer.pending_count() == 0)
+        time.sleep(0.1)
+        assert recorder.paths() == []
+    finally:
+        debouncer.stop()
+
+
+def test_callback_error_does_not_stop_the_timer():
+    calls = []
+
+    def callback(path):
+        calls.append(path)
+        if path == 'bad':
+            raise RuntimeError('boom')
+
+    debouncer = _debouncer(callback, quiet=0.02)
+    try:
+        debouncer.touch('bad')
+        assert wait_until(lambda: calls == ['bad'])
+        debouncer.touch('good')
+        assert wait_until(lambda: calls == ['bad', 'good'])
+    finally:
+        debouncer.stop()
+
+
+def test_rearmed_path_fires_again_without_blocking_others():
+    """下游队列已满时回调把路径挂回去，定时线程继续处理其他路径"""
+    calls = []
+    accepting = threading.Event()
+
+    def callback(path):
+        calls.append(path)
+        if path == 'busy' and not accepting.is_set():
+            debouncer.rearm(path)
+
+    debouncer = _debouncer(callback, quiet=0.05)
+    try:
+        debouncer.touch('busy')
+        assert wait_until(lambda: calls.count('busy') >= 2)
+        debouncer.touch('other')
+        assert wait_until(lambda: 'other' in calls)
+        accepting.set()
+        assert wait_until(lambda: debouncer.pending_count() == 0)
+        stats = debouncer.stats()
+        assert stats['requeued'] == calls.count('busy') - 1
+        assert stats['events'] == 2
+    finally:
+        debouncer.stop()
+
+
+def test_rearm_keeps_newer_event():
+    debouncer = Debouncer(lambda path: None, quiet_period=10, check_stable=False)
+    debouncer.touch('a')
+    debouncer.rearm('a', delay=0)
+    assert debouncer.pending_count() == 1
+    assert debouncer.stats()['requeued'] == 1
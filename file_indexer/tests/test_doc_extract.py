@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from conftest import FIXTURES
+from doc_extract import CompoundFile, clean_word_text, extract_doc_text, is_word97_document, _open_document
+
+
+def _fixture(name):
+    return os.path.join(FIXTURES, name)
+
+
+def _pieces(name):
+    with open(_fixture(name), 'rb') as f:
+        return _open_document(f)[2]
+
+
+HARMLESS_START = 'Test\n\nThis is a harmless test document.\n\nIt contains neither macros nor dde links'
+
+
+def test_utf16_piece():
+    assert [piece[3] for piece in _pieces('sample.doc')] == [False]
+    assert extract_doc_text(_fixture('sample.doc')) == 'Sample text document'
+
+
+def test_fast_save_flag_and_0table():
+    # WPS保存，置 fComplex 标志，片段表在 0Table 流中
+    assert extract_doc_text(_fixture('sample_1.doc')) == 'yet another test sample for doc type'
+
+
+def test_compressed_piece_decodes_cp1252():
+    assert [piece[3] for piece in _pieces('harmless-clean.doc')] == [True]
+    text = extract_doc_text(_fixture('harmless-clean.doc'))
+    assert text.startswith(HARMLESS_START)
+    assert 'ünicöde-ßtringß' in text
+
+
+def test_fast_saved_pieces_out_of_file_order():
+    pieces = _pieces('fast_saved.doc')
+    assert [piece[3] for piece in pieces] == [True, False, True]
+    assert pieces[1][2] > pieces[2][2]
+    assert extract_doc_text(_fixture('fast_saved.doc')) == extract_doc_text(_fixture('harmless-clean.doc'))
+
+
+def test_field_codes_are_removed_and_results_kept():
+    text = extract_doc_text(_fixture('dde-test-from-office2016.doc'))
+    assert 'DDE' not in text
+    assert not any(char in text for char in '\x13\x14\x15')
+    assert text.startswith('This is a dde test file. The dde auto field is:\n\n!Unerwartetes Ende des Ausdrucks')
+    assert 'Another field, this time with mean unicode chars (üöä)' in text
+    assert text.endswith('End-of-field')
+
+
+def test_v4_compound_file_with_4096_byte_sectors():
+    with open(_fixture('cfb_v4.doc'), 'rb') as f:
+        assert CompoundFile(f).sector_size == 4096
+    assert extract_doc_text(_fixture('cfb_v4.doc')) == extract_doc_text(_fixture('dde-test-from-office2016.doc'))
+
+
+def test_encrypted_document_is_rejected():
+    with pytest.raises(ValueError, match='加密'):
+        extract_doc_text(_fixture('encrypted.doc'))
+    assert not is_word97_document(_fixture('encrypted.doc'))
+
+
+@pytest.mark.parametrize('name', ['sample.doc', 'harmless-clean.doc', 'fast_saved.doc', 'cfb_v4.doc'])
+def test_budget_returns_prefix_of_full_text(name):
+    full = extract_doc_text(_fixture(name))
+    assert extract_doc_text(_fixture(name), max_chars=15) == full[:15]
+    assert is_word97_document(_fixture(name))
+
+
+def test_other_files_are_rejected(tmp_path):
+    assert not is_word97_document(_fixture('excel2007.xlsx'))
+    with pytest.raises(ValueError):
+        extract_doc_text(_fixture('excel2007.xlsx'))
+    truncated = tmp_path / 'truncated.doc'
+    truncated.write_bytes(open(_fixture('harmless-clean.doc'), 'rb').read()[:3000])
+    with pytest.raises(ValueError):
+        extract_doc_text(str(truncated))
+
+
+def test_clean_word_text_handles_nested_fields():
+    raw = 'A\x13 REF x \x13 PAGE \x14 3\x15\x14结果\x15B\x13 TOC \x15\rC\x07D\r\r\r'
+    assert clean_word_text(raw) == 'A结果B\nC\tD'
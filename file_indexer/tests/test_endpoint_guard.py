@@ -0,0 +1,223 @@
+import pytest
+
+import endpoint_guard
+from endpoint_guard import (AdaptiveRateLimiter, CircuitBreaker, CircuitOpenError, EndpointGuard,
+                            endpoint_for_url, CLOSED, OPEN, HALF_OPEN)
+
+
+class FakeClock:
+    """同时替代 time.time 和 time.monotonic"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(endpoint_guard, 'time', fake)
+    return fake
+
+
+def test_limiter_starts_unthrottled(clock):
+    limiter = AdaptiveRateLimiter()
+    assert all(limiter.reserve() == 0 for _ in range(100))
+    assert limiter.stats()['rate'] is None
+
+
+def test_first_overload_starts_from_measured_rate(clock):
+    limiter = AdaptiveRateLimiter(min_rate=0.5, decrease_factor=0.5)
+    for _ in range(10):
+        for _ in range(20):
+            limiter.reserve()
+        clock.advance(1.0)
+    # 实测约20/秒，降为一半
+    rate = limiter.on_overload()
+    assert 9.0 <= rate <= 11.0
+    assert limiter.stats()['decreases'] == 1
+
+
+def test_overload_halves_rate_at_most_once_per_interval(clock):
+    limiter = AdaptiveRateLimiter(initial_rate=16, decrease_factor=0.5)
+    assert limiter.on_overload() == 8
+    # 同一次拥塞引起的后续失败不再降速
+    assert limiter.on_overload() is None
+    clock.advance(endpoint_guard.DECREASE_INTERVAL_SECONDS)
+    assert limiter.on_overload() == 4
+
+
+def test_rate_never_drops_below_minimum(clock):
+    limiter = AdaptiveRateLimiter(initial_rate=1, min_rate=0.5)
+    for _ in range(5):
+        limiter.on_overload()
+        clock.advance(2)
+    assert limiter.rate == 0.5
+
+
+def test_success_increases_rate_additively_up_to_maximum(clock):
+    limiter = AdaptiveRateLimiter(initial_rate=10, max_rate=12, increase=1.0)
+    # 满负荷时每秒约 rate 次成功，每次增加 increase/rate，即每秒约增加 increase
+    for _ in range(10):
+        limiter.on_success()
+    assert 10.9 <= limiter.rate <= 11.0
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.rate == 12
+
+
+def test_reserve_spaces_requests_at_current_rate(clock):
+    limiter = AdaptiveRateLimiter(initial_rate=4)
+    # 初始只有一个令牌，之后每个请求间隔 1/rate
+    assert [limiter.reserve() for _ in range(4)] == pytest.approx([0, 0.25, 0.5, 0.75])
+    # 空闲后令牌最多攒到1秒的量（4个）
+    clock.advance(10.0)
+    assert [limiter.reserve() for _ in range(6)] == pytest.approx([0, 0, 0, 0, 0.25, 0.5])
+    assert limiter.stats()['throttled'] == 5
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=30)
+    assert breaker.acquire() is None
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    # 成功会清零连续失败计数
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    assert breaker.record_failure() is True
+    assert breaker.state == OPEN
+    assert breaker.acquire() == 1030.0
+    assert breaker.blocked_until() == 1030.0
+    assert breaker.stats()['rejected'] == 1
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=30)
+    breaker.record_failure()
+    clock.advance(30)
+    assert breaker.blocked_until() is None
+    assert breaker.acquire() is None
+    assert breaker.state == HALF_OPEN
+    # 试探请求在途时其余请求被推迟
+    assert breaker.acquire() == clock.now + endpoint_guard.PROBE_RETRY_SECONDS
+    assert breaker.record_success() is True
+    assert breaker.state == CLOSED
+    assert breaker.acquire() is None
+
+
+def test_failed_probe_reopens_with_doubled_cooldown(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=30, max_cooldown=100)
+    breaker.record_failure()
+    for expected in (60, 100, 100):
+        clock.advance(breaker.cooldown)
+        assert breaker.acquire() is None
+        assert breaker.record_failure() is True
+        assert breaker.cooldown == expected
+        assert breaker.blocked_until() == clock.now + expected
+    clock.advance(100)
+    breaker.acquire()
+    breaker.record_success()
+    # 恢复后冷却时间回到初始值
+    assert breaker.cooldown == 30
+
+
+def test_late_success_does_not_close_an_open_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=30)
+    breaker.record_failure()
+    assert breaker.record_success() is False
+    assert breaker.state == OPEN
+
+
+def test_released_probe_allows_another(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=30)
+    breaker.record_failure()
+    clock.advance(30)
+    assert breaker.acquire() is None
+    breaker.release()
+    assert breaker.acquire() is None
+
+
+def test_stuck_probe_expires_after_cooldown(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=30)
+    breaker.record_failure()
+    clock.advance(30)
+    assert breaker.acquire() is None
+    clock.advance(31)
+    assert breaker.acquire() is None
+
+
+def test_guard_raises_with_retry_time_and_classifies_status(clock):
+    guard = EndpointGuard('chat', AdaptiveRateLimiter(initial_rate=100),
+                          CircuitBreaker(failure_threshold=2, cooldown=10))
+    guard.record_status(404)
+    guard.record_status(200)
+    assert guard.breaker.state == CLOSED
+    guard.record_status(503)
+    clock.advance(2)
+    guard.record_status(429)
+    assert guard.breaker.state == OPEN
+    assert guard.limiter.rate == pytest.approx(25, abs=0.01)
+    with pytest.raises(CircuitOpenError) as error:
+        guard.acquire()
+    assert error.value.endpoint == 'chat'
+    assert error.value.retry_at == clock.now + 10
+    stats = guard.stats()
+    assert stats['state'] == OPEN
+    assert stats['rate'] == pytest.approx(25, abs=0.01)
+
+
+def test_disabled_parts_are_skipped(clock):
+    guard = EndpointGuard('dataset')
+    for _ in range(10):
+        guard.record_overload('HTTP 503')
+    assert guard.acquire() == 0
+    assert guard.blocked_until() is None
+    assert guard.stats() == {}
+
+
+@pytest.mark.parametrize('url, endpoint', [
+    ('http://dify/v1/chat-messages', 'chat'),
+    ('http://dify/v1/files/upload', 'files'),
+    ('http://dify/v1/datasets/kb/document/create-by-file', 'dataset'),
+    ('http://dify/v1/datasets/kb/documents/abc', 'dataset'),
+    ('http://dify/v1/workflows/run', 'other'),
+])
+def test_endpoint_for_url(url, endpoint):
+    assert endpoint_for_url(url) == endpoint
+
+
+def test_circuit_state_only_checks_requested_endpoints(clock, monkeypatch):
+    chat = EndpointGuard('chat', breaker=CircuitBreaker(failure_threshold=1, cooldown=30))
+    dataset = EndpointGuard('dataset', breaker=CircuitBreaker(failure_threshold=1, cooldown=30))
+    monkeypatch.setattr(endpoint_guard, '_guards', {'chat': chat, 'dataset': dataset})
+    chat.record_overload('HTTP 503')
+    assert endpoint_guard.circuit_state(('dataset',)) == (None, False)
+    assert endpoint_guard.circuit_state(('chat', 'dataset')) == (1030.0, False)
+    assert endpoint_guard.blocked_until() == 1030.0
+    # 冷却结束、试探请求发出前处于等待试探状态
+    clock.advance(30)
+    assert endpoint_guard.circuit_state(('chat', 'dataset')) == (None, True)
+
+
+def test_breaker_transitions_are_reported(clock, monkeypatch):
+    reported = []
+    monkeypatch.setattr(endpoint_guard, '_state_sink', lambda endpoint, retry_at: reported.append((endpoint, retry_at)))
+    guard = EndpointGuard('chat', breaker=CircuitBreaker(failure_threshold=2, cooldown=30))
+    guard.record_overload('HTTP 503')
+    assert reported == []
+    guard.record_overload('HTTP 503')
+    assert reported == [('chat', 1030.0)]
+    clock.advance(30)
+    guard.acquire()
+    guard.record_success()
+    assert reported == [('chat', 1030.0), ('chat', None)]
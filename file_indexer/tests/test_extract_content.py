@@ -0,0 +1,60 @@
+import pytest
+
+import file_monitor_final
+from extraction_cache import ExtractionCache
+from extraction_service import ExtractionService
+from extractor_registry import ExtractionError
+from file_monitor_final import EnhancedFileAnalyzer, _extract_text_job, extract_content
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    instance = ExtractionCache(str(tmp_path / 'state.db'))
+    monkeypatch.setattr(file_monitor_final, 'get_extraction_cache', lambda: instance)
+    monkeypatch.setattr(file_monitor_final, 'get_extraction_service', lambda: None)
+    return instance
+
+
+@pytest.fixture
+def broken_pdf(tmp_path):
+    path = tmp_path / '损坏.pdf'
+    path.write_bytes(b'%PDF-1.4\nnot a pdf')
+    return str(path)
+
+
+def test_failed_extraction_is_not_cached(cache, tmp_path, monkeypatch):
+    path = tmp_path / 'a.xyz'
+    path.write_text('正文', encoding='utf-8')
+    calls = []
+
+    def failing(file_path, max_chars=None):
+        calls.append(file_path)
+        raise ImportError('No module named xyzlib')
+
+    monkeypatch.setattr(file_monitor_final.EXTRACTORS, 'find', lambda file_path: failing)
+    assert extract_content(str(path)) == ''
+    stats = cache.stats()
+    assert stats['memory_entries'] == 0 and stats['disk_entries'] == 0
+    # 失败没有缓存，下次照常重新提取
+    assert extract_content(str(path)) == ''
+    assert len(calls) == 2
+
+
+def test_extractors_raise_instead_of_returning_error_text(broken_pdf):
+    pytest.importorskip('PyPDF2')
+    with pytest.raises(ExtractionError, match='PDF解析错误'):
+        EnhancedFileAnalyzer.extract_text_content(broken_pdf)
+
+
+def test_failure_in_extraction_process_is_not_cached(cache, broken_pdf, monkeypatch):
+    pytest.importorskip('PyPDF2')
+    service = ExtractionService(_extract_text_job, workers=1, timeout=60)
+    monkeypatch.setattr(file_monitor_final, 'get_extraction_service', lambda: service)
+    try:
+        result = service.run(broken_pdf)
+        assert not result.ok and result.error.startswith('ExtractionError: PDF解析错误')
+        assert extract_content(broken_pdf) == ''
+    finally:
+        service.stop()
+    stats = cache.stats()
+    assert stats['memory_entries'] == 0 and stats['disk_entries'] == 0
@@ -0,0 +1,121 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from benchmark import make_pdf
+from extraction_service import ExtractionService
+from file_monitor_final import _extract_text_job
+
+
+def _nested_process(value):
+    """在提取子进程中再启动一个进程"""
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(abs, value).result()
+
+
+def _fail(message):
+    raise ValueError(message)
+
+
+@pytest.fixture
+def service():
+    instance = ExtractionService(_extract_text_job, workers=1, timeout=60, max_jobs=0)
+    yield instance
+    instance.stop()
+
+
+def test_multi_page_pdf_through_service(service, tmp_path):
+    pytest.importorskip('PyPDF2')
+    path = str(tmp_path / 'long.pdf')
+    make_pdf(path, 60, lines_per_page=5)
+    result = service.run(path)
+    assert result.ok, result.error
+    assert 'Page 1 line 0' in result.text
+    assert 'Page 60 line 4' in result.text
+    result = service.run(path, max_chars=300)
+    assert result.ok and len(result.text) == 300
+
+
+def test_worker_may_start_child_processes():
+    service = ExtractionService(_nested_process, workers=1, timeout=60)
+    try:
+        result = service.run(-7)
+        assert result.ok, result.error
+        assert result.text == 7
+    finally:
+        service.stop()
+
+
+def test_errors_are_returned_not_raised():
+    service = ExtractionService(_fail, workers=1, timeout=60)
+    try:
+        result = service.run('坏文件')
+        assert not result.ok
+        assert result.error == 'ValueError: 坏文件'
+        assert service.stats()['failed'] == 1
+    finally:
+        service.stop()
+
+
+def test_timeout_replaces_worker():
+    service = ExtractionService(time.sleep, workers=1, timeout=0.2)
+    try:
+        service.start()
+        first = next(iter(service._workers)).process
+        result = service.run(10)
+        assert result.timed_out
+        assert not first.is_alive()
+        # 替换的新进程照常工作
+        assert service.run(0).ok
+        assert service.stats()['timeouts'] == 1
+    finally:
+        service.stop()
+
+
+def test_stop_reaps_every_worker():
+    service = ExtractionService(abs, workers=2, timeout=5)
+    service.start()
+    processes = [worker.process for worker in service._workers]
+    assert len(processes) == 2 and all(not p.daemon for p in processes)
+    service.stop()
+    assert not any(p.is_alive() for p in processes)
+
+
+def test_failed_respawn_keeps_pool_size(monkeypatch):
+    service = ExtractionService(time.sleep, workers=1, timeout=0.2, wait_timeout=1)
+    try:
+        service.start()
+        real_spawn = service._spawn
+
+        def failing_spawn():
+            raise OSError('Resource temporarily unavailable')
+
+        monkeypatch.setattr(service, '_spawn', failing_spawn)
+        # 超时结果照常返回，补充失败不掩盖原来的错误
+        assert service.run(10).timed_out
+        assert service.stats()['spawn_failures'] == 1
+        # 空位还在：再次启动失败时立即返回失败结果，而不是一直阻塞
+        started = time.perf_counter()
+        result = service.run(0)
+        assert not result.ok and result.error == '提取进程启动失败'
+        assert time.perf_counter() - started < 1
+        # 能启动进程后恢复
+        monkeypatch.setattr(service, '_spawn', real_spawn)
+        assert service.run(0).ok
+        assert service.stats()['idle'] == 1
+    finally:
+        service.stop()
+
+
+def test_waiting_for_a_worker_times_out():
+    service = ExtractionService(time.sleep, workers=1, timeout=5, wait_timeout=0.2)
+    try:
+        service.start()
+        worker = service._idle.get()
+        result = service.run(0)
+        assert not result.ok and '等待空闲提取进程超时' in result.error
+        service._idle.put(worker)
+        assert service.run(0).ok
+    finally:
+        service.stop()
@@ -0,0 +1,212 @@
+import os
+import time
+import shutil
+
+import pytest
+
+import file_monitor_final
+from content_hash import hash_file
+from file_monitor_final import FileMonitor, INDEX_DOCUMENT, ORIGINAL_DOCUMENT
+
+INDEX_TEXT = '文件名: 报告.txt\n文件类型: 报告\n内容总结: 季度销售数据汇总\n'
+
+
+@pytest.fixture
+def root(tmp_path):
+    path = tmp_path / 'monitor'
+    path.mkdir()
+    return path
+
+
+@pytest.fixture
+def monitor(tmp_path, root, monkeypatch):
+    monkeypatch.setattr(file_monitor_final.config, 'STATE_DB_PATH', str(tmp_path / 'state.db'))
+    monkeypatch.setattr(file_monitor_final.config, 'MONITOR_DIR', str(root))
+    monkeypatch.setattr(file_monitor_final.config, 'PARENT_CHILD_KB_ENABLED', False)
+    instance = FileMonitor()
+    yield instance
+    instance.stop_workers(wait=True)
+
+
+def _processed(monitor, path, index_content=INDEX_TEXT):
+    """模拟一个已完成分析和上传的文件"""
+    content_hash = hash_file(path)
+    monitor.content_store.link_path(path, content_hash)
+    if index_content:
+        monitor.content_store.save_index(content_hash, path, index_content)
+    for kind, dataset_id in ((INDEX_DOCUMENT, file_monitor_final.config.TXT_KNOWLEDGE_BASE_ID),
+                             (ORIGINAL_DOCUMENT, file_monitor_final.config.ACTUAL_ORIGINAL_KB_ID)):
+        monitor.documents.record(path, kind, dataset_id, f'doc-{kind}', content_hash)
+        monitor.content_store.mark_uploaded(content_hash, path, **monitor._kind_flags(kind))
+    return content_hash
+
+
+def _no_uploads(monkeypatch, monitor):
+    def fail(*args, **kwargs):
+        raise AssertionError('内容相同的副本不应再上传')
+    monkeypatch.setattr(monitor.uploader, 'upload_file', fail)
+    monkeypatch.setattr(monitor.uploader, 'upload_text', fail)
+    monkeypatch.setattr(monitor.index_generator, 'generate_index_content', fail)
+
+
+def test_duplicate_copy_gets_an_index_record(monitor, root, monkeypatch):
+    original = str(root / '报告.txt')
+    with open(original, 'w', encoding='utf-8') as f:
+        f.write('季度销售数据')
+    content_hash = _processed(monitor, original)
+    copy = str(root / '报告 - 副本.txt')
+    shutil.copyfile(original, copy)
+    _no_uploads(monkeypatch, monitor)
+
+    assert monitor.process_file(copy) is True
+    record = monitor.index_generator.index_store.get_by_path(copy)
+    assert record['index_content'] == INDEX_TEXT.replace('报告.txt', '报告 - 副本.txt')
+    assert record['content_hash'] == content_hash
+    assert record['name'] == os.path.basename(copy)
+    assert record['summary'] == '季度销售数据汇总'
+
+
+def test_duplicate_falls_back_to_index_record_of_another_copy(monitor, root, monkeypatch):
+    original = str(root / 'a.txt')
+    with open(original, 'w', encoding='utf-8') as f:
+        f.write('相同内容')
+    content_hash = _processed(monitor, original, index_content=None)
+    monitor.index_generator.index_store.put(original, INDEX_TEXT, content_hash=content_hash)
+    copy = str(root / 'b.txt')
+    shutil.copyfile(original, copy)
+    _no_uploads(monkeypatch, monitor)
+
+    assert monitor.process_file(copy) is True
+    assert monitor.index_generator.index_store.get_by_path(copy)['index_content'] == \
+        INDEX_TEXT.replace('报告.txt', 'b.txt')
+
+
+def _capture_uploads(monkeypatch, monitor):
+    """记录按文档ID发出的更新请求：[(类别, 文档名称或路径, 文本, 文档ID)]"""
+    calls = []
+
+    def upload_text(name, text, knowledge_base_id=None, document_id=None):
+        calls.append((INDEX_DOCUMENT, name, text, document_id))
+        return document_id or 'new-index'
+
+    def upload_file(file_path, knowledge_base_id=None, use_parent_child_mode=False, content_hash=None,
+                    document_id=None):
+        calls.append((ORIGINAL_DOCUMENT, file_path, None, document_id))
+        return document_id or 'new-original'
+
+    def analyze(*args, **kwargs):
+        raise AssertionError('内容未变，不应重新分析')
+
+    monkeypatch.setattr(monitor.uploader, 'upload_text', upload_text)
+    monkeypatch.setattr(monitor.uploader, 'upload_file', upload_file)
+    monkeypatch.setattr(monitor.index_generator, 'generate_index_content', analyze)
+    monkeypatch.setattr(monitor, 'submit', lambda path: True)
+    return calls
+
+
+def test_renamed_file_updates_document_names_by_id(monitor, root, monkeypatch):
+    src = str(root / '报告.txt')
+    with open(src, 'w', encoding='utf-8') as f:
+        f.write('季度销售数据')
+    _processed(monitor, src, index_content=f'文件名: 报告.txt\n文件路径: {src}\n内容总结: 季度销售数据汇总\n')
+    calls = _capture_uploads(monkeypatch, monitor)
+    dest = str(root / '2024年报告.txt')
+    os.rename(src, dest)
+    monitor.move(src, dest)
+
+    assert monitor.process_file(dest) is True
+    assert sorted(calls, key=lambda call: call[0]) == [
+        (INDEX_DOCUMENT, '2024年报告_chatflow_index.txt',
+         f'文件名: 2024年报告.txt\n文件路径: {dest}\n内容总结: 季度销售数据汇总\n', 'doc-index'),
+        (ORIGINAL_DOCUMENT, dest, None, 'doc-original'),
+    ]
+    assert all(record['source_path'] == dest for record in monitor.documents.for_path(dest))
+
+    # 名称已更新，再次处理不再发请求
+    calls.clear()
+    assert monitor.process_file(dest) is True
+    assert calls == []
+
+
+def test_moved_file_keeps_original_document_name(monitor, root, monkeypatch):
+    src = str(root / '报告.txt')
+    with open(src, 'w', encoding='utf-8') as f:
+        f.write('季度销售数据')
+    _processed(monitor, src)
+    calls = _capture_uploads(monkeypatch, monitor)
+    (root / '归档').mkdir()
+    dest = str(root / '归档' / '报告.txt')
+    os.rename(src, dest)
+    monitor.move(src, dest)
+
+    assert monitor.process_file(dest) is True
+    # 文件名未变，只有正文含路径的索引文档需要更新
+    assert [(kind, document_id) for kind, _, _, document_id in calls] == [(INDEX_DOCUMENT, 'doc-index')]
+
+
+def test_text_upload_uses_knowledge_base_defaults(monitor, monkeypatch):
+    monkeypatch.setattr(file_monitor_final.config, 'INDEX_INDEXING_TECHNIQUE', '')
+    monkeypatch.setattr(file_monitor_final.config, 'INDEX_PROCESS_MODE', '')
+    request = monitor.uploader.build_text_request('a_chatflow_index.txt', INDEX_TEXT, 'kb')
+    assert request['url'].endswith('/v1/datasets/kb/document/create-by-text')
+    assert request['json'] == {'name': 'a_chatflow_index.txt', 'text': INDEX_TEXT}
+
+    monkeypatch.setattr(file_monitor_final.config, 'INDEX_INDEXING_TECHNIQUE', 'economy')
+    monkeypatch.setattr(file_monitor_final.config, 'INDEX_PROCESS_MODE', 'automatic')
+    request = monitor.uploader.build_text_request('a_chatflow_index.txt', INDEX_TEXT, 'kb')
+    assert request['json']['indexing_technique'] == 'economy'
+    assert request['json']['process_rule'] == {'mode': 'automatic'}
+
+
+def _enqueue(monitor, root, names, create=True):
+    paths = []
+    for name in names:
+        path = str(root / name)
+        if create:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(name)
+        monitor.job_store.enqueue(path)
+        paths.append(path)
+    return paths
+
+
+def _queued(monitor):
+    """工作池未启动，已提交的任务留在队列中"""
+    return sorted(os.path.basename(job['path']) for job in list(monitor.pool._queue.queue))
+
+
+def test_open_chat_circuit_defers_only_jobs_that_need_it(monitor, root):
+    _enqueue(monitor, root, ['a.txt', 'b.txt'])
+    _enqueue(monitor, root, ['已删除.txt'], create=False)
+    # 工作进程的熔断器记录在状态库中
+    monitor.circuits.record('chat', time.time() + 60)
+    monitor.pump()
+    assert _queued(monitor) == ['已删除.txt']
+    assert monitor.job_store.get(str(root / 'a.txt'))['next_attempt_at'] > time.time() + 50
+
+
+def test_open_dataset_circuit_stops_claiming(monitor, root):
+    _enqueue(monitor, root, ['a.txt'])
+    _enqueue(monitor, root, ['已删除.txt'], create=False)
+    monitor.circuits.record('dataset', time.time() + 60)
+    monitor.pump()
+    assert _queued(monitor) == []
+    assert monitor.job_store.counts().get('pending') == 2
+
+
+def test_half_open_circuit_lets_one_probe_job_through(monitor, root):
+    paths = _enqueue(monitor, root, ['a.txt', 'b.txt', 'c.txt'])
+    monitor.circuits.record('chat', time.time() - 1)
+    monitor.pump()
+    assert len(_queued(monitor)) == 1
+    # 试探任务结束前不再领取，其余任务也不被挂起
+    monitor.pump()
+    assert len(_queued(monitor)) == 1
+    assert monitor.job_store.counts().get('pending') == 2
+
+    probe = monitor.pool._queue.get_nowait()
+    monitor.job_store.complete(probe['id'])
+    monitor.pump()
+    assert monitor.circuits.state(('chat',)) == (None, False)
+    assert sorted(job['path'] for job in list(monitor.pool._queue.queue)) == \
+        sorted(path for path in paths if path != probe['path'])
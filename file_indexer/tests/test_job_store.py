@@ -0,0 +1,139 @@
+import time
+
+import pytest
+
+from job_store import JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / 'state.db'), max_attempts=3, backoff_base=10.0, backoff_max=25.0)
+
+
+def _state(store, path):
+    return store.get(path)['state']
+
+
+def test_claim_marks_jobs_extracting_and_respects_limit(store):
+    for i in range(5):
+        store.enqueue(f'/data/{i}.txt', size=i, mtime_ns=i)
+    claimed = store.claim(3)
+    assert len(claimed) == 3
+    assert all(_state(store, job['path']) == 'extracting' for job in claimed)
+    # 已领取的任务不会被再次领取
+    rest = store.claim(10)
+    assert {job['path'] for job in rest} == {f'/data/{i}.txt' for i in range(5)} - {job['path'] for job in claimed}
+    assert store.claim(10) == []
+    assert store.claim(0) == []
+
+
+def test_enqueue_keeps_one_job_per_path(store):
+    store.enqueue('/data/a.txt', size=1, mtime_ns=1)
+    store.enqueue('/data/a.txt', size=2, mtime_ns=2)
+    assert store.counts() == {'pending': 1}
+    assert store.get('/data/a.txt')['size'] == 2
+
+
+def test_done_job_is_not_requeued_unless_file_changed(store):
+    store.enqueue('/data/a.txt', size=1, mtime_ns=1)
+    job = store.claim(1)[0]
+    store.complete(job['id'])
+    store.enqueue('/data/a.txt', size=1, mtime_ns=1)
+    assert _state(store, '/data/a.txt') == 'done'
+    store.enqueue('/data/a.txt', size=1, mtime_ns=2)
+    assert _state(store, '/data/a.txt') == 'pending'
+
+
+def test_fail_backs_off_exponentially_then_gives_up(store):
+    store.enqueue('/data/a.txt')
+    job = store.claim(1)[0]
+
+    before = time.time()
+    assert store.fail(job['id'], 'timeout') == 'pending'
+    row = store.get('/data/a.txt')
+    assert row['attempts'] == 1
+    assert row['error'] == 'timeout'
+    # 第1次失败：退避 base * 2^0，带 0.5~1.0 的抖动
+    assert before + 5.0 <= row['next_attempt_at'] <= time.time() + 10.0
+    assert store.claim(1) == []
+
+    store.db.execute("UPDATE jobs SET next_attempt_at = 0")
+    job = store.claim(1)[0]
+    before = time.time()
+    assert store.fail(job['id'], 'timeout') == 'pending'
+    row = store.get('/data/a.txt')
+    assert row['attempts'] == 2
+    assert before + 10.0 <= row['next_attempt_at'] <= time.time() + 20.0
+
+    store.db.execute("UPDATE jobs SET next_attempt_at = 0")
+    job = store.claim(1)[0]
+    assert store.fail(job['id'], 'timeout') == 'failed'
+    assert store.get('/data/a.txt')['attempts'] == 3
+    assert store.claim(1) == []
+
+
+def test_backoff_is_capped(tmp_path):
+    store = JobStore(str(tmp_path / 'state.db'), max_attempts=10, backoff_base=10.0, backoff_max=25.0)
+    store.enqueue('/data/a.txt')
+    store.db.execute("UPDATE jobs SET attempts = 6")
+    job = store.claim(1)[0]
+    store.fail(job['id'], 'x')
+    assert store.get('/data/a.txt')['next_attempt_at'] <= time.time() + 25.0
+
+
+def test_fail_without_retry_is_final(store):
+    store.enqueue('/data/a.txt')
+    job = store.claim(1)[0]
+    assert store.fail(job['id'], 'missing', retry=False) == 'failed'
+
+
+def test_change_during_processing_reruns_after_completion(store):
+    store.enqueue('/data/a.txt', size=1, mtime_ns=1)
+    job = store.claim(1)[0]
+    # 处理中文件又有变化：保持处理状态，只标记 rerun
+    store.enqueue('/data/a.txt', size=2, mtime_ns=2)
+    row = store.get('/data/a.txt')
+    assert row['state'] == 'extracting'
+    assert row['rerun'] == 1
+    store.complete(job['id'])
+    row = store.get('/data/a.txt')
+    assert row['state'] == 'pending'
+    assert row['rerun'] == 0
+    assert [j['path'] for j in store.claim(1)] == ['/data/a.txt']
+
+
+def test_failure_with_pending_rerun_retries_immediately(store):
+    store.enqueue('/data/a.txt')
+    job = store.claim(1)[0]
+    store.enqueue('/data/a.txt', size=5, mtime_ns=5)
+    assert store.fail(job['id'], 'stale version') == 'pending'
+    row = store.get('/data/a.txt')
+    assert row['attempts'] == 0
+    assert row['next_attempt_at'] <= time.time()
+
+
+def test_recover_requeues_interrupted_jobs(store):
+    for i in range(3):
+        store.enqueue(f'/data/{i}.txt')
+    jobs = store.claim(3)
+    store.set_state(jobs[1]['id'], 'analyzing')
+    store.set_state(jobs[2]['id'], 'uploading')
+    # 模拟重启
+    assert store.recover() == 3
+    assert store.counts() == {'pending': 3}
+    assert len(store.claim(10)) == 3
+
+
+def test_release_returns_job_without_counting_a_failure(store):
+    store.enqueue('/data/a.txt')
+    job = store.claim(1)[0]
+    store.release(job['id'])
+    row = store.get('/data/a.txt')
+    assert row['state'] == 'pending'
+    assert row['attempts'] == 0
+
+
+def test_queue_survives_reopen(tmp_path):
+    path = str(tmp_path / 'state.db')
+    JobStore(path).enqueue('/data/a.txt')
+    assert JobStore(path).counts() == {'pending': 1}
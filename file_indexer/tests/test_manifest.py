@@ -0,0 +1,157 @@
+import os
+import time
+
+import pytest
+
+import manifest as manifest_module
+from manifest import FileManifest, RACY_WINDOW_NS
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    return FileManifest(str(tmp_path / 'state.db'))
+
+
+@pytest.fixture
+def root(tmp_path):
+    path = tmp_path / 'monitor'
+    path.mkdir()
+    return str(path)
+
+
+def _write(path, data, mtime_ns=None):
+    with open(path, 'wb') as f:
+        f.write(data)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def _record_long_ago(manifest, path):
+    """按当前指纹记录，记录时刻远晚于修改时间（不在racy窗口内）"""
+    size, mtime_ns, content_hash = FileManifest.fingerprint(path)
+    manifest.record(path, size, mtime_ns, content_hash)
+    manifest.db.execute("UPDATE manifest SET recorded_ns = ? WHERE path = ?",
+                        (mtime_ns + 10 * RACY_WINDOW_NS, path))
+
+
+def _count_hashes(monkeypatch):
+    calls = []
+    real = manifest_module.hash_file
+
+    def counting(path):
+        calls.append(path)
+        return real(path)
+
+    monkeypatch.setattr(manifest_module, 'hash_file', counting)
+    return calls
+
+
+def test_new_files_are_reported_as_changed(manifest, root):
+    path = os.path.join(root, 'a.txt')
+    _write(path, b'hello')
+    changed, deleted, stats = manifest.reconcile(root)
+    assert [item[0] for item in changed] == [path]
+    assert deleted == []
+    assert stats['scanned'] == 1
+
+
+def test_unchanged_files_are_trusted_without_hashing(manifest, root, monkeypatch):
+    path = os.path.join(root, 'a.txt')
+    _write(path, b'hello', mtime_ns=1_600_000_000 * 10**9)
+    _record_long_ago(manifest, path)
+    hashes = _count_hashes(monkeypatch)
+    changed, deleted, stats = manifest.reconcile(root)
+    assert changed == [] and deleted == []
+    assert stats['hashed'] == 0
+    assert hashes == []
+
+
+def test_size_change_is_detected_from_stat(manifest, root, monkeypatch):
+    path = os.path.join(root, 'a.txt')
+    _write(path, b'hello', mtime_ns=1_600_000_000 * 10**9)
+    _record_long_ago(manifest, path)
+    _write(path, b'hello world', mtime_ns=1_600_000_000 * 10**9)
+    hashes = _count_hashes(monkeypatch)
+    changed, _, stats = manifest.reconcile(root)
+    assert [item[0] for item in changed] == [path]
+    assert hashes == []
+
+
+def test_touched_file_with_same_content_is_not_reprocessed(manifest, root):
+    path = os.path.join(root, 'a.txt')
+    _write(path, b'hello', mtime_ns=1_600_000_000 * 10**9)
+    _record_long_ago(manifest, path)
+    _write(path, b'hello', mtime_ns=1_700_000_000 * 10**9)
+    changed, _, stats = manifest.reconcile(root)
+    assert changed == []
+    assert stats['hashed'] == 1
+    # 清单已刷新为新的修改时间，下次不必再算哈希
+    changed, _, stats = manifest.reconcile(root)
+    assert changed == [] and stats['hashed'] == 0
+
+
+def test_rewrite_inside_racy_window_is_caught_by_hash(manifest, root):
+    """记录时刻与修改时间落在同一时间戳精度内：同大小、同修改时间的改写也要发现"""
+    path = os.path.join(root, 'a.txt')
+    mtime_ns = time.time_ns()
+    _write(path, b'version-1', mtime_ns=mtime_ns)
+    size, recorded_mtime, content_hash = FileManifest.fingerprint(path)
+    manifest.record(path, size, recorded_mtime, content_hash)
+    # 粗粒度时间戳的文件系统上，紧接着的改写可能得到相同的修改时间
+    _write(path, b'version-2', mtime_ns=mtime_ns)
+    changed, _, stats = manifest.reconcile(root)
+    assert [item[0] for item in changed] == [path]
+    assert stats['hashed'] == 1
+
+
+def test_racy_entry_with_same_content_is_refreshed(manifest, root):
+    path = os.path.join(root, 'a.txt')
+    mtime_ns = time.time_ns()
+    _write(path, b'same', mtime_ns=mtime_ns)
+    manifest.record(path, *FileManifest.fingerprint(path))
+    changed, _, stats = manifest.reconcile(root)
+    assert changed == [] and stats['hashed'] == 1
+
+
+def test_deleted_files_are_reported_and_forgotten(manifest, root):
+    path = os.path.join(root, 'a.txt')
+    _write(path, b'hello')
+    _record_long_ago(manifest, path)
+    os.remove(path)
+    _, deleted, _ = manifest.reconcile(root)
+    assert deleted == [path]
+    assert manifest.load() == {}
+
+
+def test_entries_outside_root_are_left_alone(manifest, root, tmp_path):
+    other = str(tmp_path / 'elsewhere.txt')
+    manifest.record(other, 1, 1, 'h')
+    _, deleted, _ = manifest.reconcile(root)
+    assert deleted == []
+    assert other in manifest.load()
+
+
+def test_filters_skip_rejected_files_and_directories(manifest, root):
+    os.makedirs(os.path.join(root, 'node_modules', 'pkg'))
+    os.makedirs(os.path.join(root, 'docs'))
+    _write(os.path.join(root, 'node_modules', 'pkg', 'index.js'), b'x')
+    _write(os.path.join(root, 'docs', 'a.txt'), b'x')
+    _write(os.path.join(root, 'docs', 'a.tmp'), b'x')
+    walked = []
+
+    def accept_dir(path):
+        walked.append(path)
+        return os.path.basename(path) != 'node_modules'
+
+    changed, _, stats = manifest.reconcile(root, accept=lambda p: not p.endswith('.tmp'), accept_dir=accept_dir)
+    assert [item[0] for item in changed] == [os.path.join(root, 'docs', 'a.txt')]
+    # 被排除的目录本身不会进入
+    assert os.path.join(root, 'node_modules', 'pkg') not in walked
+
+
+def test_non_recursive_scan_stays_at_top_level(manifest, root):
+    os.makedirs(os.path.join(root, 'sub'))
+    _write(os.path.join(root, 'top.txt'), b'x')
+    _write(os.path.join(root, 'sub', 'deep.txt'), b'x')
+    changed, _, _ = manifest.reconcile(root, recursive=False)
+    assert [item[0] for item in changed] == [os.path.join(root, 'top.txt')]
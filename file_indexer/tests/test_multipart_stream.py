@@ -0,0 +1,152 @@
+import io
+import os
+import asyncio
+import threading
+from email.parser import BytesParser
+from email.policy import default as default_policy
+
+import pytest
+
+from http_client import _rewind
+import multipart_stream
+from multipart_stream import MultipartEncoder
+
+
+def _parse(encoder, body):
+    message = BytesParser(policy=default_policy).parsebytes(
+        f'Content-Type: {encoder.content_type}\r\n\r\n'.encode('ascii') + body)
+    return {part.get_param('name', header='content-disposition'): part for part in message.iter_parts()}
+
+
+@pytest.fixture
+def sample(tmp_path):
+    path = tmp_path / '报告.pdf'
+    path.write_bytes(os.urandom(200 * 1024 + 17))
+    return str(path)
+
+
+def _encoder(sample, **kwargs):
+    return MultipartEncoder(
+        fields={'data': '{"indexing_technique": "economy"}'},
+        files={'file': ('报告.pdf', sample, 'application/pdf')},
+        **kwargs
+    )
+
+
+def test_content_length_matches_body(sample):
+    encoder = _encoder(sample, chunk_size=4096)
+    body = encoder.read()
+    assert len(body) == len(encoder) == encoder.length
+    assert encoder.headers()['Content-Length'] == str(len(body))
+    assert encoder.headers()['Content-Type'] == f'multipart/form-data; boundary={encoder.boundary}'
+    assert encoder.read() == b''
+
+
+def test_body_is_valid_multipart(sample):
+    encoder = _encoder(sample)
+    parts = _parse(encoder, encoder.read())
+    assert parts['data'].get_content() == '{"indexing_technique": "economy"}'
+    assert parts['file'].get_filename() == '报告.pdf'
+    assert parts['file'].get_content_type() == 'application/pdf'
+    assert parts['file'].get_payload(decode=True) == open(sample, 'rb').read()
+
+
+def test_chunked_reads_and_rewind_produce_identical_bodies(sample):
+    encoder = _encoder(sample, chunk_size=1000)
+    whole = encoder.read()
+    encoder.seek(0)
+    pieces = []
+    while True:
+        piece = encoder.read(777)
+        if not piece:
+            break
+        assert len(piece) <= 777
+        pieces.append(piece)
+    assert b''.join(pieces) == whole
+    # 重试前 http_client 把请求体移回开头
+    _rewind({'data': encoder})
+    assert encoder.tell() == 0
+    assert encoder.read() == whole
+
+
+def test_seek_and_tell(sample):
+    encoder = _encoder(sample)
+    whole = encoder.read()
+    assert encoder.seek(-10, os.SEEK_END) == len(whole) - 10
+    assert encoder.read() == whole[-10:]
+    encoder.seek(100)
+    encoder.seek(5, os.SEEK_CUR)
+    assert encoder.tell() == 105
+    assert encoder.read(50) == whole[105:155]
+    assert encoder.seek(10 ** 9) == len(whole)
+
+
+def test_bytes_and_file_object_sources():
+    handle = io.BytesIO(b'skipped-header|payload')
+    handle.seek(len(b'skipped-header|'))
+    encoder = MultipartEncoder(files={
+        'file': ('a.txt', b'inline bytes', 'text/plain'),
+        'other': ('b.bin', handle, 'application/octet-stream'),
+    })
+    parts = _parse(encoder, encoder.read())
+    assert parts['file'].get_payload(decode=True) == b'inline bytes'
+    # 文件对象从当前位置开始
+    assert parts['other'].get_payload(decode=True) == b'payload'
+
+
+def test_file_is_read_lazily_and_closed(sample):
+    encoder = _encoder(sample)
+    part = encoder._parts[2]
+    assert part.file is None
+    encoder.read(len(encoder._parts[0]) + len(encoder._parts[1]) + 10)
+    assert part.file is not None
+    encoder.close()
+    assert part.file is None
+
+
+def test_truncated_file_aborts_upload(sample):
+    encoder = _encoder(sample)
+    with open(sample, 'r+b') as f:
+        f.truncate(1000)
+    with pytest.raises(IOError):
+        encoder.read()
+
+
+def test_async_stream_can_be_replayed(sample):
+    encoder = _encoder(sample, chunk_size=8192)
+    expected = encoder.read()
+
+    async def collect():
+        return b''.join([chunk async for chunk in encoder.async_stream()])
+
+    assert asyncio.run(collect()) == expected
+    assert asyncio.run(collect()) == expected
+
+
+def test_async_stream_reads_files_off_the_event_loop(sample, monkeypatch):
+    encoder = _encoder(sample, chunk_size=8192)
+    expected = encoder.read()
+    threads = set()
+    real = multipart_stream._FilePart.read
+
+    def recording(self, offset, length):
+        threads.add(threading.get_ident())
+        return real(self, offset, length)
+
+    monkeypatch.setattr(multipart_stream._FilePart, 'read', recording)
+
+    async def collect():
+        loop_thread = threading.get_ident()
+        body = b''.join([chunk async for chunk in encoder.async_stream()])
+        return loop_thread, body
+
+    loop_thread, body = asyncio.run(collect())
+    assert body == expected
+    assert threads and loop_thread not in threads
+
+
+def test_quotes_in_names_are_escaped():
+    encoder = MultipartEncoder(fields={'a"b': 'v'}, files={'file': ('x"\r\ny.txt', b'1', 'text/plain')})
+    body = encoder.read()
+    assert b'name="a\\"b"' in body
+    assert b'filename="x\\"  y.txt"' in body
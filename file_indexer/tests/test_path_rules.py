@@ -0,0 +1,158 @@
+import os
+
+import pytest
+
+from path_rules import PathRules, TreeWatcher, split_patterns
+
+
+@pytest.fixture
+def root(tmp_path):
+    return str(tmp_path)
+
+
+def _p(root, rel):
+    return os.path.join(root, *rel.split('/'))
+
+
+def test_default_excludes_match_at_any_depth(root):
+    rules = PathRules(root)
+    assert not rules.accept_dir(_p(root, 'node_modules'))
+    assert not rules.accept_dir(_p(root, 'proj/node_modules'))
+    assert not rules.accept_file(_p(root, 'proj/node_modules/pkg/index.js'))
+    assert not rules.accept_file(_p(root, '.git/config'))
+    assert rules.accept_dir(_p(root, 'proj'))
+    assert rules.accept_file(_p(root, 'proj/readme.md'))
+
+
+def test_unanchored_glob_matches_file_names_anywhere(root):
+    rules = PathRules(root, exclude=['*.tmp', '~$*'])
+    assert not rules.accept_file(_p(root, 'a.tmp'))
+    assert not rules.accept_file(_p(root, 'x/y/z/a.tmp'))
+    assert not rules.accept_file(_p(root, 'docs/~$report.docx'))
+    assert rules.accept_file(_p(root, 'docs/report.docx'))
+    assert rules.accept_file(_p(root, 'a.tmp.txt'))
+
+
+def test_anchored_rule_only_matches_from_root(root):
+    rules = PathRules(root, exclude=['projects/archive'])
+    assert not rules.accept_dir(_p(root, 'projects/archive'))
+    assert not rules.accept_file(_p(root, 'projects/archive/old.pdf'))
+    assert rules.accept_file(_p(root, 'other/projects/archive/old.pdf'))
+    assert rules.accept_file(_p(root, 'projects/archive2/new.pdf'))
+
+
+def test_double_star_spans_directories(root):
+    rules = PathRules(root, exclude=['docs/**/draft*'])
+    assert not rules.accept_file(_p(root, 'docs/draft1.md'))
+    assert not rules.accept_file(_p(root, 'docs/a/b/draft-v2.md'))
+    assert rules.accept_file(_p(root, 'docs/a/final.md'))
+    assert rules.accept_file(_p(root, 'notes/draft.md'))
+
+
+def test_question_mark_matches_one_character(root):
+    rules = PathRules(root, exclude=['log?.txt'])
+    assert not rules.accept_file(_p(root, 'log1.txt'))
+    assert rules.accept_file(_p(root, 'log10.txt'))
+    assert rules.accept_file(_p(root, 'log/.txt'))
+
+
+def test_rules_are_case_insensitive_and_escape_regex_characters(root):
+    rules = PathRules(root, exclude=['Build (old)', '*.BAK'])
+    assert not rules.accept_dir(_p(root, 'build (OLD)'))
+    assert not rules.accept_file(_p(root, 'x.bak'))
+    assert rules.accept_dir(_p(root, 'build old'))
+
+
+def test_include_restricts_files_but_not_directories(root):
+    rules = PathRules(root, include=['*.pdf', '*.docx'])
+    assert rules.accept_file(_p(root, 'a/b.pdf'))
+    assert rules.accept_file(_p(root, 'B.DOCX'))
+    assert not rules.accept_file(_p(root, 'a/b.txt'))
+    assert rules.accept_dir(_p(root, 'a'))
+
+
+def test_exclude_wins_over_include(root):
+    rules = PathRules(root, include=['*.pdf'], exclude=['private'])
+    assert not rules.accept_file(_p(root, 'private/a.pdf'))
+
+
+def test_paths_outside_root(root, tmp_path):
+    rules = PathRules(_p(root, 'monitor'))
+    assert not rules.accept_file(str(tmp_path / 'other' / 'a.txt'))
+    # 根目录本身和根目录以外的目录不做过滤
+    assert rules.accept_dir(_p(root, 'monitor'))
+    assert not rules.accept_file(_p(root, 'monitor'))
+
+
+def test_default_excludes_can_be_disabled(root):
+    rules = PathRules(root, default_excludes=())
+    assert rules.accept_dir(_p(root, 'node_modules'))
+
+
+def test_is_top_level(root):
+    rules = PathRules(root)
+    assert rules.is_top_level(_p(root, 'a'))
+    assert not rules.is_top_level(_p(root, 'a/b'))
+    assert not rules.is_top_level(root)
+
+
+def test_split_patterns():
+    assert split_patterns(' *.tmp, node_modules ,,docs/** ') == ['*.tmp', 'node_modules', 'docs/**']
+    assert split_patterns('') == []
+    assert split_patterns(None) == []
+
+
+class _FakeObserver:
+    def __init__(self):
+        self.watches = []
+
+    def schedule(self, handler, path, recursive=False):
+        self.watches.append((path, recursive))
+
+
+def _tree(root, *dirs):
+    for rel in dirs:
+        os.makedirs(_p(root, rel), exist_ok=True)
+
+
+def test_nested_excludes_are_never_watched_recursively(root):
+    _tree(root, 'docs/a/b', 'proj/src/lib', 'proj/node_modules/pkg', 'proj/app/.git/objects', 'proj/app/main')
+    observer = _FakeObserver()
+    watches = TreeWatcher(observer, None, PathRules(root)).schedule(root)
+    assert observer.watches == watches
+    assert sorted(watches) == sorted([
+        (root, False),
+        (_p(root, 'docs'), True),
+        (_p(root, 'proj'), False),
+        (_p(root, 'proj/src'), True),
+        (_p(root, 'proj/app'), False),
+        (_p(root, 'proj/app/main'), True),
+    ])
+
+
+def test_tree_without_excludes_is_one_recursive_watch(root):
+    _tree(root, 'a/b/c', 'd')
+    observer = _FakeObserver()
+    assert TreeWatcher(observer, None, PathRules(root)).schedule(root) == [(root, True)]
+
+
+def test_non_recursive_mode_watches_root_only(root):
+    _tree(root, 'a', 'node_modules')
+    observer = _FakeObserver()
+    assert TreeWatcher(observer, None, PathRules(root), recursive=False).schedule(root) == [(root, False)]
+
+
+def test_new_directories_under_flat_watches_are_scheduled(root):
+    _tree(root, 'proj/node_modules', 'docs')
+    observer = _FakeObserver()
+    tree = TreeWatcher(observer, None, PathRules(root))
+    tree.schedule(root)
+    _tree(root, 'proj/new/node_modules', 'proj/other', 'docs/inner')
+    # 父目录非递归监控：新目录按同样的规则规划
+    assert sorted(tree.add_directory(_p(root, 'proj/new'))) == [
+        (_p(root, 'proj/new'), False)]
+    assert tree.add_directory(_p(root, 'proj/other')) == [(_p(root, 'proj/other'), True)]
+    # 已在递归监控之下或被排除的目录不再注册
+    assert tree.add_directory(_p(root, 'docs/inner')) == []
+    assert tree.add_directory(_p(root, 'proj/node_modules')) == []
+    assert tree.add_directory(_p(root, 'proj/new')) == []
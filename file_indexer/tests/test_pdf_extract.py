@@ -0,0 +1,41 @@
+import pytest
+
+import pdf_extract
+from benchmark import make_pdf
+from pdf_extract import extract_pdf_text, iter_pdf_pages
+
+pytest.importorskip('PyPDF2')
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = str(tmp_path / 'sample.pdf')
+    make_pdf(path, 30, lines_per_page=5)
+    return path
+
+
+def test_full_text_keeps_page_order(pdf):
+    text = extract_pdf_text(pdf)
+    assert text.index('Page 1 line 0') < text.index('Page 2 line 0') < text.index('Page 30 line 4')
+
+
+def test_budget_stops_reading_later_pages(pdf, monkeypatch):
+    parsed = []
+    real = pdf_extract.iter_pdf_pages
+
+    def counting(*args, **kwargs):
+        for page_no, text in real(*args, **kwargs):
+            parsed.append(page_no)
+            yield page_no, text
+
+    monkeypatch.setattr(pdf_extract, 'iter_pdf_pages', counting)
+    text = extract_pdf_text(pdf, max_chars=500)
+    assert len(text) == 500
+    assert text.startswith('Page 1 line 0')
+    assert len(parsed) < 5
+
+
+def test_page_range(pdf):
+    pages = list(iter_pdf_pages(pdf, 28, 100))
+    assert [page_no for page_no, _ in pages] == [28, 29]
+    assert 'Page 29 line 0' in pages[0][1]
@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+import table_extract
+from conftest import FIXTURES
+from table_extract import extract_xlsx_text, extract_csv_text
+
+PHONETIC = os.path.join(FIXTURES, 'phonetic.xlsx')
+MULTI_SHEET = os.path.join(FIXTURES, 'multi_sheet.xlsx')
+EXCEL_2007 = os.path.join(FIXTURES, 'excel2007.xlsx')
+
+
+def _lines(text):
+    return text.split('\n')
+
+
+def test_shared_strings_drop_phonetic_runs():
+    text = extract_xlsx_text(PHONETIC)
+    # 注音不计入单元格内容，富文本各段拼接
+    assert _lines(text)[1] == '東京 | 売上 合計 | 大阪'
+    assert not any(kana in text for kana in ('トウキョウ', 'ウリアゲ', 'オオサカ'))
+
+
+def test_inline_strings_and_cell_types():
+    lines = _lines(extract_xlsx_text(PHONETIC))
+    assert lines[2] == 'インライン文字 | 2023-03-15 | 2023-03-15 12:00:00 | 42 | TRUE | 3.5'
+    assert lines[3] == '2024-01-01 | 単独'
+    # 空列保留位置，公式字符串结果按原样输出
+    assert lines[4] == '1 |  | 式の結果'
+
+
+def test_sheets_follow_workbook_order_not_file_names():
+    text = extract_xlsx_text(PHONETIC)
+    headers = [line for line in _lines(text) if line.startswith('工作表: ')]
+    assert headers == ['工作表: 売上', '工作表: Summary', '工作表: 空']
+    assert 'Name | 東京' in text
+
+
+def test_multi_sheet_workbook_with_dates():
+    text = extract_xlsx_text(MULTI_SHEET, max_rows=3)
+    assert _lines(text) == [
+        '工作表: 汇总', '月份 | 合计', '1月 | 40628', '2月 | 40656',
+        '工作表: 1月', '日期 | 时间 | 项目 | 金额',
+        '2024-01-01 | 2024-01-01 09:30:00 | 1月第1笔 | 101',
+        '2024-01-02 | 2024-01-02 09:30:00 | 1月第2笔 | 201',
+        '工作表: 2月', '日期 | 时间 | 项目 | 金额',
+        '2024-02-01 | 2024-02-01 09:30:00 | 2月第1笔 | 102',
+        '2024-02-02 | 2024-02-02 09:30:00 | 2月第2笔 | 202',
+        '工作表: 3月', '日期 | 时间 | 项目 | 金额',
+        '2024-03-01 | 2024-03-01 09:30:00 | 3月第1笔 | 103',
+        '2024-03-02 | 2024-03-02 09:30:00 | 3月第2笔 | 203',
+    ]
+
+
+def test_max_cols_limits_columns():
+    text = extract_xlsx_text(MULTI_SHEET, max_rows=2, max_cols=2)
+    assert '1月第1笔' not in text
+    assert '2024-01-01 | 2024-01-01 09:30:00' in text
+
+
+def test_max_chars_cuts_output_and_skips_later_sheets(monkeypatch):
+    read = []
+    real = table_extract._read_rows
+
+    def counting(archive, path, *args, **kwargs):
+        read.append(path)
+        return real(archive, path, *args, **kwargs)
+
+    monkeypatch.setattr(table_extract, '_read_rows', counting)
+    full = extract_xlsx_text(MULTI_SHEET, max_rows=30, max_chars=None)
+    text = extract_xlsx_text(MULTI_SHEET, max_rows=30, max_chars=1200)
+    assert len(text) == 1200
+    assert full.startswith(text)
+    # 预算在第二个工作表内就已用完，后面的工作表不再解析
+    assert len(read) == 4 + 2
+
+
+def test_workbook_saved_by_excel():
+    text = extract_xlsx_text(EXCEL_2007)
+    assert _lines(text) == [
+        '工作表: Tabelle1',
+        'This spreadsheet contains an embedded object',
+        'Have fun parsing :-)',
+        '工作表: Tabelle2',
+        '工作表: Tabelle3',
+    ]
+
+
+def test_csv_rows_and_budget(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_bytes('名称;数量\n苹果;3\n香蕉;5\n'.encode('gbk'))
+    assert extract_csv_text(str(path)) == '名称 | 数量\n苹果 | 3\n香蕉 | 5'
+    assert extract_csv_text(str(path), max_rows=2) == '名称 | 数量\n苹果 | 3'
+    assert extract_csv_text(str(path), max_chars=4) == '名称 |'
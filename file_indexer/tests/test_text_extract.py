@@ -0,0 +1,78 @@
+import codecs
+
+import pytest
+
+import text_extract
+from text_extract import detect_encoding, read_text
+
+CHINESE = '文件索引测试：这是一段用于编码识别的中文文本，包含标点符号和数字123。\n'
+ENGLISH = 'The quick brown fox jumps over the lazy dog.\n'
+
+
+def _write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.mark.parametrize('encoding', ['utf-8', 'gb18030', 'gbk'])
+def test_chinese_text_in_common_encodings(tmp_path, encoding):
+    text = CHINESE * 50
+    path = _write(tmp_path, 'a.txt', text.encode(encoding))
+    assert read_text(path) == text
+
+
+@pytest.mark.parametrize('bom, encoding', [
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+    (codecs.BOM_UTF32_LE, 'utf-32-le'),
+])
+def test_byte_order_marks(tmp_path, bom, encoding):
+    text = CHINESE + ENGLISH
+    path = _write(tmp_path, 'a.txt', bom + text.encode(encoding))
+    assert read_text(path) == text
+
+
+@pytest.mark.parametrize('encoding', ['utf-16-le', 'utf-16-be'])
+@pytest.mark.parametrize('text', [CHINESE * 20, ENGLISH * 20])
+def test_utf16_without_bom(tmp_path, encoding, text):
+    path = _write(tmp_path, 'a.txt', text.encode(encoding))
+    assert read_text(path) == text
+
+
+def test_ascii_head_with_gbk_later_is_sampled(tmp_path, monkeypatch):
+    # 开头全是ASCII时，到文件中后部取样识别
+    monkeypatch.setattr(text_extract, 'SNIFF_BYTES', 1024)
+    text = ENGLISH * 200 + CHINESE * 200
+    path = _write(tmp_path, 'log.txt', text.encode('gbk'))
+    assert read_text(path) == text
+
+
+def test_invalid_bytes_fall_back_to_latin1():
+    assert detect_encoding(bytes(range(0x80, 0x100)) * 4) == 'latin-1'
+
+
+def test_sample_cut_inside_multibyte_character_is_tolerated():
+    data = (CHINESE * 10).encode('utf-8')
+    assert detect_encoding(data[:-1]) == 'utf-8'
+    assert detect_encoding(data[2:], head_cut=True) == 'utf-8'
+
+
+def test_budget_limits_output(tmp_path):
+    text = CHINESE * 1000
+    path = _write(tmp_path, 'a.txt', text.encode('utf-8'))
+    assert read_text(path, max_chars=100) == text[:100]
+
+
+def test_empty_file(tmp_path):
+    assert read_text(_write(tmp_path, 'empty.txt', b'')) == ''
+
+
+def test_large_files_are_memory_mapped(tmp_path, monkeypatch):
+    monkeypatch.setattr(text_extract, 'MMAP_MIN_BYTES', 1024)
+    monkeypatch.setattr(text_extract, 'CHUNK_BYTES', 4096)
+    text = CHINESE * 500
+    path = _write(tmp_path, 'big.txt', text.encode('gb18030'))
+    assert read_text(path) == text
+    assert read_text(path, max_chars=777) == text[:777]
@@ -0,0 +1,105 @@
+import os
+import threading
+
+import pytest
+
+from conftest import wait_until
+from worker_pool import WorkerPool
+
+
+def _touch(path):
+    """进程模式的处理函数（模块级，可pickle）"""
+    with open(path, 'w') as f:
+        f.write(str(os.getpid()))
+
+
+def test_thread_mode_runs_every_item():
+    seen = []
+    lock = threading.Lock()
+
+    def handler(item):
+        with lock:
+            seen.append(item)
+
+    pool = WorkerPool(handler, workers=3, queue_size=10)
+    pool.start()
+    for i in range(20):
+        assert pool.submit(i)
+    pool.stop()
+    assert sorted(seen) == list(range(20))
+    stats = pool.stats()
+    assert stats['submitted'] == 20
+    assert stats['completed'] == 20
+    assert stats['failed'] == 0
+
+
+def test_full_queue_rejects_without_blocking():
+    release = threading.Event()
+    pool = WorkerPool(lambda item: release.wait(5), workers=1, queue_size=2)
+    pool.start()
+    try:
+        assert pool.submit('running')
+        assert wait_until(lambda: pool.stats()['busy_workers'] == 1)
+        assert pool.submit('queued-1', block=False)
+        assert pool.submit('queued-2', block=False)
+        # 队列已满：不等待时立即返回False，也不计入已提交
+        assert pool.submit('overflow', block=False) is False
+        assert pool.submit('overflow', timeout=0.05) is False
+        stats = pool.stats()
+        assert stats['queue_depth'] == 2
+        assert stats['queue_capacity'] == 2
+        assert stats['rejected'] == 2
+        assert stats['submitted'] == 3
+    finally:
+        release.set()
+        pool.stop()
+    assert pool.stats()['completed'] == 3
+
+
+def test_handler_errors_are_counted_and_do_not_kill_workers():
+    def handler(item):
+        if item % 2:
+            raise RuntimeError('boom')
+
+    pool = WorkerPool(handler, workers=1, queue_size=10)
+    pool.start()
+    for i in range(6):
+        pool.submit(i)
+    pool.stop()
+    stats = pool.stats()
+    assert stats['completed'] == 3
+    assert stats['failed'] == 3
+
+
+def test_stop_drains_queued_items():
+    done = []
+    gate = threading.Event()
+
+    def handler(item):
+        gate.wait(5)
+        done.append(item)
+
+    pool = WorkerPool(handler, workers=1, queue_size=10)
+    pool.start()
+    for i in range(5):
+        pool.submit(i)
+    gate.set()
+    pool.stop(wait=True)
+    assert done == list(range(5))
+
+
+def test_process_mode_runs_handler_in_child_processes(tmp_path):
+    paths = [str(tmp_path / f'{i}.out') for i in range(6)]
+    pool = WorkerPool(_touch, workers=2, queue_size=10, mode='process')
+    pool.start()
+    for path in paths:
+        pool.submit(path)
+    pool.stop()
+    assert pool.stats()['completed'] == 6
+    pids = {open(path).read() for path in paths}
+    assert str(os.getpid()) not in pids
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        WorkerPool(lambda item: None, mode='fiber')
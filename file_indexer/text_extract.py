@@ -0,0 +1,152 @@
+# text_extract.py - 纯文本读取：按有限的采样窗口识别编码，增量解码，只返回预算内的字符
+import os
+import mmap
+import codecs
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 编码识别采样：开头读取 SNIFF_BYTES 字节；开头全是ASCII时再在文件中均匀取 SNIFF_WINDOWS 个窗口
+SNIFF_BYTES = 64 * 1024
+SNIFF_WINDOWS = 4
+SNIFF_WINDOW_BYTES = 16 * 1024
+# 达到该大小的文件通过内存映射读取，只有实际解码到的页面会被载入
+MMAP_MIN_BYTES = 64 * 1024 * 1024
+# 每次解码的最大字节数
+CHUNK_BYTES = 1024 * 1024
+
+# UTF-16 中文文本高位字节的取值：0（ASCII）、0x4E-0x9F（常用汉字）、0x30（中文标点）、0xFF（全角字符）
+_UTF16_HIGH_BYTES = bytes([0x00, 0x30, 0xFF] + list(range(0x4E, 0xA0)))
+
+_BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+def _decodes(data, encoding, head_cut=False):
+    """data 能否按 encoding 解码；窗口两端切在多字节字符中间不算失败"""
+    start = 0
+    while True:
+        try:
+            data[start:].decode(encoding)
+            return True
+        except UnicodeDecodeError as e:
+            if start + e.start >= len(data) - 4:
+                return True
+            if head_cut and start + e.start < 4:
+                start += e.start + 1
+                continue
+            return False
+
+
+def _high_byte_ratio(data):
+    return (len(data) - len(data.translate(None, _UTF16_HIGH_BYTES))) / max(1, len(data))
+
+
+def _utf16_without_bom(sample):
+    """没有BOM的UTF-16
+
+    西文为主时NUL字节多且集中在奇数位（LE）或偶数位（BE）；中文为主时没有NUL，
+    但高位字节几乎都落在汉字/标点区间，低位字节则是任意值。
+    """
+    if len(sample) < 16:
+        return None
+    nuls = sample.count(0)
+    if nuls >= len(sample) // 8:
+        odd = sample[1::2].count(0)
+        if odd >= nuls * 0.9:
+            return 'utf-16-le'
+        if nuls - odd >= nuls * 0.9:
+            return 'utf-16-be'
+    odd, even = _high_byte_ratio(sample[1::2]), _high_byte_ratio(sample[0::2])
+    if odd >= 0.9 and even < 0.6:
+        return 'utf-16-le'
+    if even >= 0.9 and odd < 0.6:
+        return 'utf-16-be'
+    return None
+
+
+def detect_encoding(sample, head_cut=False):
+    """从采样字节识别编码：BOM > 无BOM的UTF-16 > UTF-8 > GB18030（兼容GBK/GB2312）> latin-1"""
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    encoding = _utf16_without_bom(sample)
+    if encoding:
+        return encoding
+    # UTF-8 要先于 GB18030 判断：UTF-8 中文字节序列大多也是合法的 GB18030
+    for encoding in ('utf-8', 'gb18030'):
+        if _decodes(sample, encoding, head_cut):
+            return encoding
+    return 'latin-1'
+
+
+def _sample_windows(buffer, size):
+    """在文件中均匀分布的几个窗口（不含开头），总量有上限"""
+    step = size // (SNIFF_WINDOWS + 1)
+    for index in range(1, SNIFF_WINDOWS + 1):
+        offset = index * step
+        yield bytes(buffer[offset:offset + SNIFF_WINDOW_BYTES])
+
+
+def _sniff(buffer):
+    """识别 buffer（只含要解码的部分）的编码，读取的字节数有上限"""
+    size = len(buffer)
+    head = bytes(buffer[:SNIFF_BYTES])
+    if not head.isascii() or size <= SNIFF_BYTES:
+        return detect_encoding(head)
+    # 开头是纯ASCII（日志、代码常见）时无法区分UTF-8和GBK，再看文件中后部的内容
+    for window in _sample_windows(buffer, size):
+        if not window.isascii():
+            return detect_encoding(window, head_cut=True)
+    return 'utf-8'
+
+
+def _decode(view, encoding, max_chars):
+    """增量解码，达到 max_chars 即停止，不会把整个文件解码成字符串"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    parts = []
+    collected = 0
+    pos = 0
+    size = len(view)
+    while pos < size:
+        # 每个字符至少占1字节，按剩余预算读取即可，不必多读
+        length = CHUNK_BYTES if not max_chars else min(CHUNK_BYTES, max(4096, (max_chars - collected) * 4))
+        chunk = view[pos:pos + length]
+        pos += len(chunk)
+        text = decoder.decode(chunk, final=pos >= size)
+        parts.append(text)
+        collected += len(text)
+        if max_chars and collected >= max_chars:
+            break
+    text = ''.join(parts)
+    return text[:max_chars] if max_chars else text
+
+
+def read_text(file_path, max_chars=None):
+    """读取文本文件，自动识别编码，最多返回 max_chars 个字符
+
+    小文件只读取需要的字节；达到 MMAP_MIN_BYTES 的文件通过内存映射按片段解码，
+    不会整体读入内存。
+    """
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return ''
+    # 预算内最多用到 max_chars*4 字节（UTF-8最长4字节/字符，BOM另计），编码也只按这部分识别
+    limit = min(size, max_chars * 4 + 4) if max_chars else size
+    with open(file_path, 'rb') as f:
+        if size < MMAP_MIN_BYTES:
+            data = f.read(limit)
+            return _decode(data, _sniff(data), max_chars)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            view = memoryview(buffer)[:limit]
+            try:
+                encoding = _sniff(view)
+                logger.debug(f"内存映射读取大文件: {os.path.basename(file_path)} ({size} 字节, {encoding})")
+                return _decode(view, encoding, max_chars)
+            finally:
+                view.release()
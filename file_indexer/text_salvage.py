@@ -0,0 +1,187 @@
+# text_salvage.py - 从未知/损坏的二进制文件中抢救文本：在内存映射上向量化定位文本片段，够用即停止
+import re
+import mmap
+import logging
+import importlib.util
+
+logger = logging.getLogger(__name__)
+
+# numpy 在第一次扫描时才导入，避免拖慢启动
+NUMPY_AVAILABLE = importlib.util.find_spec('numpy') is not None
+np = None
+
+# 每次扫描的窗口大小
+WINDOW_BYTES = 4 * 1024 * 1024
+# 候选片段的最小长度：UTF-16 按字符计，单字节/多字节编码按字节计
+MIN_UTF16_CHARS = 6
+MIN_RUN_BYTES = 12
+# 纯ASCII片段的最小长度，以及字母和空格至少占的比例（二进制中随机出现的可打印字节串一般很短、符号多）
+MIN_ASCII_CHARS = 12
+MIN_ASCII_LETTER_RATIO = 0.8
+# 含汉字片段中常用汉字至少占的比例，以及至少要有的连续汉字数（随机字节只会零散地解码出汉字）
+MIN_COMMON_HANZI_RATIO = 0.6
+MIN_HANZI_STREAK = 4
+
+_SPACES = re.compile(r'[ \t]+')
+_HANZI_STREAK = re.compile('[\u4e00-\u9fff]{%d}' % MIN_HANZI_STREAK)
+_PRINTABLE_ASCII = [0x09, 0x0A, 0x0D] + list(range(0x20, 0x7F))
+
+# GB2312 一级汉字（3755个最常用汉字）；真实中文文本中绝大多数汉字都在其中，
+# 而随机字节解码出的汉字只有约18%落在这里
+_COMMON_HANZI = frozenset(
+    char
+    for lead in range(0xB0, 0xD8)
+    for char in bytes(b for trail in range(0xA1, 0xFF) for b in (lead, trail)).decode('gb2312', errors='ignore')
+)
+
+# 没有numpy时使用的字节正则（同一位置同时匹配时取靠前的编码）
+_PATTERNS = [
+    ('utf-16-le', re.compile(rb'(?:[\x20-\x7e\t\r\n]\x00|[\x00-\xff][\x4e-\x9f]|[\x00-\x3f]\x30|[\x00-\x5f]\xff)'
+                             rb'{%d,}' % MIN_UTF16_CHARS)),
+    ('8bit', re.compile(rb'(?:[\x20-\x7e\t\r\n]|[\xe3-\xe9\xef][\x80-\xbf]{2}|[\xa1-\xa3\xb0-\xd7][\xa1-\xfe])'
+                        rb'{%d,}' % MIN_RUN_BYTES)),
+]
+
+_tables = None
+
+
+def _lookup_tables():
+    """UTF-16 码元表和 GBK 双字节表：ASCII、常用汉字、中文标点和全角字符为真"""
+    global _tables, np
+    if _tables is None:
+        import numpy as np
+        utf16 = np.zeros(65536, dtype=bool)
+        utf16[_PRINTABLE_ASCII] = True
+        utf16[0x3000:0x3040] = True
+        utf16[0xFF00:0xFF60] = True
+        utf16[[ord(char) for char in _COMMON_HANZI]] = True
+        gbk = np.zeros(65536, dtype=bool)
+        for lead in list(range(0xA1, 0xA4)) + list(range(0xB0, 0xD8)):
+            gbk[(lead << 8) | 0xA1:(lead << 8) | 0xFF] = True
+        ascii_bytes = np.zeros(256, dtype=bool)
+        ascii_bytes[_PRINTABLE_ASCII] = True
+        _tables = (utf16, gbk, ascii_bytes)
+    return _tables
+
+
+def _runs(mask, min_length):
+    """mask 中连续为真且长度不少于 min_length 的区间 [(起点, 终点)]"""
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    keep = ends - starts >= min_length
+    return zip(starts[keep].tolist(), ends[keep].tolist())
+
+
+def _candidates_numpy(buffer, pos, end):
+    """向量化查找候选片段，返回 [(起点, 终点, 优先级, 编码)]"""
+    utf16, gbk, ascii_bytes = _lookup_tables()
+    data = np.frombuffer(buffer, dtype=np.uint8, count=end - pos, offset=pos)
+    found = []
+    # UTF-16LE：两种对齐方式各查一遍
+    for align in (0, 1):
+        count = (end - pos - align) // 2
+        if count <= 0:
+            continue
+        units = np.frombuffer(buffer, dtype='<u2', count=count, offset=pos + align)
+        for start, stop in _runs(utf16[units], MIN_UTF16_CHARS):
+            found.append((pos + align + start * 2, pos + align + stop * 2, 0, 'utf-16-le'))
+
+    # 单字节/多字节：ASCII，或被常用GBK双字节、UTF-8三字节汉字/标点覆盖的字节
+    texty = ascii_bytes[data]
+    if len(data) >= 2:
+        pairs = gbk[(data[:-1].astype(np.uint16) << 8) | data[1:]]
+        texty[:-1] |= pairs
+        texty[1:] |= pairs
+    if len(data) >= 3:
+        lead = data[:-2]
+        triples = (((lead >= 0xE3) & (lead <= 0xE9)) | (lead == 0xEF)) \
+            & ((data[1:-1] & 0xC0) == 0x80) & ((data[2:] & 0xC0) == 0x80)
+        texty[:-2] |= triples
+        texty[1:-1] |= triples
+        texty[2:] |= triples
+    for start, stop in _runs(texty, MIN_RUN_BYTES):
+        found.append((pos + start, pos + stop, 1, '8bit'))
+    return found
+
+
+def _candidates_regex(buffer, pos, end):
+    found = []
+    for priority, (encoding, pattern) in enumerate(_PATTERNS):
+        found.extend((m.start(), m.end(), priority, encoding) for m in pattern.finditer(buffer, pos, end))
+    return found
+
+
+def _decodings(data, encoding):
+    """候选解码结果，依次尝试"""
+    if encoding != '8bit':
+        yield data.decode(encoding, errors='ignore')
+        return
+    # 片段两端可能粘上随机字节：UTF-8 丢弃无法解码的字节；GBK 被前面的随机字节带偏时错开一个字节再解
+    yield data.decode('utf-8', errors='ignore')
+    yield data.decode('gb18030', errors='ignore')
+    yield data[1:].decode('gb18030', errors='ignore')
+
+
+def _plausible(text):
+    """过滤二进制中偶然匹配出的片段"""
+    hanzi = [char for char in text if '\u4e00' <= char <= '\u9fff']
+    if not hanzi:
+        letters = sum(1 for char in text if char.isalpha() or char == ' ')
+        return len(text) >= MIN_ASCII_CHARS and letters >= len(text) * MIN_ASCII_LETTER_RATIO
+    if not _HANZI_STREAK.search(text):
+        return False
+    letters = sum(1 for char in text if char.isalnum() or char == ' ' or '\u3000' <= char <= '\u303f'
+                  or '\uff00' <= char <= '\uff5f')
+    if letters < len(text) * 0.8:
+        return False
+    common = sum(1 for char in hanzi if char in _COMMON_HANZI)
+    return common >= len(hanzi) * MIN_COMMON_HANZI_RATIO
+
+
+def _scan(buffer, size, max_chars):
+    find = _candidates_numpy if NUMPY_AVAILABLE else _candidates_regex
+    runs = []
+    collected = 0
+    last_end = 0
+    pos = 0
+    while pos < size:
+        end = min(size, pos + WINDOW_BYTES)
+        candidates = sorted(find(buffer, pos, end), key=lambda item: (item[0], item[2]))
+        next_pos = end
+        for start, stop, _, encoding in candidates:
+            if start < last_end:
+                continue
+            # 碰到窗口末尾的片段可能被截断，留到下一个窗口从片段开头重新查找
+            if stop == end < size and start > pos:
+                next_pos = start
+                break
+            data = buffer[start:stop]
+            text = next((text for text in (_SPACES.sub(' ', decoded).strip()
+                                           for decoded in _decodings(data, encoding))
+                         if _plausible(text)), None)
+            if text is None:
+                continue
+            runs.append(text)
+            collected += len(text) + 1
+            last_end = stop
+            if max_chars and collected >= max_chars:
+                return runs
+        pos = next_pos
+    return runs
+
+
+def salvage_text(file_path, max_chars=10000):
+    """从二进制文件中提取可读文本片段（UTF-16LE / UTF-8 / GBK），按在文件中的顺序拼接
+
+    文件通过 mmap 按窗口扫描，不会整体读入内存；有numpy时用查表向量化定位候选片段，
+    只对候选片段解码。累计字符数达到 max_chars 后停止扫描。
+    """
+    with open(file_path, 'rb') as f:
+        size = f.seek(0, 2)
+        if size == 0:
+            return ''
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            runs = _scan(buffer, size, max_chars)
+    text = '\n'.join(runs)
+    return text[:max_chars] if max_chars else text
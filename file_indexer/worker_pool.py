@@ -0,0 +1,121 @@
+# worker_pool.py - 有界队列驱动的文件处理工作池
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# 队列中的停止标记
+_STOP = object()
+
+
+class WorkerPool:
+    """有界队列 + 固定数量工作者，支持线程模式和进程模式
+
+    线程模式下工作线程直接调用 handler；进程模式下每个工作线程把任务转交给
+    同等大小的进程池执行（handler 必须是可 pickle 的模块级函数）。
+    """
+
+    def __init__(self, handler, workers=4, queue_size=1000, mode='thread', name='worker'):
+        if mode not in ('thread', 'process'):
+            raise ValueError(f"不支持的工作池模式: {mode}")
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.mode = mode
+        self.name = name
+        self._queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._threads = []
+        self._executor = None
+        self._lock = threading.Lock()
+        self._started_at = None
+        self._busy = 0
+        self._busy_seconds = 0.0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self):
+        """启动工作者"""
+        if self._threads:
+            return
+        if self.mode == 'process':
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self._started_at = time.time()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{i + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"工作池已启动: {self.workers} 个工作者 ({self.mode}模式), 队列容量 {self._queue.maxsize}")
+
+    def submit(self, item, block=True, timeout=None):
+        """提交任务，队列已满且不等待时返回False"""
+        try:
+            self._queue.put(item, block=block, timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def stop(self, wait=True):
+        """停止工作者，已入队的任务会先处理完"""
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
+        if self._executor:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                with self._lock:
+                    self._busy += 1
+                started = time.time()
+                try:
+                    if self._executor:
+                        self._executor.submit(self.handler, item).result()
+                    else:
+                        self.handler(item)
+                    ok = True
+                except Exception as e:
+                    logger.error(f"工作池任务异常: {item} - {str(e)}")
+                    ok = False
+                with self._lock:
+                    self._busy -= 1
+                    self._busy_seconds += time.time() - started
+                    if ok:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+            finally:
+                self._queue.task_done()
+
+    def stats(self):
+        """队列深度和工作者利用率"""
+        with self._lock:
+            elapsed = time.time() - self._started_at if self._started_at else 0.0
+            capacity = elapsed * self.workers
+            return {
+                'mode': self.mode,
+                'workers': self.workers,
+                'busy_workers': self._busy,
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'utilization': round(self._busy_seconds / capacity, 3) if capacity else 0.0,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+            }